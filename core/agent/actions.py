@@ -0,0 +1,121 @@
+"""
+Author: Vladimir Ilievski <ilievski.vladimir@live.com>
+
+A Python file for the immutable agent actions in the Goal-Oriented Dialogue Systems
+"""
+
+from core import constants as const
+
+from collections.abc import Mapping
+from types import MappingProxyType
+
+
+class GOAgentAction(Mapping):
+    """
+    Class for an immutable agent action, built once for each of the feasible agent actions. It is a read-only mapping
+    with the same keys as the agent action dictionaries, i.e. ** diaact **, ** inform_slots ** and ** request_slots **,
+    so it can be used wherever an agent action is read. The slot maps are frozen, such that the action can be shared
+    between the turns and the dialogues without copying it, and it is hashable.
+
+    The values of the inform slots are placeholders. The values filled from the knowledge base are kept in a separate
+    dictionary by the state tracker, instead of in a copy of the action.
+
+    # Class members:
+
+        - ** action_id **: the index of the action in the feasible actions
+        - ** dia_act **: the act (intent) of the action
+        - ** inform_slots **: the frozen map of the inform slots
+        - ** request_slots **: the frozen map of the request slots
+    """
+
+    __slots__ = ('action_id', 'dia_act', 'inform_slots', 'request_slots', '_hash')
+
+    def __init__(self, action_id=None, dia_act=None, inform_slots=None, request_slots=None):
+        """
+        Constructor of the `GOAgentAction` class.
+
+        :param action_id: the index of the action in the feasible actions
+        :param dia_act: the act (intent) of the action
+        :param inform_slots: the inform slots of the action, copied
+        :param request_slots: the request slots of the action, copied
+        """
+
+        inform_slots = MappingProxyType(dict(inform_slots or {}))
+        request_slots = MappingProxyType(dict(request_slots or {}))
+
+        object.__setattr__(self, 'action_id', action_id)
+        object.__setattr__(self, 'dia_act', dia_act)
+        object.__setattr__(self, 'inform_slots', inform_slots)
+        object.__setattr__(self, 'request_slots', request_slots)
+        object.__setattr__(self, '_hash', hash((dia_act, frozenset(inform_slots.items()),
+                                                frozenset(request_slots.items()))))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("The agent action is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("The agent action is immutable")
+
+    def __getitem__(self, key):
+        if key == const.DIA_ACT_KEY:
+            return self.dia_act
+        elif key == const.INFORM_SLOT_KEY:
+            return self.inform_slots
+        elif key == const.REQUEST_SLOT_KEY:
+            return self.request_slots
+
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter((const.DIA_ACT_KEY, const.INFORM_SLOT_KEY, const.REQUEST_SLOT_KEY))
+
+    def __len__(self):
+        return 3
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        if isinstance(other, GOAgentAction):
+            return self._hash == other._hash and self.dia_act == other.dia_act and \
+                   self.inform_slots == other.inform_slots and self.request_slots == other.request_slots
+
+        return Mapping.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (GOAgentAction, (self.action_id, self.dia_act, dict(self.inform_slots), dict(self.request_slots)))
+
+    def __repr__(self):
+        return "GOAgentAction(%r, %r, %r, %r)" % (self.action_id, self.dia_act, dict(self.inform_slots),
+                                                  dict(self.request_slots))
+
+    def to_dict(self):
+        """
+        Method for creating a mutable dictionary of the agent action, with copied slot maps.
+
+        :return: the agent action as a dictionary
+        """
+
+        return {const.DIA_ACT_KEY: self.dia_act, const.INFORM_SLOT_KEY: dict(self.inform_slots),
+                const.REQUEST_SLOT_KEY: dict(self.request_slots)}
+
+
+def build_agent_actions(feasible_actions):
+    """
+    Function for building the immutable agent actions for all feasible actions, once.
+
+    :param feasible_actions: list of the agent action templates, as dictionaries
+    :return: tuple of the immutable agent actions, indexed by the action number
+    """
+
+    return tuple(GOAgentAction(action_id, action[const.DIA_ACT_KEY], action[const.INFORM_SLOT_KEY],
+                               action[const.REQUEST_SLOT_KEY]) for action_id, action in enumerate(feasible_actions))
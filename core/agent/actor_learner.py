@@ -0,0 +1,458 @@
+"""
+Author: Vladimir Ilievski <ilievski.vladimir@live.com>
+
+A Python file for the actor-learner training of the Goal-Oriented Dialogue agents on local processes.
+"""
+
+from core import constants as const
+from core.agent.numpy_agents import GONumpyQNetwork, select_actions_eps_greedy
+
+import argparse
+import ctypes
+import json
+import multiprocessing
+import time
+
+import numpy as np
+
+
+class GOSharedTransitionBuffer(object):
+    """
+    Class for the ring buffer of transitions in shared memory, written by one actor process and read by the learner
+    process. The entries are in the same form as in the replay memories, i.e. the observation, the action taken, the
+    reward received and the terminal flag, followed by the last observation of the episode.
+
+    The actor commits a whole episode at once, such that the learner appends the episodes of different actors in the
+    replay memory without interleaving their entries.
+
+    # Class members:
+
+        - ** capacity **: the maximal number of entries in the buffer, at least the entries of one episode
+        - ** observations **: array of shape (capacity, observation_dim) in shared memory, the observations
+        - ** actions **: array of shape (capacity,) in shared memory, the actions
+        - ** rewards **: array of shape (capacity,) in shared memory, the rewards
+        - ** terminals **: array of shape (capacity,) in shared memory, the terminal flags
+        - ** nb_committed **: the number of entries committed by the actor so far, in shared memory
+        - ** nb_consumed **: the number of entries consumed by the learner so far, in shared memory
+    """
+
+    def __init__(self, capacity=None, observation_dim=None):
+        """
+        Constructor of the `GOSharedTransitionBuffer` class.
+
+        :param capacity: the maximal number of entries in the buffer
+        :param observation_dim: the dimension of the observations
+        """
+
+        self.capacity = capacity
+
+        self.__shared_observations = multiprocessing.RawArray(ctypes.c_float, capacity * observation_dim)
+        self.__shared_actions = multiprocessing.RawArray(ctypes.c_int32, capacity)
+        self.__shared_rewards = multiprocessing.RawArray(ctypes.c_float, capacity)
+        self.__shared_terminals = multiprocessing.RawArray(ctypes.c_bool, capacity)
+        self.__observation_dim = observation_dim
+        self.__wrap_arrays()
+
+        self.nb_committed = multiprocessing.Value(ctypes.c_int64, 0)
+        self.nb_consumed = multiprocessing.Value(ctypes.c_int64, 0)
+
+        # the number of entries written by the actor in the current episode, not committed yet
+        self.nb_pending = 0
+
+    def __wrap_arrays(self):
+        """
+        Private helper method for wrapping the shared memory in NumPy arrays, again after unpickling in the actor.
+
+        :return:
+        """
+
+        self.observations = np.frombuffer(self.__shared_observations, dtype=np.float32).reshape(
+            self.capacity, self.__observation_dim)
+        self.actions = np.frombuffer(self.__shared_actions, dtype=np.int32)
+        self.rewards = np.frombuffer(self.__shared_rewards, dtype=np.float32)
+        self.terminals = np.frombuffer(self.__shared_terminals, dtype=np.bool_)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ['observations', 'actions', 'rewards', 'terminals']:
+            del state[name]
+
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__wrap_arrays()
+
+    def write(self, observation, action, reward, terminal, stop_event=None):
+        """
+        Method for writing one entry of the current episode, called by the actor. Waits while the buffer is full.
+
+        :param observation: the observation
+        :param action: the action taken
+        :param reward: the reward received after the action
+        :param terminal: the flag indicating whether the episode ended after the action
+        :param stop_event: the event stopping the wait, if set
+        :return: False if stopped while waiting, True otherwise
+        """
+
+        assert self.nb_pending < self.capacity, 'the episode does not fit in the buffer'
+
+        nb_written = self.nb_committed.value + self.nb_pending
+        while nb_written - self.nb_consumed.value >= self.capacity:
+            if stop_event is not None and stop_event.is_set():
+                return False
+            time.sleep(0.001)
+
+        idx = nb_written % self.capacity
+        self.observations[idx] = np.ravel(observation)
+        self.actions[idx] = action
+        self.rewards[idx] = reward
+        self.terminals[idx] = terminal
+
+        self.nb_pending += 1
+
+        return True
+
+    def commit(self):
+        """
+        Method for committing the entries of the current episode to the learner, called by the actor.
+
+        :return:
+        """
+
+        with self.nb_committed.get_lock():
+            self.nb_committed.value += self.nb_pending
+
+        self.nb_pending = 0
+
+    def drain(self, memory):
+        """
+        Method for appending all committed entries to the replay memory, called by the learner.
+
+        :param memory: the replay memory
+        :return: the number of appended entries
+        """
+
+        nb_consumed = self.nb_consumed.value
+        nb_committed = self.nb_committed.value
+
+        for entry_nb in range(nb_consumed, nb_committed):
+            idx = entry_nb % self.capacity
+            memory.append(self.observations[idx], self.actions[idx], self.rewards[idx], self.terminals[idx])
+
+        with self.nb_consumed.get_lock():
+            self.nb_consumed.value = nb_committed
+
+        return nb_committed - nb_consumed
+
+
+class GOSharedWeights(object):
+    """
+    Class for the weights of the Q-network in shared memory, published by the learner process and copied by the actor
+    processes. The version is increased with each publication, such that the actors copy the weights only when they
+    change. The lock keeps the actors from copying weights which are half-published.
+
+    # Class members:
+
+        - ** flat_weights **: the flat array of the weights in shared memory
+        - ** version **: the number of publications so far, in shared memory
+    """
+
+    def __init__(self, nb_weights=None):
+        """
+        Constructor of the `GOSharedWeights` class.
+
+        :param nb_weights: the number of weights of the Q-network
+        """
+
+        self.__shared_weights = multiprocessing.RawArray(ctypes.c_float, nb_weights)
+        self.flat_weights = np.frombuffer(self.__shared_weights, dtype=np.float32)
+
+        self.version = multiprocessing.Value(ctypes.c_int64, 0)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['flat_weights']
+
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.flat_weights = np.frombuffer(self.__shared_weights, dtype=np.float32)
+
+    def publish(self, flat_weights):
+        """
+        Method for publishing new weights, called by the learner.
+
+        :param flat_weights: the flat array of the weights
+        :return:
+        """
+
+        with self.version.get_lock():
+            self.flat_weights[:] = flat_weights
+            self.version.value += 1
+
+    def copy_to(self, flat_weights, version=None):
+        """
+        Method for copying the published weights, if they changed since the given version, called by the actors.
+
+        :param flat_weights: the flat array to copy the weights to
+        :param version: the version of the weights copied last time
+        :return: the version of the copied weights
+        """
+
+        if version == self.version.value:
+            return version
+
+        with self.version.get_lock():
+            flat_weights[:] = self.flat_weights
+            return self.version.value
+
+
+def _run_actor(actor_id, env_fn, layer_dims, eps, use_action_masks, transition_buffer, shared_weights, nb_env_steps,
+               stop_event, seed):
+    """
+    Private function for the actor process, running the dialogues with a stale copy of the Q-network and pushing the
+    transitions to the learner.
+
+    :param actor_id: the index of the actor
+    :param env_fn: picklable function creating the environment, with a `fused_step` accepting the action index
+    :param layer_dims: the dimensions of the layers of the Q-network
+    :param eps: the probability of taking a random action
+    :param use_action_masks: whether to mask the actions which are not allowed in the current state
+    :param transition_buffer: the shared buffer of this actor
+    :param shared_weights: the weights published by the learner
+    :param nb_env_steps: the shared counter of the environment steps of all actors
+    :param stop_event: the event stopping the actor
+    :param seed: the random seed of the actor
+    :return:
+    """
+
+    np.random.seed(seed)
+
+    env = env_fn()
+    q_network = GONumpyQNetwork(layer_dims[0], layer_dims[1:-1], layer_dims[-1])
+    version = None
+
+    while not stop_event.is_set():
+        # the weights are refreshed only between the episodes
+        version = shared_weights.copy_to(q_network.flat_weights, version)
+
+        observation = env.reset()
+        if observation is None:
+            break
+
+        done = False
+        nb_steps = 0
+        while not done:
+            q_values, _ = q_network.forward(np.reshape(observation, (1, -1)))
+            if use_action_masks:
+                q_values = np.where(env.produce_action_mask(), q_values, -np.inf)
+            action = int(select_actions_eps_greedy(q_values, eps)[0])
+
+            next_observation, reward, done, _ = env.fused_step(action)
+            if not transition_buffer.write(observation, action, reward, done, stop_event):
+                return
+
+            observation = next_observation
+            nb_steps += 1
+
+        # the last entry of the episode, which does not start a transition. The environment gives no state after the
+        # end of the dialogue, and the terminal transition does not use it
+        if not transition_buffer.write(np.zeros(layer_dims[0]), 0, 0.0, False, stop_event):
+            return
+
+        transition_buffer.commit()
+
+        with nb_env_steps.get_lock():
+            nb_env_steps.value += nb_steps
+
+
+class GOActorLearner(object):
+    """
+    Class for the actor-learner training of the `GONumpyDQNAgent`, on local processes. Several actor processes run
+    their own environment with stale copies of the Q-network and push the transitions through shared memory, while
+    the learner, in the calling process, appends them to the replay memory and trains the Q-network. The learner
+    periodically publishes the weights in a shared buffer, from which the actors refresh their copies between the
+    episodes.
+
+    The environments are created in the actor processes by ** env_fn **, which has to be picklable.
+
+    # Class members:
+
+        - ** agent **: the trained agent, its memory and Q-network are used by the learner
+        - ** env_fn **: function creating the environment of an actor
+        - ** nb_actors **: the number of actor processes
+        - ** broadcast_interval **: the number of training steps between two publications of the weights
+        - ** use_action_masks **: whether the actors mask the actions which are not allowed in the current state
+        - ** transition_buffers **: the shared transition buffer of each actor
+        - ** shared_weights **: the weights published by the learner
+        - ** nb_env_steps **: the shared counter of the environment steps of all actors
+        - ** nb_updates **: the number of training steps of the learner so far
+    """
+
+    def __init__(self, agent=None, env_fn=None, nb_actors=None, broadcast_interval=100, buffer_capacity=1000,
+                 use_action_masks=True, seed=0):
+        """
+        Constructor of the `GOActorLearner` class.
+
+        :param agent: the trained `GONumpyDQNAgent`
+        :param env_fn: picklable function creating the environment of an actor
+        :param nb_actors: the number of actor processes. If None, one per core
+        :param broadcast_interval: the number of training steps between two publications of the weights
+        :param buffer_capacity: the number of entries of the transition buffer of each actor, at least one episode
+        :param use_action_masks: whether the actors mask the actions which are not allowed in the current state
+        :param seed: the random seed, the actor seeds follow it
+        """
+
+        self.agent = agent
+        self.env_fn = env_fn
+        self.nb_actors = nb_actors if nb_actors is not None else multiprocessing.cpu_count()
+        self.broadcast_interval = broadcast_interval
+        self.use_action_masks = use_action_masks
+        self.seed = seed
+
+        self.transition_buffers = [GOSharedTransitionBuffer(buffer_capacity, agent.observation_dim)
+                                   for _ in range(self.nb_actors)]
+        self.shared_weights = GOSharedWeights(agent.q_network.nb_weights)
+        self.nb_env_steps = multiprocessing.Value(ctypes.c_int64, 0)
+
+        self.nb_updates = 0
+
+    def __drain(self):
+        """
+        Private helper method for appending the committed transitions of all actors to the replay memory.
+
+        :return: the number of appended entries
+        """
+
+        return sum(transition_buffer.drain(self.agent.memory) for transition_buffer in self.transition_buffers)
+
+    def __train_step(self):
+        """
+        Private helper method for one training step of the learner, followed by the update of the target network.
+
+        :return: the training metrics
+        """
+
+        agent = self.agent
+
+        metrics = agent.train_on_batch(agent.memory.sample_batch(agent.batch_size))
+        self.nb_updates += 1
+
+        if agent.target_model_update < 1:
+            agent.update_target_model_soft()
+        elif self.nb_updates % agent.target_model_update == 0:
+            agent.update_target_model_hard()
+
+        if self.nb_updates % self.broadcast_interval == 0:
+            self.shared_weights.publish(agent.q_network.flat_weights)
+
+        return metrics
+
+    def run(self, nb_updates=None, duration=None):
+        """
+        Method for training the agent with the actor processes, until the given number of training steps or the given
+        number of seconds.
+
+        :param nb_updates: the number of training steps of the learner, if any
+        :param duration: the number of seconds, if any
+        :return: dictionary with the numbers of environment steps and training steps, and the elapsed seconds
+        """
+
+        agent = self.agent
+        self.shared_weights.publish(agent.q_network.flat_weights)
+
+        stop_event = multiprocessing.Event()
+        actors = [multiprocessing.Process(target=_run_actor,
+                                          args=(actor_id, self.env_fn, agent.q_network.layer_dims, agent.eps,
+                                                self.use_action_masks, self.transition_buffers[actor_id],
+                                                self.shared_weights, self.nb_env_steps, stop_event,
+                                                self.seed + actor_id + 1))
+                  for actor_id in range(self.nb_actors)]
+        for actor in actors:
+            actor.daemon = True
+            actor.start()
+
+        start_nb_env_steps = self.nb_env_steps.value
+        start_nb_updates = self.nb_updates
+        start_time = time.time()
+
+        try:
+            while (nb_updates is None or self.nb_updates - start_nb_updates < nb_updates) and \
+                    (duration is None or time.time() - start_time < duration):
+                nb_appended = self.__drain()
+
+                if agent.memory.nb_entries > agent.nb_steps_warmup:
+                    self.__train_step()
+                elif nb_appended == 0:
+                    if not any(actor.is_alive() for actor in actors):
+                        break
+                    time.sleep(0.001)
+        finally:
+            stop_event.set()
+            for actor in actors:
+                actor.join()
+
+        return {'nb_actors': self.nb_actors, 'nb_env_steps': self.nb_env_steps.value - start_nb_env_steps,
+                'nb_updates': self.nb_updates - start_nb_updates, 'seconds': time.time() - start_time}
+
+
+def main(params):
+    from core.agent.memory import GOPrioritizedMemory
+    from core.agent.numpy_agents import GONumpyDQNAgent
+    from core.environment.environment import create_script_env_fn
+
+    env_fn = create_script_env_fn(params)
+    env = env_fn()
+    nb_actions = len(env.agent_actions)
+    observation_dim = env.state_tracker.state_dim
+
+    nb_actors_list = [1]
+    while nb_actors_list[-1] * 2 <= params['max_nb_actors']:
+        nb_actors_list.append(nb_actors_list[-1] * 2)
+    if nb_actors_list[-1] != params['max_nb_actors']:
+        nb_actors_list.append(params['max_nb_actors'])
+
+    for nb_actors in nb_actors_list:
+        np.random.seed(params['seed'])
+        agent = GONumpyDQNAgent(nb_actions, observation_dim, GOPrioritizedMemory(params['memory_limit'],
+                                                                                 observation_dim),
+                                batch_size=params['batch_size'], nb_steps_warmup=params['batch_size'])
+        actor_learner = GOActorLearner(agent, env_fn, nb_actors, seed=params['seed'])
+        result = actor_learner.run(duration=params['duration'])
+
+        result['env_steps_per_second'] = result['nb_env_steps'] / result['seconds']
+        result['updates_per_second'] = result['nb_updates'] / result['seconds']
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--act_set_path', dest='act_set_path', type=str, help='path to the dialogue acts file')
+    parser.add_argument('--slot_set_path', dest='slot_set_path', type=str, help='path to the slots file')
+    parser.add_argument('--goal_set_path', dest='goal_set_path', type=str, help='path to the user goal set')
+    parser.add_argument('--kb_path', dest='kb_path', type=str, default=None, help='path to the knowledge base')
+    parser.add_argument('--nlu_path', dest='nlu_path', type=str, help='path to the trained NLU unit')
+    parser.add_argument('--nlg_path', dest='nlg_path', type=str, help='path to the trained NLG unit')
+    parser.add_argument('--simulation_mode', dest='simulation_mode', type=str,
+                        default=const.SEMANTIC_FRAME_SIMULATION_MODE,
+                        help='semantic frame or natural language mode')
+    parser.add_argument('--max_nb_turns', dest='max_nb_turns', type=int, default=40, help='maximal number of turns')
+    parser.add_argument('--max_nb_actors', dest='max_nb_actors', type=int, default=multiprocessing.cpu_count(),
+                        help='the maximal number of actor processes, the benchmark doubles them from 1')
+    parser.add_argument('--memory_limit', dest='memory_limit', type=int, default=100000,
+                        help='the number of entries of the replay memory')
+    parser.add_argument('--batch_size', dest='batch_size', type=int, default=16, help='the minibatch size')
+    parser.add_argument('--duration', dest='duration', type=float, default=30.0,
+                        help='the number of seconds for each number of actors')
+    parser.add_argument('--seed', dest='seed', type=int, default=0, help='random seed')
+
+    args = parser.parse_args()
+    params = vars(args)
+
+    print ("Actor-Learner Throughput Benchmark Parameters:")
+    print (json.dumps(params, indent=2))
+
+    main(params)
@@ -4,7 +4,13 @@ Author: Vladimir Ilievski <ilievski.vladimir@live.com>
 A Python file for the Goal-Oriented Dialogue agent classes.
 """
 
+from core.agent.numpy_agents import select_actions_eps_greedy
+from core.agent.policy import GOMaskedEpsGreedyQPolicy
+
 from rl.agents.dqn import DQNAgent
+from rl.policy import GreedyQPolicy, LinearAnnealedPolicy
+
+import numpy as np
 
 
 class GODQNAgent(DQNAgent):
@@ -23,6 +29,7 @@ class GODQNAgent(DQNAgent):
     The following methods are implemented:
     
         - `forward`
+        - `forward_batch`
         - `backward`
         - `compile`
         - `load_weights`
@@ -50,6 +57,15 @@ class GODQNAgent(DQNAgent):
         - ** delta_clip **: no idea. Default is Inf
         - ** custom_model_objects **: no idea
     
+    Own:
+
+        - ** action_mask_fn **: function producing the boolean mask of the allowed actions in the current state. If
+                            None, all actions are allowed. If given and no policy is given, the policy is a
+                            `GOMaskedEpsGreedyQPolicy`, such that the exploration never takes a masked action
+
+    If the memory samples minibatches in arrays, like `GOArrayMemory` and `GOPrioritizedMemory`, the loss of each
+    transition is weighted with its importance-sampling weight, and the priorities are updated with the new TD errors.
+    
     From `DQNAgent` class:
     
         - ** policy ** (`Policy` instance): The policy that the agent follows. Default is None
@@ -60,5 +76,156 @@ class GODQNAgent(DQNAgent):
     """
 
     def __init__(self, *args, **kwargs):
-        super(GODQNAgent).__init__(*args, **kwargs)
+        # the function producing the mask of the allowed actions in the current state, if any
+        self.action_mask_fn = kwargs.pop('action_mask_fn', None)
+
+        # the policy is the second positional argument of `DQNAgent`, after the model
+        if self.action_mask_fn is not None and len(args) < 2 and kwargs.get('policy') is None:
+            kwargs['policy'] = GOMaskedEpsGreedyQPolicy()
+
+        super(GODQNAgent, self).__init__(*args, **kwargs)
+
+    def forward(self, observation):
+        """
+        Method for selecting the next action given the observation. The Q-values of the actions which are not allowed
+        in the current state are set to -inf, before the policy selects an action. Overrides the super class method.
+
+        :param observation: the observation from the environment
+        :return: the selected action
+        """
+
+        state = self.memory.get_recent_state(observation)
+        q_values = self.compute_q_values(state)
+
+        if self.action_mask_fn is not None:
+            action_mask = np.reshape(self.action_mask_fn(), q_values.shape)
+            q_values = np.where(action_mask, q_values, -np.inf)
+
+        if self.training:
+            action = self.policy.select_action(q_values=q_values)
+        else:
+            action = self.test_policy.select_action(q_values=q_values)
+
+        # book-keeping
+        self.recent_observation = observation
+        self.recent_action = action
+
+        return action
+
+
+    def forward_batch(self, observations, action_masks=None):
+        """
+        Method for selecting the actions of a batch of observations from many parallel dialogues, with one forward
+        pass of the Q-network and the epsilon-greedy selection vectorized over the batch. The epsilon is the current one of
+        the training or the testing policy. Nothing is stored for the next backward pass.
+
+        :param observations: array of shape (nb_dialogues, state_dim)
+        :param action_masks: boolean array of shape (nb_dialogues, nb_actions), True for the allowed actions. If None,
+        all actions are allowed
+        :return: array of shape (nb_dialogues,) with the selected actions
+        """
+
+        # the states have a window of one observation
+        observations = np.reshape(observations, (-1, 1, np.shape(observations)[-1]))
+        q_values = self.compute_batch_q_values(observations)
+
+        if action_masks is not None:
+            q_values = np.where(action_masks, q_values, -np.inf)
+
+        policy = self.policy if self.training else self.test_policy
+        return select_actions_eps_greedy(q_values, self.__get_current_eps(policy))
+
+    def __get_current_eps(self, policy):
+        """
+        Private helper method for getting the current epsilon of a policy. The epsilon of an annealed policy is the
+        annealed value at the current step, the same one its inner policy gets when selecting an action.
+
+        :param policy: the policy
+        :return: the probability of taking a random action
+        """
+
+        if isinstance(policy, LinearAnnealedPolicy) and policy.attr == 'eps':
+            eps = policy.get_current_value()
+            setattr(policy.inner_policy, policy.attr, eps)
+            return eps
+        elif isinstance(policy, GreedyQPolicy):
+            return 0.0
+        elif not isinstance(policy, LinearAnnealedPolicy) and hasattr(policy, 'eps'):
+            return policy.eps
+
+        raise ValueError("The policy %s has no epsilon, the batch of actions can not be selected epsilon-greedily"
+                         % type(policy).__name__)
+
+    def backward(self, reward, terminal):
+        """
+        Method for storing the last transition in the memory and training the model on a replayed minibatch.
+        If the memory does not sample minibatches in arrays, the super class method is used.
+        Overrides the super class method.
+
+        :param reward: the reward received after the last action
+        :param terminal: the flag indicating whether the episode ended after the last action
+        :return: the training metrics
+        """
+
+        if not hasattr(self.memory, 'sample_batch'):
+            return super(GODQNAgent, self).backward(reward, terminal)
+
+        if self.step % self.memory_interval == 0:
+            self.memory.append(self.recent_observation, self.recent_action, reward, terminal, training=self.training)
+
+        metrics = [np.nan for _ in self.metrics_names]
+        if not self.training:
+            return metrics
+
+        if self.step > self.nb_steps_warmup and self.step % self.train_interval == 0:
+            metrics = self.__train_on_batch(self.memory.sample_batch(self.batch_size))
+
+        if self.target_model_update >= 1 and self.step % self.target_model_update == 0:
+            self.update_target_model_hard()
+
+        return metrics
+
+    def __train_on_batch(self, batch):
+        """
+        Private helper method for training the model on a minibatch of transitions in arrays, weighting the loss of
+        each transition with its importance-sampling weight.
+
+        :param batch: the minibatch as `TransitionBatch`
+        :return: the training metrics
+        """
+
+        batch_range = np.arange(self.batch_size)
+
+        # the states have a window of one observation
+        state0_batch = self.process_state_batch(batch.state0[:, np.newaxis])
+        state1_batch = self.process_state_batch(batch.state1[:, np.newaxis])
+
+        target_q_values = self.target_model.predict_on_batch(state1_batch)
+        if self.enable_double_dqn:
+            q_batch = target_q_values[batch_range, np.argmax(self.model.predict_on_batch(state1_batch), axis=1)]
+        else:
+            q_batch = np.max(target_q_values, axis=1)
+
+        # the n-step returns give the discounts of the bootstrapped Q-values
+        discounts = self.gamma if batch.discount is None else batch.discount
+        Rs = batch.reward + discounts * q_batch * (1.0 - batch.terminal1)
+
+        targets = np.zeros((self.batch_size, self.nb_actions), dtype=np.float32)
+        masks = np.zeros((self.batch_size, self.nb_actions), dtype=np.float32)
+        targets[batch_range, batch.action] = Rs
+        masks[batch_range, batch.action] = 1.0
+        dummy_targets = Rs.astype(np.float32)
+
+        if hasattr(self.memory, 'update_priorities'):
+            q_values = self.model.predict_on_batch(state0_batch)[batch_range, batch.action]
+            self.memory.update_priorities(batch.idxs, Rs - q_values)
+
+        ins = [state0_batch] if type(self.model.input) is not list else state0_batch
+        metrics = self.trainable_model.train_on_batch(ins + [targets, masks], [dummy_targets, targets],
+                                                      sample_weight=[batch.weights, batch.weights])
+        metrics = [metric for idx, metric in enumerate(metrics) if idx not in (1, 2)]
+        metrics += self.policy.metrics
+        if self.processor is not None:
+            metrics += self.processor.metrics
 
+        return metrics
@@ -0,0 +1,864 @@
+"""
+Author: Vladimir Ilievski <ilievski.vladimir@live.com>
+
+A Python file for the replay memories of the Goal-Oriented Dialogue agents.
+"""
+
+from collections import namedtuple
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+# one transition, in the same form as in keras-rl, where the states are lists of window_length observations
+Experience = namedtuple('Experience', 'state0, action, reward, state1, terminal1')
+
+# a minibatch of transitions in arrays, together with their indices in the memory and importance-sampling weights.
+# The discounts of the bootstrapped Q-values are given for the n-step returns, None otherwise
+TransitionBatch = namedtuple('TransitionBatch', 'idxs, state0, action, reward, state1, terminal1, weights, discount')
+
+
+def allocate_in_memory(name, shape, dtype):
+    """
+    Function for allocating a column of the replay memory in memory, the default allocator.
+
+    :param name: the name of the column
+    :param shape: the shape of the column
+    :param dtype: the type of the column
+    :return: the zero-filled array
+    """
+
+    return np.zeros(shape, dtype=dtype)
+
+
+def memmap_allocator(directory):
+    """
+    Function for creating an allocator of the columns of the replay memory in memory-mapped `.npy` files in the given
+    directory, one file per column. The existing files are opened again, such that the replay memory can exceed the
+    RAM and survives the restarts of the process without serialization.
+
+    :param directory: the directory of the files, created if it does not exist
+    :return: the allocator, a function of the name, the shape and the type of the column
+    """
+
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    def allocate_memmap(name, shape, dtype):
+        path = os.path.join(directory, name + '.npy')
+
+        if not os.path.exists(path):
+            return np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+
+        column = np.lib.format.open_memmap(path, mode='r+')
+        if column.shape != tuple(shape) or column.dtype != np.dtype(dtype):
+            raise ValueError("The file %s holds a column of shape %s and type %s, instead of %s and %s" % (
+                path, column.shape, column.dtype, tuple(shape), np.dtype(dtype)))
+
+        return column
+
+    return allocate_memmap
+
+
+def _flush_columns(obj):
+    """
+    Private function for flushing the memory-mapped columns of an object to the disk.
+
+    :param obj: the object holding the columns
+    :return:
+    """
+
+    for value in vars(obj).values():
+        if isinstance(value, np.memmap):
+            value.flush()
+
+
+class GOObservationStorage(object):
+    """
+    Class for the dense storage of the observations in the replay memory, one row per entry.
+
+    # Class members:
+
+        - ** observation_dim **: the dimension of the observations
+        - ** observations **: array of shape (limit, observation_dim), the observations
+    """
+
+    def __init__(self, limit=None, observation_dim=None, observation_dtype=np.float32, allocate=allocate_in_memory):
+        """
+        Constructor of the `GOObservationStorage` class.
+
+        :param limit: the maximal number of entries
+        :param observation_dim: the dimension of the observations
+        :param observation_dtype: the type of the stored observations
+        :param allocate: the allocator of the columns, in memory or memory-mapped
+        """
+
+        self.observation_dim = observation_dim
+        self.observations = allocate('observations', (limit, observation_dim), observation_dtype)
+
+    @property
+    def nbytes(self):
+        """
+        Property for the number of bytes taken by the stored observations.
+
+        :return: the number of bytes
+        """
+
+        return self.observations.nbytes
+
+    def flush(self):
+        """
+        Method for flushing the memory-mapped columns to the disk, if any.
+
+        :return:
+        """
+
+        _flush_columns(self)
+
+    def write(self, idx, observation):
+        """
+        Method for writing the observation of one entry.
+
+        :param idx: the entry index
+        :param observation: the observation, flat
+        :return:
+        """
+
+        self.observations[idx] = observation
+
+    def write_batch(self, idxs, observations):
+        """
+        Method for writing the observations of many entries.
+
+        :param idxs: array of entry indices, without duplicates
+        :param observations: array of shape (len(idxs), observation_dim), the observations
+        :return:
+        """
+
+        self.observations[idxs] = observations
+
+    def read(self, idxs):
+        """
+        Method for reading the observations of many entries.
+
+        :param idxs: array of entry indices
+        :return: array of shape (len(idxs), observation_dim), the observations as float32
+        """
+
+        return self.observations[idxs].astype(np.float32, copy=False)
+
+
+class GOBitPackedObservationStorage(GOObservationStorage):
+    """
+    Class for the bit-packed storage of the observations in the replay memory, for observations made mostly of 0/1
+    features, like the dialogue states of the `GORuleBasedStateTracker`. The binary features are packed in bits with
+    `np.packbits` and the few real-valued features are kept in a small float type, such that an entry takes about
+    one byte per eight binary features. The observations are unpacked only for the sampled minibatches.
+    Extends the `GOObservationStorage` class.
+
+    The binary features must be exactly 0 or 1, any other value is stored as 1.
+
+    # Class members:
+
+        - ** binary_idxs **: array of the indices of the binary features in the observation
+        - ** scalar_idxs **: array of the indices of the real-valued features in the observation
+        - ** packed_binaries **: array of shape (limit, ceil(nb_binary / 8)), the packed binary features
+        - ** scalars **: array of shape (limit, nb_scalars), the real-valued features
+    """
+
+    def __init__(self, limit=None, binary_mask=None, scalar_dtype=np.float16, allocate=allocate_in_memory):
+        """
+        Constructor of the `GOBitPackedObservationStorage` class.
+
+        :param limit: the maximal number of entries
+        :param binary_mask: boolean array of shape (observation_dim,), True for the binary features
+        :param scalar_dtype: the type of the stored real-valued features, float16 or float32
+        :param allocate: the allocator of the columns, in memory or memory-mapped
+        """
+
+        binary_mask = np.asarray(binary_mask, dtype=np.bool_)
+
+        self.observation_dim = len(binary_mask)
+        self.binary_idxs = np.flatnonzero(binary_mask)
+        self.scalar_idxs = np.flatnonzero(~binary_mask)
+
+        self.packed_binaries = allocate('packed_binaries', (limit, (len(self.binary_idxs) + 7) // 8), np.uint8)
+        self.scalars = allocate('scalars', (limit, len(self.scalar_idxs)), scalar_dtype)
+
+    @property
+    def nbytes(self):
+        """
+        Property for the number of bytes taken by the stored observations. Overrides the super class property.
+        """
+
+        return self.packed_binaries.nbytes + self.scalars.nbytes
+
+    def write(self, idx, observation):
+        """
+        Method for packing and writing the observation of one entry. Overrides the super class method.
+        """
+
+        self.packed_binaries[idx] = np.packbits(observation[self.binary_idxs] != 0)
+        self.scalars[idx] = observation[self.scalar_idxs]
+
+    def write_batch(self, idxs, observations):
+        """
+        Method for packing and writing the observations of many entries. Overrides the super class method.
+        """
+
+        self.packed_binaries[idxs] = np.packbits(observations[:, self.binary_idxs] != 0, axis=1)
+        self.scalars[idxs] = observations[:, self.scalar_idxs]
+
+    def read(self, idxs):
+        """
+        Method for reading and unpacking the observations of many entries. Overrides the super class method.
+        """
+
+        observations = np.empty((len(idxs), self.observation_dim), dtype=np.float32)
+        observations[:, self.binary_idxs] = np.unpackbits(self.packed_binaries[idxs], axis=1,
+                                                          count=len(self.binary_idxs))
+        observations[:, self.scalar_idxs] = self.scalars[idxs]
+
+        return observations
+
+
+class GOArrayMemory(object):
+    """
+    Class for the uniform replay memory, keeping the transitions in preallocated NumPy arrays used as a ring buffer.
+    It follows the semantics of the keras-rl `SequentialMemory`, so it can be used in the `memory` slot of the
+    `GODQNAgent`: the entry appended in step t holds the observation, the action taken, the reward received and the
+    terminal flag, and its transition ends in the observation of the next entry. The entry appended right after a
+    terminal entry is the last observation of the episode, so it does not start a valid transition.
+
+    The dialogue states are already full states, so the window length is always 1.
+
+    With n-step returns, the reward of a sampled transition is the discounted sum of the rewards of the next
+    ** nb_steps ** entries, cut at the end of the episode and at the newest entry, and its next state is the state
+    after the last summed reward. The returns are computed for the whole minibatch at once, over an array of shape
+    (batch_size, nb_steps) of the entry indices.
+
+    The columns of the memory, including the write head, are created by the allocator, either in memory or in
+    memory-mapped files with `memmap_allocator`. The memory-mapped memory continues from its files after a restart of
+    the process, if it is created with the same allocator, limit and storage. The storage of the observations should be
+    created with the same allocator.
+
+    # Class members:
+
+        - ** limit **: the maximal number of entries, the oldest entries are overwritten afterwards
+        - ** window_length **: the number of observations in a state, always 1
+        - ** nb_steps **: the number of rewards summed in the returns, 1 for the one-step returns
+        - ** gamma **: the discount reward factor of the n-step returns
+        - ** observation_dim **: the dimension of the observations
+        - ** storage **: the storage of the observations, dense or bit-packed
+        - ** actions **: array of shape (limit,), the actions
+        - ** rewards **: array of shape (limit,), the rewards
+        - ** terminals **: boolean array of shape (limit,), the terminal flags
+        - ** post_terminals **: boolean array of shape (limit,), flags of the entries appended right after a terminal
+        - ** head **: array of shape (1,), the number of appended entries so far, including the overwritten ones
+    """
+
+    def __init__(self, limit=None, observation_dim=None, observation_dtype=np.float32, storage=None, nb_steps=1,
+                 gamma=None, allocate=allocate_in_memory, **kwargs):
+        """
+        Constructor of the `GOArrayMemory` class.
+
+        :param limit: the maximal number of entries
+        :param observation_dim: the dimension of the observations, ignored if the storage is given
+        :param observation_dtype: the type of the stored observations, ignored if the storage is given
+        :param storage: the storage of the observations with the same limit. If None, a dense storage is created
+        :param nb_steps: the number of rewards summed in the returns
+        :param gamma: the discount reward factor, required for the n-step returns. It should be the same as in the agent
+        :param allocate: the allocator of the columns, in memory or memory-mapped
+        """
+
+        window_length = kwargs.pop('window_length', 1)
+        assert window_length == 1
+        assert nb_steps == 1 or gamma is not None, 'the n-step returns need the discount reward factor'
+
+        self.limit = limit
+        self.window_length = window_length
+        self.nb_steps = nb_steps
+        self.gamma = gamma
+
+        if storage is None:
+            storage = GOObservationStorage(limit, observation_dim, observation_dtype, allocate)
+
+        self.storage = storage
+        self.observation_dim = storage.observation_dim
+
+        self.actions = allocate('actions', (limit,), np.int32)
+        self.rewards = allocate('rewards', (limit,), np.float32)
+        self.terminals = allocate('terminals', (limit,), np.bool_)
+        self.post_terminals = allocate('post_terminals', (limit,), np.bool_)
+
+        # the write head is updated after the entries are written
+        self.head = allocate('head', (1,), np.int64)
+
+    @property
+    def nb_appended(self):
+        """
+        Property for the number of appended entries so far, including the overwritten ones.
+
+        :return: the number of appended entries
+        """
+
+        return int(self.head[0])
+
+    @nb_appended.setter
+    def nb_appended(self, nb_appended):
+        self.head[0] = nb_appended
+
+    @property
+    def nb_entries(self):
+        """
+        Property for the number of entries in the memory.
+
+        :return: the number of entries
+        """
+
+        return min(self.nb_appended, self.limit)
+
+    def _write_entry(self, observation, action, reward, terminal):
+        """
+        Helper method for writing one entry at the head of the ring buffer.
+
+        :return: the index of the written entry
+        """
+
+        idx = self.nb_appended % self.limit
+        previous_idx = (idx - 1) % self.limit
+
+        self.storage.write(idx, np.ravel(observation))
+        self.actions[idx] = action
+        self.rewards[idx] = reward
+        self.terminals[idx] = terminal
+        self.post_terminals[idx] = self.nb_appended > 0 and self.terminals[previous_idx]
+
+        self.nb_appended += 1
+
+        return idx
+
+    def flush(self):
+        """
+        Method for flushing the memory-mapped columns to the disk, if any.
+
+        :return:
+        """
+
+        self.storage.flush()
+        _flush_columns(self)
+
+    def append(self, observation, action, reward, terminal, training=True):
+        """
+        Method for appending one entry, in the same form as in keras-rl.
+
+        :param observation: the observation
+        :param action: the action taken
+        :param reward: the reward received after the action
+        :param terminal: the flag indicating whether the episode ended after the action
+        :param training: the flag indicating the training mode, nothing is appended otherwise
+        :return:
+        """
+
+        if training:
+            self._write_entry(observation, action, reward, terminal)
+
+    def append_batch(self, observations, actions, rewards, terminals):
+        """
+        Method for appending many consecutive entries at once, for example whole demonstration dialogues, in the same
+        form as the entries appended one by one. If there are more entries than the limit, only the last ones are kept.
+
+        :param observations: array of shape (nb_entries, observation_dim), the observations
+        :param actions: array of shape (nb_entries,), the actions
+        :param rewards: array of shape (nb_entries,), the rewards
+        :param terminals: boolean array of shape (nb_entries,), the terminal flags
+        :return: array with the indices of the appended entries
+        """
+
+        observations = np.reshape(observations, (len(actions), self.observation_dim))
+        terminals = np.asarray(terminals, dtype=np.bool_)
+
+        # the terminal flag of the entry before each appended entry
+        previous_terminals = np.empty(len(terminals), dtype=np.bool_)
+        previous_terminals[0] = self.nb_appended > 0 and self.terminals[(self.nb_appended - 1) % self.limit]
+        previous_terminals[1:] = terminals[:-1]
+
+        nb_skipped = max(len(actions) - self.limit, 0)
+        self.nb_appended += nb_skipped
+
+        idxs = (self.nb_appended + np.arange(len(actions) - nb_skipped)) % self.limit
+        self.storage.write_batch(idxs, observations[nb_skipped:])
+        self.actions[idxs] = actions[nb_skipped:]
+        self.rewards[idxs] = rewards[nb_skipped:]
+        self.terminals[idxs] = terminals[nb_skipped:]
+        self.post_terminals[idxs] = previous_terminals[nb_skipped:]
+
+        self.nb_appended += len(idxs)
+
+        return idxs
+
+    def _valid_transitions(self, idxs):
+        """
+        Helper method for checking which entries start a valid transition. The newest entry has no next entry yet,
+        and the entries appended right after a terminal entry end in the next episode.
+
+        :param idxs: array of entry indices
+        :return: boolean array, True for the valid transitions
+        """
+
+        newest_idx = (self.nb_appended - 1) % self.limit
+        return (idxs != newest_idx) & ~self.post_terminals[idxs]
+
+    def _sample_idxs(self, batch_size):
+        """
+        Helper method for sampling the indices of valid transitions uniformly, by rejecting the invalid ones.
+
+        :param batch_size: the number of transitions
+        :return: array of entry indices
+        """
+
+        assert self.nb_entries > 2, 'not enough entries in the memory'
+
+        idxs = np.random.randint(self.nb_entries, size=batch_size)
+        invalid = ~self._valid_transitions(idxs)
+        while invalid.any():
+            idxs[invalid] = np.random.randint(self.nb_entries, size=invalid.sum())
+            invalid = ~self._valid_transitions(idxs)
+
+        return idxs
+
+    def _gather(self, idxs, weights):
+        """
+        Helper method for gathering the transitions starting at the given entries in arrays.
+
+        :param idxs: array of entry indices
+        :param weights: the importance-sampling weights of the transitions
+        :return: the minibatch as `TransitionBatch`
+        """
+
+        if self.nb_steps == 1:
+            rewards = self.rewards[idxs]
+            terminals = self.terminals[idxs]
+            next_idxs = (idxs + 1) % self.limit
+            discounts = None
+        else:
+            rewards, terminals, next_idxs, discounts = self._n_step_returns(idxs)
+
+        observations = self.storage.read(np.concatenate([idxs, next_idxs]))
+
+        return TransitionBatch(idxs, observations[:len(idxs)], self.actions[idxs], rewards, observations[len(idxs):],
+                               terminals, weights, discounts)
+
+    def _n_step_returns(self, idxs):
+        """
+        Helper method for computing the n-step returns of the transitions starting at the given entries.
+
+        :param idxs: array of entry indices
+        :return: the returns, the terminal flags, the indices of the next states and the discounts of their Q-values
+        """
+
+        steps = np.arange(self.nb_steps)
+        step_idxs = (idxs[:, np.newaxis] + steps) % self.limit
+
+        # only the entries before the newest one have a next state
+        nb_available = (self.nb_appended - 1 - idxs) % self.limit
+        summed = steps < nb_available[:, np.newaxis]
+
+        # the rewards after the end of the episode are not summed
+        step_terminals = self.terminals[step_idxs] & summed
+        summed &= np.cumsum(step_terminals, axis=1) - step_terminals == 0
+
+        nb_summed = summed.sum(axis=1)
+        rewards = (self.rewards[step_idxs] * summed).dot(self.gamma ** steps)
+        terminals = (step_terminals & summed).any(axis=1)
+
+        return rewards.astype(np.float32), terminals, (idxs + nb_summed) % self.limit, self.gamma ** nb_summed
+
+    def sample_batch(self, batch_size):
+        """
+        Method for sampling a minibatch of transitions uniformly, in arrays.
+
+        :param batch_size: the number of transitions
+        :return: the minibatch as `TransitionBatch`, with unit weights
+        """
+
+        idxs = self._sample_idxs(batch_size)
+        return self._gather(idxs, np.ones(batch_size, dtype=np.float32))
+
+    def sample(self, batch_size, batch_idxs=None):
+        """
+        Method for sampling a minibatch of transitions, in the same form as in keras-rl.
+
+        :param batch_size: the number of transitions
+        :param batch_idxs: the indices of the entries starting the transitions. If None, they are sampled
+        :return: list of `Experience`
+        """
+
+        if batch_idxs is None:
+            batch = self.sample_batch(batch_size)
+        else:
+            batch = self._gather(np.asarray(batch_idxs), np.ones(len(batch_idxs), dtype=np.float32))
+
+        return [Experience([state0], action, reward, [state1], terminal1) for state0, action, reward, state1, terminal1
+                in zip(batch.state0, batch.action, batch.reward, batch.state1, batch.terminal1)]
+
+    def get_recent_state(self, current_observation):
+        """
+        Method for getting the state of the current observation, in the same form as in keras-rl.
+
+        :param current_observation: the current observation
+        :return: the state as a list of window_length observations
+        """
+
+        return [current_observation]
+
+    def get_config(self):
+        """
+        Method for getting the configuration of the memory, in the same form as in keras-rl.
+
+        :return: the configuration as a dictionary
+        """
+
+        return {'limit': self.limit, 'window_length': self.window_length, 'observation_dim': self.observation_dim,
+                'nb_steps': self.nb_steps, 'gamma': self.gamma}
+
+
+class GOSumTree(object):
+    """
+    Class for the sum-tree over the priorities of the entries, kept in one array. Each inner node holds the sum of its
+    two children and the root holds the total priority, such that an entry can be sampled with probability
+    proportional to its priority in O(log n), by descending the tree. The updates and the descents are vectorized
+    over a whole minibatch, one tree level at a time.
+
+    # Class members:
+
+        - ** capacity **: the number of leaves, the smallest power of two not less than the number of entries
+        - ** depth **: the number of levels below the root
+        - ** tree **: array of shape (2 * capacity,), the root at index 1 and the leaves from index capacity on
+    """
+
+    def __init__(self, size=None, allocate=allocate_in_memory):
+        """
+        Constructor of the `GOSumTree` class.
+
+        :param size: the number of entries
+        :param allocate: the allocator of the tree, in memory or memory-mapped
+        """
+
+        self.depth = max(int(np.ceil(np.log2(size))), 1)
+        self.capacity = 2 ** self.depth
+        self.tree = allocate('sum_tree', (2 * self.capacity,), np.float64)
+
+    @property
+    def total(self):
+        """
+        Property for the total priority of all entries.
+
+        :return: the total priority
+        """
+
+        return self.tree[1]
+
+    def get(self, idxs):
+        """
+        Method for getting the priorities of the entries.
+
+        :param idxs: array of entry indices
+        :return: array of the priorities
+        """
+
+        return self.tree[self.capacity + np.asarray(idxs)]
+
+    def update(self, idxs, priorities):
+        """
+        Method for updating the priorities of the entries and the sums on their paths to the root.
+
+        :param idxs: array of entry indices
+        :param priorities: array of the new priorities
+        :return:
+        """
+
+        nodes = self.capacity + np.asarray(idxs)
+        self.tree[nodes] = priorities
+
+        for _ in range(self.depth):
+            nodes = np.unique(nodes // 2)
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+
+    def update_one(self, idx, priority):
+        """
+        Method for updating the priority of one entry, cheaper than the vectorized update for a single entry.
+
+        :param idx: the entry index
+        :param priority: the new priority
+        :return:
+        """
+
+        tree = self.tree
+        node = self.capacity + idx
+        tree[node] = priority
+
+        node //= 2
+        while node > 0:
+            tree[node] = tree[2 * node] + tree[2 * node + 1]
+            node //= 2
+
+    def find(self, values):
+        """
+        Method for finding the entries where the cumulative priority reaches the given values.
+
+        :param values: array of values in [0, total)
+        :return: array of entry indices
+        """
+
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+
+        for _ in range(self.depth):
+            left_sums = self.tree[2 * nodes]
+            go_right = values >= left_sums
+            values -= left_sums * go_right
+            nodes = 2 * nodes + go_right
+
+        return nodes - self.capacity
+
+
+class GOPrioritizedMemory(GOArrayMemory):
+    """
+    Class for the prioritized replay memory, sampling the transitions with probability proportional to their
+    priority, computed from their last TD error. The rare transitions with large TD errors, like the ones with the
+    reward at the end of a successful dialogue, are replayed more often than under uniform sampling, and the bias is
+    corrected with importance-sampling weights. Extends the `GOArrayMemory` class.
+
+    The new transitions get the maximal priority so far, such that they are replayed at least once. The entries which
+    do not start a valid transition have zero priority and they are never sampled.
+
+    # Class members:
+
+        - ** alpha **: the exponent of the TD errors, 0 for uniform sampling
+        - ** beta **: the exponent of the importance-sampling weights, annealed to 1
+        - ** beta_increment **: the increment of beta after each sampled minibatch
+        - ** epsilon **: the constant added to the absolute TD errors, such that no priority is zero
+        - ** max_priority **: the maximal priority so far
+        - ** sum_tree **: the sum-tree over the priorities of the entries
+    """
+
+    def __init__(self, limit=None, observation_dim=None, observation_dtype=np.float32, storage=None, nb_steps=1,
+                 gamma=None, allocate=allocate_in_memory, alpha=0.6, beta=0.4, beta_increment=1e-6, epsilon=1e-6,
+                 **kwargs):
+        """
+        Constructor of the `GOPrioritizedMemory` class.
+        """
+
+        super(GOPrioritizedMemory, self).__init__(limit, observation_dim, observation_dtype, storage, nb_steps, gamma,
+                                                  allocate, **kwargs)
+
+        self.alpha = alpha
+        self.beta = beta
+        self.beta_increment = beta_increment
+        self.epsilon = epsilon
+
+        self.sum_tree = GOSumTree(limit, allocate)
+
+        # the maximal priority is not stored, a reopened memory starts from its maximal stored priority
+        self.max_priority = max(1.0, float(self.sum_tree.get(np.arange(limit)).max()))
+
+    def flush(self):
+        """
+        Method for flushing the memory-mapped columns and the sum-tree to the disk, if any.
+        Overrides the super class method.
+        """
+
+        super(GOPrioritizedMemory, self).flush()
+        _flush_columns(self.sum_tree)
+
+    def append(self, observation, action, reward, terminal, training=True):
+        """
+        Method for appending one entry, in the same form as in keras-rl. Overrides the super class method.
+        The previous entry now starts a valid transition, so it gets the maximal priority, if it is not the last
+        observation of an episode.
+        """
+
+        if not training:
+            return
+
+        idx = self._write_entry(observation, action, reward, terminal)
+        previous_idx = (idx - 1) % self.limit
+
+        self.sum_tree.update_one(idx, 0.0)
+        if self.nb_appended > 1 and not self.post_terminals[previous_idx]:
+            self.sum_tree.update_one(previous_idx, self.max_priority)
+
+    def append_batch(self, observations, actions, rewards, terminals):
+        """
+        Method for appending many consecutive entries at once. Overrides the super class method. The entries which
+        start a valid transition, including the previous newest entry, get the maximal priority.
+        """
+
+        previous_idx = (self.nb_appended - 1) % self.limit
+        has_previous = self.nb_appended > 0
+
+        idxs = super(GOPrioritizedMemory, self).append_batch(observations, actions, rewards, terminals)
+
+        updated_idxs = idxs
+        if has_previous and previous_idx not in idxs:
+            updated_idxs = np.concatenate([[previous_idx], idxs])
+
+        priorities = np.where(self._valid_transitions(updated_idxs), self.max_priority, 0.0)
+        self.sum_tree.update(updated_idxs, priorities)
+
+        return idxs
+
+    def _sample_idxs(self, batch_size):
+        """
+        Helper method for sampling the indices of valid transitions proportionally to their priorities, with one
+        value from each of batch_size equal segments of the total priority. Overrides the super class method.
+        """
+
+        assert self.nb_entries > 2, 'not enough entries in the memory'
+
+        total = self.sum_tree.total
+        values = (np.arange(batch_size) + np.random.random_sample(batch_size)) * (total / batch_size)
+        idxs = self.sum_tree.find(np.minimum(values, np.nextafter(total, 0)))
+
+        # the rounding errors in the sums might reach an entry with zero priority
+        invalid = self.sum_tree.get(idxs) <= 0
+        while invalid.any():
+            idxs[invalid] = self.sum_tree.find(np.random.random_sample(invalid.sum()) * total)
+            invalid = self.sum_tree.get(idxs) <= 0
+
+        return idxs
+
+    def sample_batch(self, batch_size):
+        """
+        Method for sampling a minibatch of transitions proportionally to their priorities, in arrays.
+        Overrides the super class method.
+
+        :param batch_size: the number of transitions
+        :return: the minibatch as `TransitionBatch`, with the importance-sampling weights normalized by their maximum
+        """
+
+        idxs = self._sample_idxs(batch_size)
+
+        probabilities = self.sum_tree.get(idxs) / self.sum_tree.total
+        weights = (self.nb_entries * probabilities) ** -self.beta
+        weights /= weights.max()
+
+        self.beta = min(1.0, self.beta + self.beta_increment)
+
+        return self._gather(idxs, weights.astype(np.float32))
+
+    def update_priorities(self, idxs, td_errors):
+        """
+        Method for updating the priorities of the sampled transitions with their new TD errors.
+
+        :param idxs: array of entry indices, as in the sampled minibatch
+        :param td_errors: array of the TD errors
+        :return:
+        """
+
+        priorities = (np.abs(td_errors) + self.epsilon) ** self.alpha
+
+        # the transitions which got invalid in the meantime keep zero priority
+        priorities = np.where(self._valid_transitions(idxs), priorities, 0.0)
+
+        self.sum_tree.update(idxs, priorities)
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+
+    def get_config(self):
+        """
+        Method for getting the configuration of the memory. Overrides the super class method.
+        """
+
+        config = super(GOPrioritizedMemory, self).get_config()
+        config.update({'alpha': self.alpha, 'beta': self.beta, 'beta_increment': self.beta_increment,
+                       'epsilon': self.epsilon})
+
+        return config
+
+
+def benchmark_sampling(memory, nb_transitions, batch_size=32, nb_batches=1000):
+    """
+    Benchmark of the cost of sampling minibatches and updating their priorities, once the memory holds the given
+    number of transitions of random dialogues.
+
+    :param memory: the memory to benchmark
+    :param nb_transitions: the number of transitions to append
+    :param batch_size: the number of transitions in a minibatch
+    :param nb_batches: the number of sampled minibatches
+    :return: dictionary with the seconds per appended transition, per sampled minibatch and per priority update,
+    and the bytes per stored observation
+    """
+
+    observation = np.zeros(memory.observation_dim)
+
+    start_time = time.time()
+    for step in range(nb_transitions):
+        terminal = step % 20 == 19
+        memory.append(observation, step % 40, 50.0 if terminal else -1.0, terminal)
+    append_duration = time.time() - start_time
+
+    sample_duration = 0.0
+    update_duration = 0.0
+    for _ in range(nb_batches):
+        start_time = time.time()
+        batch = memory.sample_batch(batch_size)
+        sample_duration += time.time() - start_time
+
+        if hasattr(memory, 'update_priorities'):
+            start_time = time.time()
+            memory.update_priorities(batch.idxs, np.random.randn(batch_size))
+            update_duration += time.time() - start_time
+
+    return {'memory': type(memory).__name__, 'nb_transitions': nb_transitions, 'batch_size': batch_size,
+            'seconds_per_append': append_duration / nb_transitions, 'seconds_per_batch': sample_duration / nb_batches,
+            'seconds_per_priority_update': update_duration / nb_batches,
+            'bytes_per_observation': memory.storage.nbytes / float(memory.limit)}
+
+
+def main(params):
+    for memory_class in [GOArrayMemory, GOPrioritizedMemory]:
+        np.random.seed(params['seed'])
+
+        allocate = allocate_in_memory
+        if params['memmap_directory'] is not None:
+            allocate = memmap_allocator(os.path.join(params['memmap_directory'], memory_class.__name__))
+
+        storage = None
+        if params['nb_scalar_features'] > 0:
+            # the scalar features at the end, like the scaled KB counts of the dialogue state
+            nb_binary_features = params['observation_dim'] - params['nb_scalar_features']
+            binary_mask = np.arange(params['observation_dim']) < nb_binary_features
+            storage = GOBitPackedObservationStorage(params['nb_transitions'], binary_mask, allocate=allocate)
+
+        memory = memory_class(params['nb_transitions'], params['observation_dim'], storage=storage, allocate=allocate)
+        print(json.dumps(benchmark_sampling(memory, params['nb_transitions'], params['batch_size'],
+                                            params['nb_batches'])))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--nb_transitions', dest='nb_transitions', type=int, default=1000000,
+                        help='the number of transitions in the memory')
+    parser.add_argument('--observation_dim', dest='observation_dim', type=int, default=192,
+                        help='the dimension of the observations')
+    parser.add_argument('--nb_scalar_features', dest='nb_scalar_features', type=int, default=0,
+                        help='the number of real-valued features, the others are binary and bit-packed. '
+                             'If 0, the observations are stored dense')
+    parser.add_argument('--memmap_directory', dest='memmap_directory', type=str, default=None,
+                        help='the directory of the memory-mapped columns. If None, the columns are in memory')
+    parser.add_argument('--batch_size', dest='batch_size', type=int, default=32, help='the minibatch size')
+    parser.add_argument('--nb_batches', dest='nb_batches', type=int, default=1000,
+                        help='the number of sampled minibatches')
+    parser.add_argument('--seed', dest='seed', type=int, default=1, help='the random seed')
+
+    args = parser.parse_args()
+    params = vars(args)
+
+    print ("Replay Memory Benchmark Parameters:")
+    print (json.dumps(params, indent=2))
+
+    main(params)
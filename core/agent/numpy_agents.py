@@ -0,0 +1,515 @@
+"""
+Author: Vladimir Ilievski <ilievski.vladimir@live.com>
+
+A Python file for the Goal-Oriented Dialogue agents implemented in pure NumPy, without keras-rl, keras or TensorFlow.
+"""
+
+from core.agent.memory import GOArrayMemory
+
+import os
+
+import numpy as np
+
+
+def select_actions_eps_greedy(q_values, eps=0.0):
+    """
+    Function for selecting the actions of a batch of states with the epsilon-greedy policy, over masked Q-values where
+    the masked actions have Q-value of -inf. The random actions are sampled only among the allowed actions.
+
+    :param q_values: array of shape (nb_states, nb_actions) with the Q-values, -inf for the masked actions
+    :param eps: the probability of taking a random action
+    :return: array of shape (nb_states,) with the selected actions
+    """
+
+    actions = np.argmax(q_values, axis=1)
+
+    explore = np.random.uniform(size=len(q_values)) < eps
+    if explore.any():
+        # sample uniformly among the allowed actions, by ranking the allowed actions with random keys
+        random_keys = np.where(np.isfinite(q_values[explore]), np.random.uniform(size=q_values[explore].shape), -1.0)
+        actions[explore] = np.argmax(random_keys, axis=1)
+
+    return actions
+
+
+class GONumpyQNetwork(object):
+    """
+    Class for the Q-network implemented in NumPy, a multi-layer perceptron with ReLU hidden layers and a linear output
+    layer with one Q-value per action. All weights are views of one flat float32 array, such that the network can be
+    copied, averaged or shared between processes as a single buffer.
+
+    # Class members:
+
+        - ** layer_dims **: the dimensions of the input, the hidden layers and the output
+        - ** flat_weights **: the flat array holding all weights
+        - ** weights **: list of the weight matrices and the biases of the layers, views of the flat weights
+    """
+
+    def __init__(self, input_dim=None, hidden_dims=(80,), nb_actions=None, flat_weights=None):
+        """
+        Constructor of the `GONumpyQNetwork` class.
+
+        :param input_dim: the dimension of the states
+        :param hidden_dims: the dimensions of the hidden layers
+        :param nb_actions: the number of actions
+        :param flat_weights: the flat array to hold the weights, for example a shared buffer. If None, a new array is
+        created and initialized
+        """
+
+        self.layer_dims = [input_dim] + list(hidden_dims) + [nb_actions]
+
+        shapes = []
+        for fan_in, fan_out in zip(self.layer_dims[:-1], self.layer_dims[1:]):
+            shapes += [(fan_in, fan_out), (fan_out,)]
+
+        initialize = flat_weights is None
+        if initialize:
+            flat_weights = np.zeros(sum(int(np.prod(shape)) for shape in shapes), dtype=np.float32)
+
+        self.flat_weights = flat_weights
+        self.weights = self.views(flat_weights)
+
+        if initialize:
+            # He initialization of the weight matrices, zero biases
+            for W in self.weights[::2]:
+                W[:] = np.random.randn(*W.shape) * np.sqrt(2.0 / W.shape[0])
+
+    @property
+    def nb_weights(self):
+        """
+        Property for the number of all weights.
+
+        :return: the number of weights
+        """
+
+        return len(self.flat_weights)
+
+    def views(self, flat_array):
+        """
+        Method for splitting a flat array, of the same size as the flat weights, in views shaped like the weights of
+        the layers.
+
+        :param flat_array: the flat array
+        :return: list of the views
+        """
+
+        views = []
+        offset = 0
+        for fan_in, fan_out in zip(self.layer_dims[:-1], self.layer_dims[1:]):
+            views.append(flat_array[offset:offset + fan_in * fan_out].reshape(fan_in, fan_out))
+            offset += fan_in * fan_out
+            views.append(flat_array[offset:offset + fan_out])
+            offset += fan_out
+
+        return views
+
+    def forward(self, states):
+        """
+        Method for computing the Q-values of a batch of states.
+
+        :param states: array of shape (nb_states, input_dim)
+        :return: array of shape (nb_states, nb_actions) with the Q-values, and the list of the inputs of each layer
+        """
+
+        activations = [np.asarray(states, dtype=np.float32)]
+        nb_layers = len(self.weights) // 2
+
+        outputs = activations[0]
+        for layer_nb in range(nb_layers):
+            outputs = outputs.dot(self.weights[2 * layer_nb]) + self.weights[2 * layer_nb + 1]
+            if layer_nb < nb_layers - 1:
+                outputs = np.maximum(outputs, 0.0)
+                activations.append(outputs)
+
+        return outputs, activations
+
+    def backward(self, activations, output_grads, flat_grads):
+        """
+        Method for back-propagating the gradients of the loss with respect to the Q-values, through the network.
+
+        :param activations: the list of the inputs of each layer, from the forward pass
+        :param output_grads: array of shape (nb_states, nb_actions), the gradients with respect to the Q-values
+        :param flat_grads: the flat array for the gradients of all weights, of the same size as the flat weights
+        :return: the flat gradients
+        """
+
+        grads = self.views(flat_grads)
+        nb_layers = len(self.weights) // 2
+
+        delta = output_grads
+        for layer_nb in reversed(range(nb_layers)):
+            grads[2 * layer_nb][:] = activations[layer_nb].T.dot(delta)
+            grads[2 * layer_nb + 1][:] = delta.sum(axis=0)
+
+            if layer_nb > 0:
+                # the gradients flow only through the active ReLU units
+                delta = delta.dot(self.weights[2 * layer_nb].T) * (activations[layer_nb] > 0)
+
+        return flat_grads
+
+    def get_weights(self):
+        """
+        Method for getting copies of the weights of the layers, in the same form as in keras.
+
+        :return: list of the weight matrices and the biases
+        """
+
+        return [weights.copy() for weights in self.weights]
+
+    def set_weights(self, weights):
+        """
+        Method for setting the weights of the layers, in the same form as in keras.
+
+        :param weights: list of the weight matrices and the biases
+        :return:
+        """
+
+        for own_weights, new_weights in zip(self.weights, weights):
+            own_weights[:] = new_weights
+
+    @staticmethod
+    def from_weights(weights):
+        """
+        Static method for creating the Q-network with the given weights of the layers, in the same form as in keras.
+
+        :param weights: list of the weight matrices and the biases
+        :return: the Q-network
+        """
+
+        q_network = GONumpyQNetwork(input_dim=weights[0].shape[0], hidden_dims=[W.shape[1] for W in weights[:-2:2]],
+                                    nb_actions=weights[-2].shape[1])
+        q_network.set_weights(weights)
+
+        return q_network
+
+
+class GOAdamOptimizer(object):
+    """
+    Class for the Adam optimizer, updating a flat array of weights in place with a flat array of gradients.
+
+    # Class members:
+
+        - ** learning_rate **: the learning rate
+        - ** beta_1 **: the decay rate of the first moment estimates
+        - ** beta_2 **: the decay rate of the second moment estimates
+        - ** epsilon **: the constant added to the square root of the second moment estimates
+        - ** m **: the first moment estimates
+        - ** v **: the second moment estimates
+        - ** nb_updates **: the number of updates so far
+    """
+
+    def __init__(self, nb_weights=None, learning_rate=1e-3, beta_1=0.9, beta_2=0.999, epsilon=1e-8):
+        """
+        Constructor of the `GOAdamOptimizer` class.
+
+        :param nb_weights: the number of weights to optimize
+        """
+
+        self.learning_rate = learning_rate
+        self.beta_1 = beta_1
+        self.beta_2 = beta_2
+        self.epsilon = epsilon
+
+        self.m = np.zeros(nb_weights, dtype=np.float32)
+        self.v = np.zeros(nb_weights, dtype=np.float32)
+        self.nb_updates = 0
+
+    def update(self, flat_weights, flat_grads):
+        """
+        Method for updating the weights with the gradients, in place.
+
+        :param flat_weights: the flat array of the weights
+        :param flat_grads: the flat array of the gradients
+        :return:
+        """
+
+        self.nb_updates += 1
+
+        self.m *= self.beta_1
+        self.m += (1.0 - self.beta_1) * flat_grads
+        self.v *= self.beta_2
+        self.v += (1.0 - self.beta_2) * np.square(flat_grads)
+
+        step_size = self.learning_rate * np.sqrt(1.0 - self.beta_2 ** self.nb_updates) / (
+            1.0 - self.beta_1 ** self.nb_updates)
+        flat_weights -= step_size * self.m / (np.sqrt(self.v) + self.epsilon)
+
+
+class GONumpyDQNAgent(object):
+    """
+    Class for the Goal-Oriented agent with a DQN-based policy learning, implemented in pure NumPy. It has the same
+    `forward`/`backward` surface as the `GODQNAgent`, but it does not import keras-rl, keras or TensorFlow, such that
+    the rollout workers and the serving processes stay lightweight.
+
+    The Q-network is a multi-layer perceptron trained with the Huber loss and the Adam optimizer, against a target
+    network updated either hard, every ** target_model_update ** steps, or soft, after each training step if it is
+    below 1. If the memory is prioritized, the loss of each transition is weighted with its importance-sampling
+    weight, and the priorities are updated with the new TD errors.
+
+    # Class members:
+
+        - ** nb_actions **: the number of all possible actions
+        - ** observation_dim **: the dimension of the states
+        - ** memory **: the replay memory, `GOArrayMemory` or `GOPrioritizedMemory`
+        - ** q_network **: the online Q-network
+        - ** target_network **: the target Q-network
+        - ** optimizer **: the Adam optimizer of the online Q-network
+        - ** gamma **: the discount reward factor
+        - ** batch_size **: the number of transitions in a replayed minibatch
+        - ** nb_steps_warmup **: the number of steps before the training starts
+        - ** train_interval **: the number of steps between two training steps
+        - ** memory_interval **: the number of steps between two stored transitions
+        - ** target_model_update **: the number of steps between the hard updates of the target network, or the rate of
+                                the soft updates if below 1
+        - ** enable_double_dqn **: whether the online network selects the next actions in the targets
+        - ** delta_clip **: the threshold of the Huber loss
+        - ** eps **: the probability of taking a random action in training
+        - ** test_eps **: the probability of taking a random action in testing
+        - ** action_mask_fn **: function producing the boolean mask of the allowed actions in the current state. If
+                            None, all actions are allowed
+        - ** training **: whether the agent is training
+        - ** step **: the number of steps so far
+    """
+
+    metrics_names = ['loss', 'mean_q']
+
+    def __init__(self, nb_actions=None, observation_dim=None, memory=None, hidden_dims=(80,), gamma=0.9,
+                 batch_size=16, nb_steps_warmup=1000, train_interval=1, memory_interval=1, target_model_update=10000,
+                 enable_double_dqn=True, delta_clip=1.0, learning_rate=1e-3, eps=0.1, test_eps=0.0,
+                 action_mask_fn=None, memory_limit=100000):
+        """
+        Constructor of the `GONumpyDQNAgent` class.
+
+        :param memory: the replay memory. If None, a uniform memory of ** memory_limit ** entries is created
+        :param hidden_dims: the dimensions of the hidden layers of the Q-network
+        :param learning_rate: the learning rate of the Adam optimizer
+        :param memory_limit: the number of entries of the created memory
+        """
+
+        self.nb_actions = nb_actions
+        self.observation_dim = observation_dim
+
+        if memory is None:
+            memory = GOArrayMemory(memory_limit, observation_dim)
+        self.memory = memory
+
+        self.q_network = GONumpyQNetwork(observation_dim, hidden_dims, nb_actions)
+        self.target_network = GONumpyQNetwork(observation_dim, hidden_dims, nb_actions)
+        self.update_target_model_hard()
+
+        self.optimizer = GOAdamOptimizer(self.q_network.nb_weights, learning_rate)
+        self.__flat_grads = np.zeros(self.q_network.nb_weights, dtype=np.float32)
+
+        self.gamma = gamma
+        self.batch_size = batch_size
+        self.nb_steps_warmup = nb_steps_warmup
+        self.train_interval = train_interval
+        self.memory_interval = memory_interval
+        self.target_model_update = target_model_update
+        self.enable_double_dqn = enable_double_dqn
+        self.delta_clip = delta_clip
+
+        self.eps = eps
+        self.test_eps = test_eps
+        self.action_mask_fn = action_mask_fn
+
+        self.training = True
+        self.step = 0
+
+        self.recent_observation = None
+        self.recent_action = None
+
+    def reset_states(self):
+        """
+        Method for resetting the agent at the beginning of an episode.
+
+        :return:
+        """
+
+        self.recent_observation = None
+        self.recent_action = None
+
+    def compute_q_values(self, observations):
+        """
+        Method for computing the Q-values of a batch of observations with the online network.
+
+        :param observations: array of shape (nb_observations, observation_dim)
+        :return: array of shape (nb_observations, nb_actions) with the Q-values
+        """
+
+        q_values, _ = self.q_network.forward(np.reshape(observations, (-1, self.observation_dim)))
+        return q_values
+
+    def forward_batch(self, observations, action_masks=None):
+        """
+        Method for selecting the actions of a batch of observations, for example of many dialogues served at once.
+        Nothing is stored for the next backward pass.
+
+        :param observations: array of shape (nb_observations, observation_dim)
+        :param action_masks: boolean array of shape (nb_observations, nb_actions), True for the allowed actions. If
+        None, all actions are allowed
+        :return: array of shape (nb_observations,) with the selected actions
+        """
+
+        q_values = self.compute_q_values(observations)
+        if action_masks is not None:
+            q_values = np.where(action_masks, q_values, -np.inf)
+
+        return select_actions_eps_greedy(q_values, self.eps if self.training else self.test_eps)
+
+    def forward(self, observation):
+        """
+        Method for selecting the next action given the observation. The Q-values of the actions which are not allowed
+        in the current state are set to -inf, before the policy selects an action.
+
+        :param observation: the observation from the environment
+        :return: the selected action
+        """
+
+        action_masks = None
+        if self.action_mask_fn is not None:
+            action_masks = np.reshape(self.action_mask_fn(), (1, self.nb_actions))
+
+        action = int(self.forward_batch(observation, action_masks)[0])
+
+        # book-keeping
+        self.recent_observation = observation
+        self.recent_action = action
+
+        return action
+
+    def backward(self, reward, terminal):
+        """
+        Method for storing the last transition in the memory and training the Q-network on a replayed minibatch. The
+        agent has no keras-rl `fit` loop, so the step counter is advanced here, after each transition.
+
+        :param reward: the reward received after the last action
+        :param terminal: the flag indicating whether the episode ended after the last action
+        :return: the training metrics
+        """
+
+        if self.step % self.memory_interval == 0:
+            self.memory.append(self.recent_observation, self.recent_action, reward, terminal, training=self.training)
+
+        metrics = [np.nan for _ in self.metrics_names]
+        if self.training:
+            if self.step > self.nb_steps_warmup and self.step % self.train_interval == 0:
+                metrics = self.train_on_batch(self.memory.sample_batch(self.batch_size))
+
+                if self.target_model_update < 1:
+                    self.update_target_model_soft()
+
+            if self.target_model_update >= 1 and self.step % self.target_model_update == 0:
+                self.update_target_model_hard()
+
+        self.step += 1
+
+        return metrics
+
+    def train_on_batch(self, batch):
+        """
+        Method for one training step of the Q-network on a minibatch of transitions in arrays.
+
+        :param batch: the minibatch as `TransitionBatch`
+        :return: the training metrics, the loss and the mean Q-value
+        """
+
+        batch_size = len(batch.action)
+        batch_range = np.arange(batch_size)
+
+        target_q_values, _ = self.target_network.forward(batch.state1)
+        if self.enable_double_dqn:
+            q_batch = target_q_values[batch_range, np.argmax(self.compute_q_values(batch.state1), axis=1)]
+        else:
+            q_batch = np.max(target_q_values, axis=1)
+
+        # the n-step returns give the discounts of the bootstrapped Q-values
+        discounts = self.gamma if batch.discount is None else batch.discount
+        Rs = batch.reward + discounts * q_batch * (1.0 - batch.terminal1)
+
+        q_values, activations = self.q_network.forward(batch.state0)
+        td_errors = q_values[batch_range, batch.action] - Rs
+
+        if hasattr(self.memory, 'update_priorities'):
+            self.memory.update_priorities(batch.idxs, td_errors)
+
+        # the Huber loss, quadratic within the clip and linear outside of it
+        abs_td_errors = np.abs(td_errors)
+        quadratic = np.minimum(abs_td_errors, self.delta_clip)
+        losses = 0.5 * np.square(quadratic) + self.delta_clip * (abs_td_errors - quadratic)
+        loss = np.mean(batch.weights * losses)
+
+        output_grads = np.zeros_like(q_values)
+        output_grads[batch_range, batch.action] = batch.weights * np.clip(td_errors, -self.delta_clip,
+                                                                          self.delta_clip) / batch_size
+
+        self.q_network.backward(activations, output_grads, self.__flat_grads)
+        self.optimizer.update(self.q_network.flat_weights, self.__flat_grads)
+
+        return [float(loss), float(np.mean(q_values))]
+
+    def update_target_model_hard(self):
+        """
+        Method for copying the weights of the online network to the target network.
+
+        :return:
+        """
+
+        self.target_network.flat_weights[:] = self.q_network.flat_weights
+
+    def update_target_model_soft(self):
+        """
+        Method for moving the weights of the target network towards the online network, with the rate
+        ** target_model_update **.
+
+        :return:
+        """
+
+        self.target_network.flat_weights *= 1.0 - self.target_model_update
+        self.target_network.flat_weights += self.target_model_update * self.q_network.flat_weights
+
+    def get_weights(self):
+        """
+        Method for getting copies of the weights of the online network.
+
+        :return: list of the weight matrices and the biases
+        """
+
+        return self.q_network.get_weights()
+
+    def set_weights(self, weights):
+        """
+        Method for setting the weights of the online and the target network.
+
+        :param weights: list of the weight matrices and the biases
+        :return:
+        """
+
+        self.q_network.set_weights(weights)
+        self.update_target_model_hard()
+
+    def save_weights(self, filepath, overwrite=False):
+        """
+        Method for saving the weights of the online network in a NumPy file.
+
+        :param filepath: the path to the file
+        :param overwrite: whether to overwrite an existing file
+        :return:
+        """
+
+        if not overwrite and os.path.exists(filepath):
+            raise IOError("The file %s already exists" % filepath)
+
+        with open(filepath, 'wb') as f:
+            np.save(f, self.q_network.flat_weights)
+
+    def load_weights(self, filepath):
+        """
+        Method for loading the weights of the online and the target network from a NumPy file.
+
+        :param filepath: the path to the file
+        :return:
+        """
+
+        self.q_network.flat_weights[:] = np.load(filepath)
+        self.update_target_model_hard()
@@ -0,0 +1,38 @@
+"""
+Author: Vladimir Ilievski <ilievski.vladimir@live.com>
+
+A Python file for the policies of the Goal-Oriented Dialogue agents.
+"""
+
+from rl.policy import EpsGreedyQPolicy
+
+import numpy as np
+
+
+class GOMaskedEpsGreedyQPolicy(EpsGreedyQPolicy):
+    """
+    Class for the epsilon-greedy policy over masked Q-values, where the masked actions have Q-value of -inf.
+    The random actions are sampled only among the allowed actions, such that no exploration step is wasted on an
+    action the agent should never take. Extends the `EpsGreedyQPolicy` class from keras-rl.
+
+    # Class members:
+
+    From `EpsGreedyQPolicy` class:
+
+        - ** eps **: the probability of taking a random action
+    """
+
+    def select_action(self, q_values):
+        """
+        Method for selecting an action given the masked Q-values. Overrides the super class method.
+
+        :param q_values: array of shape (nb_actions,) with the Q-values, -inf for the masked actions
+        :return: the selected action
+        """
+
+        assert q_values.ndim == 1
+
+        if np.random.uniform() < self.eps:
+            return np.random.choice(np.flatnonzero(np.isfinite(q_values)))
+
+        return np.argmax(q_values)
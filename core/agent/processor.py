@@ -4,8 +4,9 @@ Author: Vladimir Ilievski <ilievski.vladimir@live.com>
 A Python file for the GO Dialogue System Processor classes
 """
 
+from core.agent.actions import build_agent_actions
+
 from rl.core import Processor
-import copy
 
 class GOProcessor(Processor):
     """
@@ -16,6 +17,7 @@ class GOProcessor(Processor):
     # Arguments:
     
         - ** feasible_actions **: all feasible actions the agent might take
+        - ** agent_actions **: the immutable agent actions, built once for all feasible actions
     """
 
     def __init__(self, feasible_actions=None, *args, **kwargs):
@@ -24,6 +26,7 @@ class GOProcessor(Processor):
         """
         super(GOProcessor, self).__init__(*args, **kwargs)
         self.feasible_actions = feasible_actions
+        self.agent_actions = build_agent_actions(feasible_actions)
 
     def process_observation(self, observation):
         """
@@ -63,10 +66,10 @@ class GOProcessor(Processor):
         Overrides the super class method.
         
         :param action: the agent action provided as a number
-        :return: corresponding agent action as a dialogue act
+        :return: corresponding immutable agent action, shared between all turns
         """
 
-        return copy.deepcopy(self.feasible_actions[action])
+        return self.agent_actions[action]
 
     def process_state_batch(self, batch):
         """
@@ -0,0 +1,192 @@
+"""
+Author: Vladimir Ilievski <ilievski.vladimir@live.com>
+
+A Python file for the int8 post-training quantization of the Q-networks of the Goal-Oriented Dialogue agents.
+"""
+
+from core.agent.numpy_agents import GONumpyQNetwork
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+
+def quantize_per_channel(W):
+    """
+    Function for quantizing the weight matrix of a dense layer to int8, with one scale per output channel, such that
+    the largest absolute weight of each output channel is mapped to 127.
+
+    :param W: array of shape (fan_in, fan_out), the weight matrix
+    :return: the int8 weight matrix and the float32 scales of shape (fan_out,)
+    """
+
+    W = np.asarray(W, dtype=np.float32)
+
+    scales = np.abs(W).max(axis=0) / 127.0
+    scales[scales == 0] = 1.0
+
+    W_quantized = np.clip(np.round(W / scales), -127, 127).astype(np.int8)
+
+    return W_quantized, scales.astype(np.float32)
+
+
+class GOQuantizedQNetwork(object):
+    """
+    Class for the Q-network with dense layers quantized to int8 weights with per-channel scales, for measuring the
+    effect of the int8 weights on the greedy actions and on the dialogue metrics, before deploying the network to a
+    runtime with int8 kernels. The activations and the biases stay in float32, and the product with the int8 weights
+    is rescaled per output channel. It is built after the training from the weights of a stack of dense layers with
+    ReLU hidden layers and a linear output layer, like the `GONumpyQNetwork` or a keras model of dense layers.
+
+    There is no latency gain in NumPy. It has no int8 matrix product, so each forward pass converts the int8 weights
+    of every layer to float32. It is slower than the float network for one state, and at best on par for a batch. An
+    int8 product of the quantized activations accumulated in int32 is much slower, since the integer products do not
+    use BLAS. The stored weights take a quarter of the memory of the float32 weights, e.g. when the network is sent to
+    the worker processes, but at run time the converted float32 weights of a layer are allocated in each product.
+
+    # Class members:
+
+        - ** quantized_weights **: list of the int8 weight matrices of the layers
+        - ** scales **: list of the per-channel scales of the layers
+        - ** biases **: list of the float32 biases of the layers
+    """
+
+    def __init__(self, weights=None):
+        """
+        Constructor of the `GOQuantizedQNetwork` class.
+
+        :param weights: list of the float weight matrices and biases of the layers, in the same form as in keras
+        """
+
+        self.quantized_weights = []
+        self.scales = []
+        self.biases = []
+
+        for W, b in zip(weights[::2], weights[1::2]):
+            W_quantized, scales = quantize_per_channel(W)
+            self.quantized_weights.append(W_quantized)
+            self.scales.append(scales)
+            self.biases.append(np.asarray(b, dtype=np.float32))
+
+    @property
+    def nbytes(self):
+        """
+        Property for the number of bytes taken by the quantized network.
+
+        :return: the number of bytes
+        """
+
+        return sum(array.nbytes for array in self.quantized_weights + self.scales + self.biases)
+
+    def forward(self, states):
+        """
+        Method for computing the Q-values of a batch of states.
+
+        :param states: array of shape (nb_states, input_dim)
+        :return: array of shape (nb_states, nb_actions) with the Q-values
+        """
+
+        outputs = np.asarray(states, dtype=np.float32).reshape(len(states), -1)
+        nb_layers = len(self.quantized_weights)
+
+        for layer_nb in range(nb_layers):
+            outputs = outputs.dot(self.quantized_weights[layer_nb]) * self.scales[layer_nb] + self.biases[layer_nb]
+            if layer_nb < nb_layers - 1:
+                outputs = np.maximum(outputs, 0.0)
+
+        return outputs
+
+    def select_actions(self, states, action_masks=None):
+        """
+        Method for selecting the greedy actions of a batch of states.
+
+        :param states: array of shape (nb_states, input_dim)
+        :param action_masks: boolean array of shape (nb_states, nb_actions), True for the allowed actions. If None, all
+        actions are allowed
+        :return: array of shape (nb_states,) with the selected actions
+        """
+
+        q_values = self.forward(states)
+        if action_masks is not None:
+            q_values = np.where(action_masks, q_values, -np.inf)
+
+        return np.argmax(q_values, axis=1)
+
+
+def evaluate_quantization(weights, states, nb_repeats=1000):
+    """
+    Function for evaluating the quantized Q-network against the float one on recorded states. It reports the
+    agreement rate of the greedy actions, the maximal absolute error of the Q-values, the latency of one turn, i.e.
+    of one state, and of the whole batch of states, with the speed-up of the int8 network, see `GOQuantizedQNetwork`,
+    and the memory taken by the weights.
+
+    :param weights: list of the float weight matrices and biases of the layers, in the same form as in keras
+    :param states: array of shape (nb_states, input_dim), the recorded states
+    :param nb_repeats: the number of repeated forward passes for measuring the latency
+    :return: dictionary with the report
+    """
+
+    weights = [np.asarray(array, dtype=np.float32) for array in weights]
+    states = np.asarray(states, dtype=np.float32).reshape(len(states), -1)
+
+    float_network = GONumpyQNetwork.from_weights(weights)
+    quantized_network = GOQuantizedQNetwork(weights)
+
+    float_q_values, _ = float_network.forward(states)
+    quantized_q_values = quantized_network.forward(states)
+
+    def latency(forward, batch):
+        start_time = time.time()
+        for _ in range(nb_repeats):
+            forward(batch)
+        return (time.time() - start_time) / nb_repeats
+
+    one_state = states[:1]
+
+    float_seconds_per_turn = latency(float_network.forward, one_state)
+    int8_seconds_per_turn = latency(quantized_network.forward, one_state)
+    float_seconds_per_batch = latency(float_network.forward, states)
+    int8_seconds_per_batch = latency(quantized_network.forward, states)
+
+    return {'nb_states': len(states),
+            'action_agreement': float(np.mean(np.argmax(float_q_values, axis=1) ==
+                                              np.argmax(quantized_q_values, axis=1))),
+            'max_abs_q_error': float(np.abs(float_q_values - quantized_q_values).max()),
+            'float_seconds_per_turn': float_seconds_per_turn,
+            'int8_seconds_per_turn': int8_seconds_per_turn,
+            'int8_speedup_per_turn': float_seconds_per_turn / int8_seconds_per_turn,
+            'float_seconds_per_batch': float_seconds_per_batch,
+            'int8_seconds_per_batch': int8_seconds_per_batch,
+            'int8_speedup_per_batch': float_seconds_per_batch / int8_seconds_per_batch,
+            'float_bytes': sum(array.nbytes for array in weights),
+            'int8_bytes': quantized_network.nbytes}
+
+
+def main(params):
+    with np.load(params['weights_path']) as weights_file:
+        weights = [weights_file['arr_%d' % array_nb] for array_nb in range(len(weights_file.files))]
+
+    states = np.load(params['states_path'])
+
+    print(json.dumps(evaluate_quantization(weights, states, params['nb_repeats'])))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--weights_path', dest='weights_path', type=str,
+                        help='path to the weights of the dense layers, saved with np.savez(path, *agent.get_weights())')
+    parser.add_argument('--states_path', dest='states_path', type=str,
+                        help='path to the recorded states, an array of shape (nb_states, state_dim) saved with np.save')
+    parser.add_argument('--nb_repeats', dest='nb_repeats', type=int, default=1000,
+                        help='the number of repeated forward passes for measuring the latency')
+
+    args = parser.parse_args()
+    params = vars(args)
+
+    print ("Quantization Report Parameters:")
+    print (json.dumps(params, indent=2))
+
+    main(params)
@@ -0,0 +1,233 @@
+"""
+Author: Vladimir Ilievski <ilievski.vladimir@live.com>
+
+A Python file for the rule-based agent of the Goal-Oriented Dialogue Systems, generating demonstration dialogues to
+warm-start the replay memory.
+"""
+
+from core import constants as const
+
+import multiprocessing
+
+import numpy as np
+
+
+class GORuleBasedAgent(object):
+    """
+    Class for the rule-based agent over the feasible agent actions, used for demonstrating successful dialogues. It
+    reads the state tracker of the environment and takes the first applicable action of the following rules:
+
+        - close the dialogue with ** thanks **, after the agent informed the task completion or the user thanked
+        - inform the slots the user requested and the agent has not informed yet
+        - inform the task completion, once the matching entries in the knowledge base are narrowed down to at most
+          ** kb_threshold **
+        - request the next slot the user has not informed and the agent has not requested yet, in the order of
+          ** request_slots **, up to ** max_nb_requests ** requests
+        - inform the task completion
+
+    # Class members:
+
+        - ** inform_action_ids **: the index of the inform action of each slot
+        - ** request_action_ids **: the index of the request action of each slot
+        - ** thanks_action_id **: the index of the thanks action
+        - ** request_slots **: the slots to request, in order
+        - ** max_nb_requests **: the maximal number of slots the agent requests in a dialogue
+        - ** kb_threshold **: the number of matching entries in the knowledge base at which the task is completed
+    """
+
+    def __init__(self, agent_actions=None, request_slots=None, max_nb_requests=4, kb_threshold=1):
+        """
+        Constructor of the `GORuleBasedAgent` class.
+
+        :param agent_actions: the feasible agent actions
+        :param request_slots: the slots to request, in order. If None, all slots with a request action, in the order
+        of the feasible actions
+        :param max_nb_requests: the maximal number of slots the agent requests in a dialogue
+        :param kb_threshold: the number of matching entries in the knowledge base at which the task is completed
+        """
+
+        self.inform_action_ids = {}
+        self.request_action_ids = {}
+        self.thanks_action_id = None
+
+        for action_id, agent_action in enumerate(agent_actions):
+            inform_slots = list(agent_action[const.INFORM_SLOT_KEY].keys())
+            request_slots_of_action = list(agent_action[const.REQUEST_SLOT_KEY].keys())
+
+            if agent_action[const.DIA_ACT_KEY] == 'thanks':
+                self.thanks_action_id = action_id
+            elif len(inform_slots) == 1 and not request_slots_of_action:
+                self.inform_action_ids.setdefault(inform_slots[0], action_id)
+            elif len(request_slots_of_action) == 1 and not inform_slots:
+                self.request_action_ids.setdefault(request_slots_of_action[0], action_id)
+
+        if request_slots is None:
+            request_slots = sorted(self.request_action_ids, key=self.request_action_ids.get)
+
+        self.request_slots = [slot for slot in request_slots if slot in self.request_action_ids]
+        self.max_nb_requests = max_nb_requests
+        self.kb_threshold = kb_threshold
+
+        assert self.thanks_action_id is not None and const.TASK_COMPLETE_SLOT in self.inform_action_ids
+
+    def select_action(self, state_tracker):
+        """
+        Method for selecting the next action from the state of the dialogue.
+
+        :param state_tracker: the state tracker of the environment
+        :return: the index of the selected agent action
+        """
+
+        current_slots = state_tracker.current_slots
+        last_usr_action = state_tracker.get_last_usr_action()
+        last_agt_action = state_tracker.get_last_agt_action()
+
+        # close the dialogue
+        if last_usr_action is not None and last_usr_action[const.DIA_ACT_KEY] == 'thanks':
+            return self.thanks_action_id
+        if last_agt_action is not None and const.TASK_COMPLETE_SLOT in last_agt_action[const.INFORM_SLOT_KEY]:
+            return self.thanks_action_id
+
+        # answer the requests of the user
+        for slot in current_slots[const.REQUEST_SLOT_KEY]:
+            if slot in self.inform_action_ids:
+                return self.inform_action_ids[slot]
+
+        # complete the task once the knowledge base narrows down
+        kb_helper = getattr(state_tracker, 'kb_helper', None)
+        if kb_helper is not None and len(kb_helper.available_results_from_kb(current_slots)) <= self.kb_threshold:
+            return self.inform_action_ids[const.TASK_COMPLETE_SLOT]
+
+        # ask for the constraints of the user
+        if len(current_slots[const.AGENT_REQUESTED_SLOT_KEY]) < self.max_nb_requests:
+            for slot in self.request_slots:
+                if slot not in current_slots[const.INFORM_SLOT_KEY] and \
+                        slot not in current_slots[const.AGENT_REQUESTED_SLOT_KEY]:
+                    return self.request_action_ids[slot]
+
+        return self.inform_action_ids[const.TASK_COMPLETE_SLOT]
+
+
+def run_demonstrations(env, agent, nb_dialogues, only_successful=True):
+    """
+    Function for running the demonstration dialogues of the rule-based agent in the environment, and collecting
+    their entries in the same form as in the replay memories. Each dialogue ends with an entry for its last state,
+    with zero observation, since the environment gives no state after the end of the dialogue.
+
+    :param env: the environment, with a `fused_step` accepting the action index
+    :param agent: the rule-based agent
+    :param nb_dialogues: the number of dialogues
+    :param only_successful: whether to keep only the successful dialogues
+    :return: the arrays of the observations, actions, rewards and terminal flags, and the number of successful
+    dialogues
+    """
+
+    observation_dim = env.state_tracker.state_dim
+
+    observations = []
+    actions = []
+    rewards = []
+    terminals = []
+    nb_successes = 0
+
+    for _ in range(nb_dialogues):
+        observation = env.reset()
+        if observation is None:
+            break
+
+        dialogue = []
+        done = False
+        info = {}
+        while not done:
+            action = agent.select_action(env.state_tracker)
+            next_observation, reward, done, info = env.fused_step(action)
+            dialogue.append((np.ravel(observation), action, reward, done))
+            observation = next_observation
+
+        dialogue.append((np.zeros(observation_dim), 0, 0.0, False))
+
+        successful = info.get(const.DIALOGUE_STATUS_KEY) == const.SUCCESS_DIALOG
+        nb_successes += successful
+        if successful or not only_successful:
+            for entry_observation, action, reward, terminal in dialogue:
+                observations.append(entry_observation)
+                actions.append(action)
+                rewards.append(reward)
+                terminals.append(terminal)
+
+    return (np.array(observations, dtype=np.float32).reshape(-1, observation_dim), np.array(actions, dtype=np.int32),
+            np.array(rewards, dtype=np.float32), np.array(terminals, dtype=np.bool_), nb_successes)
+
+
+# the environment and the rule-based agent of a demonstration worker process
+_worker_env = None
+_worker_agent = None
+
+
+def _init_demonstration_worker(env_fn, agent_kwargs):
+    """
+    Private function for initializing a demonstration worker process, creating its environment and rule-based agent.
+
+    :param env_fn: picklable function creating the environment
+    :param agent_kwargs: the arguments of the rule-based agent, other than the agent actions
+    :return:
+    """
+
+    global _worker_env, _worker_agent
+
+    _worker_env = env_fn()
+    _worker_agent = GORuleBasedAgent(_worker_env.agent_actions, **agent_kwargs)
+
+
+def _run_demonstration_chunk(args):
+    """
+    Private function for running a chunk of demonstration dialogues in a worker process.
+
+    :param args: the number of dialogues, the random seed and whether to keep only the successful dialogues
+    :return: the collected entries and the number of successful dialogues, as in `run_demonstrations`
+    """
+
+    nb_dialogues, seed, only_successful = args
+    np.random.seed(seed)
+
+    return run_demonstrations(_worker_env, _worker_agent, nb_dialogues, only_successful)
+
+
+def warm_start_memory(memory, env_fn, nb_dialogues, nb_workers=None, only_successful=True, seed=0, chunk_size=100,
+                      **agent_kwargs):
+    """
+    Function for warm-starting the replay memory with the demonstration dialogues of the rule-based agent, before the
+    training of the DQN agent begins. The dialogues are run in parallel in a pool of worker processes, each with its
+    own environment, and the successful ones are bulk-inserted in the memory.
+
+    :param memory: the replay memory, with `append_batch`
+    :param env_fn: picklable function creating the environment
+    :param nb_dialogues: the number of demonstration dialogues
+    :param nb_workers: the number of worker processes. If None, one per core
+    :param only_successful: whether to insert only the successful dialogues
+    :param seed: the random seed, the chunks of dialogues are seeded after it
+    :param chunk_size: the number of dialogues in a chunk run by a worker at once
+    :param agent_kwargs: the arguments of the rule-based agent, other than the agent actions
+    :return: dictionary with the numbers of dialogues, successful dialogues and inserted entries
+    """
+
+    chunks = [(min(chunk_size, nb_dialogues - start), seed + chunk_nb, only_successful)
+              for chunk_nb, start in enumerate(range(0, nb_dialogues, chunk_size))]
+
+    nb_successes = 0
+    nb_entries = 0
+
+    pool = multiprocessing.Pool(nb_workers, _init_demonstration_worker, (env_fn, agent_kwargs))
+    try:
+        for observations, actions, rewards, terminals, nb_chunk_successes in \
+                pool.imap(_run_demonstration_chunk, chunks):
+            if len(actions) > 0:
+                memory.append_batch(observations, actions, rewards, terminals)
+
+            nb_successes += nb_chunk_successes
+            nb_entries += len(actions)
+    finally:
+        pool.close()
+        pool.join()
+
+    return {'nb_dialogues': nb_dialogues, 'nb_successes': nb_successes, 'nb_entries': nb_entries}
@@ -11,6 +11,8 @@ Author: Vladimir Ilievski <ilievski.vladimir@live.com>
 AGENT_TYPE_KEY = "agent_type"
 # value for the dqn agent type
 AGENT_TYPE_DQN = "agent_type_dqn"
+# value for the dqn agent type implemented in NumPy, without keras-rl
+AGENT_TYPE_NUMPY_DQN = "agent_type_numpy_dqn"
 
 ########################################################################################################################
 # User-related constants                                                                                               #
@@ -24,8 +26,18 @@ RULE_BASED_USER = "rule_based_user"
 MODEL_BASED_USER = "model_based_user"
 # key for specifying a path to an already trained model-based user
 MODEL_BASED_USER_PATH_KEY = "model_based_user_path"
+# key for specifying the size of the transition cache of the rule-based user, 0 for no caching
+USER_TRANSITION_CACHE_SIZE_KEY = "user_transition_cache_size"
 # value for the real user type
 REAL_USER = "real_user"
+# key for specifying a path to the user goal set, a pickled list of goals or a directory with a compiled goal set
+USER_GOAL_SET_PATH_KEY = "user_goal_set_path"
+# value for the corpus-replay user type, replaying logged dialogues
+REPLAY_USER = "replay_user"
+# key for specifying the user goal of a logged dialogue
+DIALOGUE_GOAL_KEY = "goal"
+# key for specifying the list of turns of a logged dialogue
+DIALOGUE_TURNS_KEY = "turns"
 # key for specifying the user inform slots in the user internal state
 USER_STATE_INFORM_SLOTS="user_inform_slots"
 # key for specifying the user request slots in the user internal state
@@ -47,6 +59,10 @@ RULE_BASED_STATE_TRACKER = "rule_based_state_tracker"
 MODEL_BASED_STATE_TRACKER = "model_based_state_tracker"
 # key for specifying a path to an already trained model-based state tracker
 MODEL_BASED_STATE_TRACKER_PATH_KEY = "model_based_state_tracker_path"
+# the version of the binary encoding of the state tracker, increased on every change of the encoding
+STATE_TRACKER_ENCODING_VERSION = 1
+# the version of the binary encoding of the dialogue sessions, increased on every change of the encoding
+SESSION_ENCODING_VERSION = 1
 
 ########################################################################################################################
 # Agent training related constants                                                                                     #
@@ -104,6 +120,8 @@ TURN_NB_KEY = "turn"
 KB_PATH_KEY = "kb_path"
 # key for specifying a kb querying result where all of the constraints were matched
 KB_MATCHING_ALL_CONSTRAINTS_KEY = "matching_all_constraints"
+# the agent inform slot announcing that the task is completed, filled with the availability of a matching entry
+TASK_COMPLETE_SLOT = "taskcomplete"
 
 ########################################################################################################################
 # Dialog status related constants                                                                                      #
@@ -113,6 +131,8 @@ KB_MATCHING_ALL_CONSTRAINTS_KEY = "matching_all_constraints"
 FAILED_DIALOG = -1
 SUCCESS_DIALOG = 1
 NO_OUTCOME_YET = 0
+# key for the dialogue status in the info returned by the environment
+DIALOGUE_STATUS_KEY = "dialogue_status"
 
 # Rewards
 SUCCESS_REWARD = 50
@@ -0,0 +1,299 @@
+"""
+Author: Vladimir Ilievski <ilievski.vladimir@live.com>
+
+A Python file for the micro-batching front-end, serving the turns of many concurrent dialogues in the Goal-Oriented
+Dialogue Systems with batched NLU, policy and NLG inference.
+"""
+
+from core import constants as const
+from core.dm.session_manager import nlu_usr_action
+
+from concurrent.futures import Future
+import queue
+import threading
+import time
+
+import numpy as np
+
+# the upper edges of the buckets of the queue wait histogram, in seconds
+QUEUE_WAIT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+                      float('inf'))
+
+# the request stopping the worker thread of a micro-batcher
+_STOP = object()
+
+
+class GOMicroBatcher(object):
+    """
+    Class for the dynamic micro-batcher of one inference stage. The requests are queued from many threads, and a
+    worker thread collects them in batches, running the batch function once per batch. A batch is run as soon as it
+    has ** max_batch_size ** requests, or once its oldest request has waited for ** max_latency ** seconds, taking
+    then all requests queued meanwhile up to the maximal batch size.
+
+    # Class members:
+
+        - ** batch_fn **: function of a list of inputs, returning the list of their outputs
+        - ** max_batch_size **: the maximal number of requests in a batch
+        - ** max_latency **: the maximal number of seconds the oldest request of a batch waits for more requests
+        - ** batch_size_counts **: array with the number of batches of each size
+        - ** queue_wait_counts **: array with the number of requests per bucket of `QUEUE_WAIT_BUCKETS` of the time
+                                waited in the queue
+    """
+
+    def __init__(self, batch_fn=None, max_batch_size=64, max_latency=0.005, name=None):
+        """
+        Constructor of the `GOMicroBatcher` class.
+
+        :param name: the name of the worker thread
+        """
+
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+
+        self.batch_size_counts = np.zeros(max_batch_size + 1, dtype=np.int64)
+        self.queue_wait_counts = np.zeros(len(QUEUE_WAIT_BUCKETS), dtype=np.int64)
+
+        self.__queue = queue.Queue()
+        self.__worker = threading.Thread(target=self.__run, name=name)
+        self.__worker.daemon = True
+        self.__worker.start()
+
+    def submit(self, request_input):
+        """
+        Method for submitting a request, from any thread.
+
+        :param request_input: the input of the request
+        :return: the future of the output of the request
+        """
+
+        future = Future()
+        self.__queue.put((time.monotonic(), request_input, future))
+
+        return future
+
+    def __collect_batch(self, first_request):
+        """
+        Private helper method for collecting a batch, starting from its first, i.e. oldest, request.
+
+        :param first_request: the first request of the batch
+        :return: the list of the requests of the batch, and whether the batcher is stopped
+        """
+
+        batch = [first_request]
+        deadline = first_request[0] + self.max_latency
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                request = self.__queue.get(timeout=timeout) if timeout > 0 else self.__queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if request is _STOP:
+                return batch, True
+            batch.append(request)
+
+        return batch, False
+
+    def __run_batch(self, batch):
+        """
+        Private helper method for running a batch and resolving the futures of its requests.
+
+        :param batch: the list of the requests of the batch
+        :return:
+        """
+
+        now = time.monotonic()
+        self.batch_size_counts[len(batch)] += 1
+        for enqueue_time, _, _ in batch:
+            self.queue_wait_counts[np.searchsorted(QUEUE_WAIT_BUCKETS, now - enqueue_time)] += 1
+
+        futures = [future for _, _, future in batch]
+        try:
+            outputs = self.batch_fn([request_input for _, request_input, _ in batch])
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        for future, output in zip(futures, outputs):
+            future.set_result(output)
+
+    def __run(self):
+        """
+        Private helper method, the loop of the worker thread.
+
+        :return:
+        """
+
+        stopped = False
+        while not stopped:
+            request = self.__queue.get()
+            if request is _STOP:
+                break
+
+            batch, stopped = self.__collect_batch(request)
+            self.__run_batch(batch)
+
+    def stop(self):
+        """
+        Method for stopping the worker thread, after running the requests queued so far.
+
+        :return:
+        """
+
+        self.__queue.put(_STOP)
+        self.__worker.join()
+
+    def get_stats(self):
+        """
+        Method for getting the statistics of the batcher.
+
+        :return: dictionary with the numbers of batches and requests, the mean batch size, the histogram of the batch
+        sizes as a dictionary of the size and the number of batches, and the histogram of the queue wait as a list of
+        the upper edge of the bucket in seconds and the number of requests
+        """
+
+        nb_batches = int(self.batch_size_counts.sum())
+        nb_requests = int(self.queue_wait_counts.sum())
+
+        return {'nb_batches': nb_batches,
+                'nb_requests': nb_requests,
+                'mean_batch_size': nb_requests / float(nb_batches) if nb_batches > 0 else 0.0,
+                'batch_size_histogram': {int(size): int(count) for size, count in enumerate(self.batch_size_counts)
+                                         if count > 0},
+                'queue_wait_histogram': [(edge, int(count)) for edge, count in zip(QUEUE_WAIT_BUCKETS,
+                                                                                  self.queue_wait_counts)]}
+
+
+class GOBatchedTurnServer(object):
+    """
+    Class for the serving front-end of the dialogue turns of many concurrent sessions. Each turn is served from the
+    thread of its client, while the NLU, the policy and the NLG run in micro-batches over the turns of all sessions:
+
+        - the user utterances are converted to user actions with `generate_dia_acts` of the NLU unit, if it has it
+        - the actions are selected with one call of the shared policy of the session manager per batch
+        - the agent actions are put in words with `convert_diaacts_to_nl` of the NLG unit, if it has it
+
+    The NLU and NLG units without a batch method are called once per utterance or action of the batch.
+
+    # Class members:
+
+        - ** session_manager **: the session manager of the dialogue sessions
+        - ** nlu_batcher **: the micro-batcher of the NLU, None if there is no NLU unit
+        - ** policy_batcher **: the micro-batcher of the policy
+        - ** nlg_batcher **: the micro-batcher of the NLG, None if there is no NLG unit
+    """
+
+    def __init__(self, session_manager=None, max_batch_size=64, max_latency=0.005):
+        """
+        Constructor of the `GOBatchedTurnServer` class.
+
+        :param max_batch_size: the maximal number of turns in a batch, of every stage
+        :param max_latency: the maximal number of seconds a turn waits for more turns, in every stage
+        """
+
+        self.session_manager = session_manager
+
+        self.nlu_batcher = None
+        if session_manager.nlu_unit is not None:
+            self.nlu_batcher = GOMicroBatcher(self.__generate_dia_acts, max_batch_size, max_latency, 'nlu_batcher')
+
+        self.policy_batcher = GOMicroBatcher(self.__select_actions, max_batch_size, max_latency, 'policy_batcher')
+
+        self.nlg_batcher = None
+        if session_manager.nlg_unit is not None:
+            self.nlg_batcher = GOMicroBatcher(self.__convert_diaacts_to_nl, max_batch_size, max_latency,
+                                              'nlg_batcher')
+
+    def __generate_dia_acts(self, utterances):
+        """
+        Private helper method, the batch function of the NLU.
+
+        :param utterances: list of the user utterances
+        :return: list of the user actions
+        """
+
+        nlu_unit = self.session_manager.nlu_unit
+        if hasattr(nlu_unit, 'generate_dia_acts'):
+            return nlu_unit.generate_dia_acts(utterances)
+
+        return [nlu_unit.generate_dia_act(utterance) for utterance in utterances]
+
+    def __select_actions(self, requests):
+        """
+        Private helper method, the batch function of the policy.
+
+        :param requests: list of the states of shape (1, state_dim) and the action masks of shape (1, nb_actions)
+        :return: list of the selected action indices
+        """
+
+        states = np.concatenate([state for state, _ in requests])
+
+        action_masks = None
+        if all(action_mask is not None for _, action_mask in requests):
+            action_masks = np.concatenate([action_mask for _, action_mask in requests])
+
+        return [int(action) for action in np.ravel(self.session_manager.select_actions(states, action_masks))]
+
+    def __convert_diaacts_to_nl(self, agt_actions):
+        """
+        Private helper method, the batch function of the NLG.
+
+        :param agt_actions: list of the agent actions
+        :return: list of the sentences of the agent actions
+        """
+
+        nlg_unit = self.session_manager.nlg_unit
+        if hasattr(nlg_unit, 'convert_diaacts_to_nl'):
+            return nlg_unit.convert_diaacts_to_nl(agt_actions, const.AGT_SPEAKER_VAL)
+
+        return [nlg_unit.convert_diaact_to_nl(agt_action, const.AGT_SPEAKER_VAL) for agt_action in agt_actions]
+
+    def respond(self, session_id, usr_input):
+        """
+        Method for serving a whole turn of a session, blocking until the agent action is ready. It is called from
+        the threads of the clients, concurrently for many sessions. A user utterance which the NLU unit can not parse
+        is taken as an inform without slots, see `nlu_usr_action`.
+
+        :param session_id: the id of the session
+        :param usr_input: the user utterance as a string, or the user action as a dictionary
+        :return: the agent action, with its natural language form under the ** nl ** key if there is an NLG unit
+        """
+
+        if isinstance(usr_input, str):
+            usr_action = nlu_usr_action(self.nlu_batcher.submit(usr_input).result(), usr_input)
+        else:
+            usr_action = usr_input
+
+        state, action_mask = self.session_manager.begin_turn(session_id, usr_action)
+        action = self.policy_batcher.submit((state, action_mask)).result()
+        agt_action = self.session_manager.end_turn(session_id, action, generate_nl=False)
+
+        if self.nlg_batcher is not None:
+            agt_action[const.NL_KEY] = self.nlg_batcher.submit(agt_action).result()
+
+        return agt_action
+
+    def stop(self):
+        """
+        Method for stopping the worker threads of the micro-batchers.
+
+        :return:
+        """
+
+        for batcher in (self.nlu_batcher, self.policy_batcher, self.nlg_batcher):
+            if batcher is not None:
+                batcher.stop()
+
+    def get_stats(self):
+        """
+        Method for getting the statistics of the micro-batchers, as in `GOMicroBatcher.get_stats`.
+
+        :return: dictionary with the statistics of each stage
+        """
+
+        return {stage: batcher.get_stats() for stage, batcher in
+                (('nlu', self.nlu_batcher), ('policy', self.policy_batcher), ('nlg', self.nlg_batcher))
+                if batcher is not None}
@@ -5,9 +5,16 @@ A Python file for the entire Goal-Oriented Dialogue System.
 """
 
 from core import constants as const
-from core.environment.environment import GOEnv
+from core.environment.environment import create_env
 import core.agent.agents as agents
+from core.agent.policy import GOMaskedEpsGreedyQPolicy
 from core.agent.processor import GOProcessor
+from core.agent.numpy_agents import GONumpyDQNAgent
+from core.dm.session_manager import GOSessionManager
+from core.dm.evaluation import GOGreedyPolicy, evaluate_policy, write_report
+import core.dst.state_tracker as state_trackers
+
+import functools
 
 
 class GODialogSys():
@@ -24,6 +31,7 @@ class GODialogSys():
         - ** agt_feasible_actions **: list of templates described as dictionaries, corresponding to each action the agent might take
                                 (dict to be specified)
         - ** max_nb_turns **: the maximal number of dialogue turns
+        - ** params **: the parameters of the dialogue system
     
     """
 
@@ -44,6 +52,8 @@ class GODialogSys():
 
         self.max_nb_turns = params[const.MAX_NB_TURNS]
 
+        self.params = params
+
         # create the environment
         self.env = self.__create_env(params, act_set, slot_set, agt_feasible_actions)
 
@@ -58,26 +68,7 @@ class GODialogSys():
         :return: the newly created environment
         """
 
-        # Get all params
-        simulation_mode = params[const.SIMULATION_MODE_KEY]
-        is_training = params[const.IS_TRAINING_KEY]
-
-        user_type = params[const.USER_TYPE_KEY]
-        user_path = params[const.MODEL_BASED_USER_PATH_KEY]
-
-        state_tracker_type = params[const.STATE_TRACKER_TYPE_KEY]
-        dst_path = params[const.MODEL_BASED_STATE_TRACKER_PATH_KEY]
-
-        max_nb_turns = params[const.MAX_NB_TURNS]
-
-        nlu_path = params[const.NLU_PATH_KEY]
-        nlg_path = params[const.NLG_PATH_KEY]
-
-        # Create the environment
-        env = GOEnv(simulation_mode, is_training, user_type, user_path, state_tracker_type, dst_path, act_set, slot_set,
-                    agt_feasible_actions, max_nb_turns, nlu_path, nlg_path)
-
-        return env
+        return create_env(params, act_set, slot_set, agt_feasible_actions)
 
     def __create_agent(self, agent_type_value):
         """
@@ -91,7 +82,12 @@ class GODialogSys():
 
         if agent_type_value == const.AGENT_TYPE_DQN:
             go_processor = GOProcessor(feasible_actions=self.agt_feasible_actions)
-            agent = agents.GODQNAgent(processor=go_processor)
+            agent = agents.GODQNAgent(processor=go_processor, policy=GOMaskedEpsGreedyQPolicy(),
+                                      action_mask_fn=self.env.produce_action_mask)
+        elif agent_type_value == const.AGENT_TYPE_NUMPY_DQN:
+            agent = GONumpyDQNAgent(nb_actions=len(self.env.agent_actions),
+                                    observation_dim=self.env.state_tracker.state_dim,
+                                    action_mask_fn=self.env.produce_action_mask)
 
         return agent
 
@@ -101,3 +97,50 @@ class GODialogSys():
         
         :return: 
         """
+
+    def create_session_manager(self, idle_timeout=1800.0, max_nb_sessions=None):
+        """
+        Method for creating the session manager serving many concurrent dialogues with the agent. The sessions share
+        the NLU and NLG units of the environment and the greedy policy of the agent, i.e. without exploration, with
+        the weights of the agent at the time of the call. Their states are tracked by a new rule-based state tracker
+        over the knowledge base of the environment.
+
+        :param idle_timeout: the number of seconds after which an idle session is evicted
+        :param max_nb_sessions: the maximal number of sessions, None for no limit
+        :return: the session manager
+        """
+
+        state_tracker = state_trackers.GORuleBasedStateTracker(self.act_set, self.slot_set, self.max_nb_turns,
+                                                               getattr(self.env.state_tracker, 'kb_helper', None))
+
+        weights = self.agent.get_weights() if hasattr(self.agent, 'get_weights') else self.agent.model.get_weights()
+        policy = GOGreedyPolicy(weights)
+
+        return GOSessionManager(state_tracker=state_tracker, nlu_unit=self.env.nlu_unit, nlg_unit=self.env.nlg_unit,
+                                select_actions=policy.select_actions, agent_actions=self.env.agent_actions,
+                                action_masker=self.env.action_masker, idle_timeout=idle_timeout,
+                                max_nb_sessions=max_nb_sessions)
+
+    def evaluate(self, nb_dialogues, nb_workers=None, nb_envs=32, seed=0, quantized=False, report_path=None):
+        """
+        Method for evaluating the greedy policy of the trained agent on simulated dialogues, run in parallel in a pool
+        of worker processes, each creating its own environments with the parameters of the dialogue system.
+
+        :param nb_dialogues: the number of evaluation dialogues
+        :param nb_workers: the number of worker processes. If None, one per core
+        :param nb_envs: the number of environments advanced in lockstep in each worker
+        :param seed: the random seed
+        :param quantized: whether to evaluate the Q-network quantized to int8, see `GOQuantizedQNetwork`
+        :param report_path: the path of the JSON report. If None, the report is not written
+        :return: dictionary with the report, as in `evaluate_policy`
+        """
+
+        weights = self.agent.get_weights() if hasattr(self.agent, 'get_weights') else self.agent.model.get_weights()
+        env_fn = functools.partial(create_env, self.params, self.act_set, self.slot_set, self.agt_feasible_actions)
+
+        report = evaluate_policy(env_fn, GOGreedyPolicy(weights, quantized), nb_dialogues, nb_workers, nb_envs,
+                                 seed=seed)
+        if report_path is not None:
+            write_report(report, report_path)
+
+        return report
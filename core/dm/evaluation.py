@@ -0,0 +1,374 @@
+"""
+Author: Vladimir Ilievski <ilievski.vladimir@live.com>
+
+A Python file for the parallel evaluation of the trained agents of the Goal-Oriented Dialogue Systems.
+"""
+
+from core import constants as const
+from core.agent.numpy_agents import GONumpyQNetwork
+from core.agent.quantization import GOQuantizedQNetwork
+
+import argparse
+import json
+import multiprocessing
+import random
+import time
+
+import numpy as np
+
+
+class GORunningStats(object):
+    """
+    Class for the streaming statistics of a quantity, updated with batches of values without storing them. The mean
+    and the variance are merged with the parallel form of the Welford algorithm, which is numerically stable.
+
+    # Class members:
+
+        - ** count **: the number of values so far
+        - ** mean **: the mean of the values
+        - ** m2 **: the sum of the squared deviations from the mean
+        - ** min **: the minimal value
+        - ** max **: the maximal value
+    """
+
+    def __init__(self):
+        """
+        Constructor of the `GORunningStats` class.
+        """
+
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+
+    def merge(self, count, mean, m2, min_value, max_value):
+        """
+        Method for merging the statistics of another set of values.
+
+        :param count: the number of the other values
+        :param mean: the mean of the other values
+        :param m2: the sum of the squared deviations of the other values from their mean
+        :param min_value: the minimal of the other values
+        :param max_value: the maximal of the other values
+        :return:
+        """
+
+        if count == 0:
+            return
+
+        total_count = self.count + count
+        delta = mean - self.mean
+
+        self.mean += delta * count / total_count
+        self.m2 += m2 + delta * delta * self.count * count / total_count
+        self.count = total_count
+        self.min = min(self.min, min_value)
+        self.max = max(self.max, max_value)
+
+    def update(self, values):
+        """
+        Method for updating the statistics with a batch of values.
+
+        :param values: array of the values
+        :return:
+        """
+
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+
+        mean = values.mean()
+        self.merge(len(values), mean, float(np.sum((values - mean) ** 2)), values.min(), values.max())
+
+    @property
+    def variance(self):
+        """
+        Property for the sample variance of the values.
+
+        :return: the variance
+        """
+
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def to_dict(self):
+        """
+        Method for getting the statistics as a dictionary, with the standard error of the mean.
+
+        :return: dictionary with the statistics
+        """
+
+        std = float(np.sqrt(self.variance))
+
+        return {'count': self.count,
+                'mean': float(self.mean),
+                'std': std,
+                'std_error': float(std / np.sqrt(self.count)) if self.count > 0 else 0.0,
+                'min': float(self.min) if self.count > 0 else None,
+                'max': float(self.max) if self.count > 0 else None}
+
+
+class GOGreedyPolicy(object):
+    """
+    Class for the greedy policy of a trained Q-network, which is picklable and is evaluated in the worker processes.
+
+    # Class members:
+
+        - ** q_network **: the Q-network, `GONumpyQNetwork` with the float weights or `GOQuantizedQNetwork`
+        - ** quantized **: whether the Q-network is quantized to int8, see `GOQuantizedQNetwork`
+    """
+
+    def __init__(self, weights=None, quantized=False):
+        """
+        Constructor of the `GOGreedyPolicy` class.
+
+        :param weights: list of the weight matrices and biases of the dense layers, in the same form as in keras
+        :param quantized: whether to quantize the Q-network to int8
+        """
+
+        self.quantized = quantized
+
+        if quantized:
+            self.q_network = GOQuantizedQNetwork(weights)
+        else:
+            self.q_network = GONumpyQNetwork.from_weights(weights)
+
+    def select_actions(self, states, action_masks=None):
+        """
+        Method for selecting the greedy actions of a batch of states.
+
+        :param states: array of shape (nb_states, state_dim)
+        :param action_masks: boolean array of shape (nb_states, nb_actions), True for the allowed actions. If None, all
+        actions are allowed
+        :return: array of shape (nb_states,) with the selected actions
+        """
+
+        if self.quantized:
+            return self.q_network.select_actions(states, action_masks)
+
+        q_values, _ = self.q_network.forward(states)
+        if action_masks is not None:
+            q_values = np.where(action_masks, q_values, -np.inf)
+
+        return np.argmax(q_values, axis=1)
+
+
+def run_evaluation_dialogues(envs, policy, nb_dialogues, use_action_masks=True):
+    """
+    Function for running evaluation dialogues of a policy, in a batch of environments advanced in lockstep, such that
+    the actions of all running dialogues are selected with one call of the policy.
+
+    :param envs: the list of the environments, with a `fused_step` accepting the action index
+    :param policy: the policy, with `select_actions` of a batch of states and action masks
+    :param nb_dialogues: the number of dialogues
+    :param use_action_masks: whether to mask the actions not allowed in the current state
+    :return: the arrays of the success flags, the numbers of agent turns and the cumulative rewards of the dialogues
+    """
+
+    successes = []
+    nb_turns = []
+    rewards = []
+
+    observations = [None] * len(envs)
+    dialogue_nb_turns = [0] * len(envs)
+    dialogue_rewards = [0.0] * len(envs)
+    nb_started = 0
+
+    def start_dialogue(env_nb):
+        observations[env_nb] = envs[env_nb].reset() if nb_started < nb_dialogues else None
+        dialogue_nb_turns[env_nb] = 0
+        dialogue_rewards[env_nb] = 0.0
+        return observations[env_nb] is not None
+
+    running = []
+    for env_nb in range(len(envs)):
+        if start_dialogue(env_nb):
+            nb_started += 1
+            running.append(env_nb)
+
+    while running:
+        states = np.concatenate([np.reshape(observations[env_nb], (1, -1)) for env_nb in running])
+        action_masks = None
+        if use_action_masks:
+            action_masks = np.concatenate([envs[env_nb].produce_action_mask() for env_nb in running])
+
+        actions = policy.select_actions(states, action_masks)
+
+        still_running = []
+        for env_nb, action in zip(running, actions):
+            observations[env_nb], reward, done, info = envs[env_nb].fused_step(int(action))
+            dialogue_nb_turns[env_nb] += 1
+            dialogue_rewards[env_nb] += reward
+
+            if not done:
+                still_running.append(env_nb)
+                continue
+
+            successes.append(info.get(const.DIALOGUE_STATUS_KEY) == const.SUCCESS_DIALOG)
+            nb_turns.append(dialogue_nb_turns[env_nb])
+            rewards.append(dialogue_rewards[env_nb])
+
+            if start_dialogue(env_nb):
+                nb_started += 1
+                still_running.append(env_nb)
+
+        running = still_running
+
+    return (np.array(successes, dtype=np.float64), np.array(nb_turns, dtype=np.float64),
+            np.array(rewards, dtype=np.float64))
+
+
+# the environments and the policy of an evaluation worker process
+_worker_envs = None
+_worker_policy = None
+_worker_use_action_masks = True
+
+
+def _init_evaluation_worker(env_fn, policy, nb_envs, use_action_masks):
+    """
+    Private function for initializing an evaluation worker process, creating its batch of environments.
+
+    :param env_fn: picklable function creating the environment
+    :param policy: the picklable policy
+    :param nb_envs: the number of environments advanced in lockstep
+    :param use_action_masks: whether to mask the actions not allowed in the current state
+    :return:
+    """
+
+    global _worker_envs, _worker_policy, _worker_use_action_masks
+
+    _worker_envs = [env_fn() for _ in range(nb_envs)]
+    _worker_policy = policy
+    _worker_use_action_masks = use_action_masks
+
+
+def _run_evaluation_chunk(args):
+    """
+    Private function for running a chunk of evaluation dialogues in a worker process, seeded deterministically.
+
+    :param args: the number of dialogues and the random seed of the chunk
+    :return: the arrays of the dialogues, as in `run_evaluation_dialogues`
+    """
+
+    nb_dialogues, seed = args
+    np.random.seed(seed)
+    random.seed(seed)
+
+    return run_evaluation_dialogues(_worker_envs, _worker_policy, nb_dialogues, _worker_use_action_masks)
+
+
+def evaluate_policy(env_fn, policy, nb_dialogues, nb_workers=None, nb_envs=32, chunk_size=1000, seed=0,
+                    use_action_masks=True):
+    """
+    Function for evaluating a policy on many dialogues, run in parallel in a pool of worker processes. The dialogues
+    are split in chunks, each seeded after its index, such that for a given number of environments per worker the
+    report does not depend on the number of workers.
+    The success rate, the number of agent turns and the reward are aggregated with streaming statistics.
+
+    :param env_fn: picklable function creating the environment
+    :param policy: the picklable policy, with `select_actions` of a batch of states and action masks
+    :param nb_dialogues: the number of evaluation dialogues
+    :param nb_workers: the number of worker processes. If None, one per core
+    :param nb_envs: the number of environments advanced in lockstep in each worker
+    :param chunk_size: the number of dialogues in a chunk run by a worker at once
+    :param seed: the random seed, the chunks are seeded after it
+    :param use_action_masks: whether to mask the actions not allowed in the current state
+    :return: dictionary with the report
+    """
+
+    chunks = [(min(chunk_size, nb_dialogues - start), seed + chunk_nb)
+              for chunk_nb, start in enumerate(range(0, nb_dialogues, chunk_size))]
+
+    stats = {'success': GORunningStats(), 'turns': GORunningStats(), 'reward': GORunningStats()}
+
+    start_time = time.time()
+    pool = multiprocessing.Pool(nb_workers, _init_evaluation_worker, (env_fn, policy, nb_envs, use_action_masks))
+    try:
+        for successes, nb_turns, rewards in pool.imap(_run_evaluation_chunk, chunks):
+            stats['success'].update(successes)
+            stats['turns'].update(nb_turns)
+            stats['reward'].update(rewards)
+    finally:
+        pool.close()
+        pool.join()
+    duration = time.time() - start_time
+
+    report = {name: running_stats.to_dict() for name, running_stats in stats.items()}
+    report.update({'nb_dialogues': stats['success'].count,
+                   'seconds': duration,
+                   'dialogues_per_second': stats['success'].count / duration,
+                   'seed': seed,
+                   'chunk_size': chunk_size})
+
+    return report
+
+
+def write_report(report, path):
+    """
+    Function for writing the evaluation report as JSON.
+
+    :param report: the report of `evaluate_policy`
+    :param path: the path of the report
+    :return:
+    """
+
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+
+def main(params):
+    from core.environment.environment import create_script_env_fn
+
+    env_fn = create_script_env_fn(params)
+
+    with np.load(params['weights_path']) as weights_file:
+        weights = [weights_file['arr_%d' % array_nb] for array_nb in range(len(weights_file.files))]
+
+    policy = GOGreedyPolicy(weights, quantized=params['quantized'])
+    report = evaluate_policy(env_fn, policy, params['nb_dialogues'], params['nb_workers'],
+                             params['nb_envs'], params['chunk_size'], params['seed'],
+                             not params['no_action_masks'])
+
+    if params['report_path']:
+        write_report(report, params['report_path'])
+
+    print(json.dumps(report, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--act_set_path', dest='act_set_path', type=str, help='path to the dialogue acts file')
+    parser.add_argument('--slot_set_path', dest='slot_set_path', type=str, help='path to the slots file')
+    parser.add_argument('--goal_set_path', dest='goal_set_path', type=str, help='path to the user goal set')
+    parser.add_argument('--kb_path', dest='kb_path', type=str, default=None, help='path to the knowledge base')
+    parser.add_argument('--nlu_path', dest='nlu_path', type=str, help='path to the trained NLU unit')
+    parser.add_argument('--nlg_path', dest='nlg_path', type=str, help='path to the trained NLG unit')
+    parser.add_argument('--simulation_mode', dest='simulation_mode', type=str,
+                        default=const.SEMANTIC_FRAME_SIMULATION_MODE, help='semantic frame or natural language mode')
+    parser.add_argument('--max_nb_turns', dest='max_nb_turns', type=int, default=40, help='maximal number of turns')
+    parser.add_argument('--weights_path', dest='weights_path', type=str,
+                        help='path to the weights of the dense layers, saved with np.savez(path, *agent.get_weights())')
+    parser.add_argument('--quantized', dest='quantized', action='store_true',
+                        help='whether to evaluate the Q-network quantized to int8, for its effect on the metrics')
+    parser.add_argument('--nb_dialogues', dest='nb_dialogues', type=int, default=100000,
+                        help='the number of evaluation dialogues')
+    parser.add_argument('--nb_workers', dest='nb_workers', type=int, default=None,
+                        help='the number of worker processes, one per core by default')
+    parser.add_argument('--nb_envs', dest='nb_envs', type=int, default=32,
+                        help='the number of environments advanced in lockstep in each worker')
+    parser.add_argument('--chunk_size', dest='chunk_size', type=int, default=1000,
+                        help='the number of dialogues in a chunk run by a worker at once')
+    parser.add_argument('--seed', dest='seed', type=int, default=0, help='random seed')
+    parser.add_argument('--no_action_masks', dest='no_action_masks', action='store_true',
+                        help='whether to allow all actions in every state')
+    parser.add_argument('--report_path', dest='report_path', type=str, default='',
+                        help='path of the JSON report')
+
+    args = parser.parse_args()
+    params = vars(args)
+
+    print ("Evaluation Parameters:")
+    print (json.dumps(params, indent=2))
+
+    main(params)
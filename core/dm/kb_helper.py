@@ -4,18 +4,164 @@ Author: Vladimir Ilievski <ilievski.vladimir@live.com>
 A Python file for the helper Knowledge Base class
 """
 
+from core import constants as const
+from core import dialog_config
+
+from collections import Counter
+import pickle
+
 
 class GOKBHelper:
     """
     Helper class for the agent to query the provided knowledge base. It provides methods for querying and filling
     the slot values based on the results.
-    
+
+    The knowledge base is a dictionary mapping the id of each entry to its slot values. An inverted index, mapping
+    each slot value to the ids of the entries having it, is built once, such that a query is an intersection of a few
+    sets of ids, instead of a scan over the whole knowledge base. The results of the queries are cached per set of
+    constraints.
+
     #Arguments
-    
+
+        - ** kb **: the knowledge base, mapping the id of each entry to a dictionary of its slot values
+        - ** slot_value_index **: the inverted index, mapping each slot and value to the set of ids of the entries
+        - ** all_ids **: the set of ids of all entries
+        - ** cached_kb_results **: the cache of the query results, for each set of constraints
+        - ** cached_kb_counts **: the cache of the counts of the matching entries, for each set of constraints
+        - ** cached_slot_counts **: the cache of the counts of the matching entries having each slot, for each set of
+                                constraints
     """
 
-    def __init__(self):
+    def __init__(self, kb=None):
         """Constructor of the `GOKBHelper` class"""
 
+        self.kb = kb
+        self.all_ids = frozenset(kb.keys())
+
+        self.slot_value_index = {}
+        for entry_id, entry in kb.items():
+            for slot, value in entry.items():
+                self.slot_value_index.setdefault(slot, {}).setdefault(value, set()).add(entry_id)
+
+        self.cached_kb_results = {}
+        self.cached_kb_counts = {}
+        self.cached_slot_counts = {}
+
+    def __constraints(self, current_slots):
+        """
+        Private helper method for getting the constraints of the query from the running record of the slots.
+        The slots the user does not care about and the slots out of the knowledge base are not constraints.
+
+        :param current_slots: the running record of the slots from the state tracker
+        :return: the constraints as a frozen set of slot and value pairs
+        """
+
+        return frozenset((slot, value) for slot, value in current_slots[const.INFORM_SLOT_KEY].items()
+                         if value != dialog_config.I_DO_NOT_CARE and slot in self.slot_value_index)
+
+    def available_results_from_kb(self, current_slots):
+        """
+        Method for querying the knowledge base with the constraints from the running record of the slots.
+
+        :param current_slots: the running record of the slots from the state tracker
+        :return: the frozen set of ids of the entries matching all constraints
+        """
+
+        constraints = self.__constraints(current_slots)
+
+        kb_results = self.cached_kb_results.get(constraints)
+        if kb_results is None:
+            # intersect the smallest sets of ids first
+            id_sets = sorted((self.slot_value_index[slot].get(value, ()) for slot, value in constraints), key=len)
+
+            kb_results = set(self.all_ids) if not id_sets else set(id_sets[0])
+            for id_set in id_sets[1:]:
+                if not kb_results:
+                    break
+                kb_results.intersection_update(id_set)
+
+            kb_results = frozenset(kb_results)
+            self.cached_kb_results[constraints] = kb_results
+
+        return kb_results
+
+    def database_results_for_agent(self, current_slots):
+        """
+        Method for counting the entries matching the constraints from the running record of the slots, used in the
+        representation of the dialogue state.
+
+        :param current_slots: the running record of the slots from the state tracker
+        :return: dictionary with the number of entries matching all constraints, and for each constraint slot the
+        number of entries matching that constraint alone
+        """
+
+        constraints = self.__constraints(current_slots)
+
+        kb_counts = self.cached_kb_counts.get(constraints)
+        if kb_counts is None:
+            kb_counts = {const.KB_MATCHING_ALL_CONSTRAINTS_KEY: len(self.available_results_from_kb(current_slots))}
+            for slot, value in constraints:
+                kb_counts[slot] = len(self.slot_value_index[slot].get(value, ()))
+
+            self.cached_kb_counts[constraints] = kb_counts
+
+        return kb_counts
+
+    def available_slot_counts(self, current_slots):
+        """
+        Method for counting, for each slot, the entries matching all constraints which have a value for that slot.
+        A slot with no such entries can not be filled from the knowledge base.
+
+        :param current_slots: the running record of the slots from the state tracker
+        :return: dictionary with the number of matching entries having each slot
+        """
+
+        constraints = self.__constraints(current_slots)
+
+        slot_counts = self.cached_slot_counts.get(constraints)
+        if slot_counts is None:
+            slot_counts = Counter()
+            for entry_id in self.available_results_from_kb(current_slots):
+                slot_counts.update(self.kb[entry_id].keys())
+
+            self.cached_slot_counts[constraints] = slot_counts
+
+        return slot_counts
+
+    def fill_inform_slots(self, inform_slots_to_be_filled, current_slots):
+        """
+        Method for filling the values of the agent inform slots from the knowledge base. The agent action is not
+        changed, the filled values are returned in a new dictionary.
+
+        :param inform_slots_to_be_filled: the inform slots of the agent action
+        :param current_slots: the running record of the slots from the state tracker
+        :return: dictionary of the filled inform slots
+        """
+
+        kb_results = self.available_results_from_kb(current_slots)
+
+        filled_inform_slots = {}
+        for slot in inform_slots_to_be_filled.keys():
+            if slot == const.TASK_COMPLETE_SLOT:
+                filled_inform_slots[slot] = dialog_config.TICKET_AVAILABLE if kb_results else \
+                    dialog_config.NO_VALUE_MATCH
+            elif slot in current_slots[const.INFORM_SLOT_KEY]:
+                # the value is already agreed with the user
+                filled_inform_slots[slot] = current_slots[const.INFORM_SLOT_KEY][slot]
+            else:
+                # the most common value among the matching entries
+                values = Counter(self.kb[entry_id][slot] for entry_id in kb_results if slot in self.kb[entry_id])
+                filled_inform_slots[slot] = values.most_common(1)[0][0] if values else dialog_config.NO_VALUE_MATCH
+
+        return filled_inform_slots
+
+
+def load_kb_helper(kb_path):
+    """
+    Function for loading the pickled knowledge base and creating the helper for querying it.
+
+    :param kb_path: the path to the pickled knowledge base
+    :return: the knowledge base helper
+    """
 
-# TODO
\ No newline at end of file
+    return GOKBHelper(pickle.load(open(kb_path, 'rb')))
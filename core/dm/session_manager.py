@@ -0,0 +1,416 @@
+"""
+Author: Vladimir Ilievski <ilievski.vladimir@live.com>
+
+A Python file for the session manager, serving many concurrent dialogues in the Goal-Oriented Dialogue Systems.
+"""
+
+from core import constants as const
+
+from collections import OrderedDict
+import json
+import struct
+import threading
+import time
+import uuid
+
+import numpy as np
+
+# the header of the binary encoding of a session: the version, the time of the last turn, and the lengths of the
+# session id and of the metadata
+_SESSION_HEADER = struct.Struct('<BdHI')
+
+
+def nlu_usr_action(nlu_res, usr_nl):
+    """
+    Function for producing the user action of a user utterance from the result of the NLU unit. The NLU unit gives no
+    result for an utterance it can not parse, like an empty one, which then becomes the default action of the NLU, an
+    inform without slots. All serving paths, the session manager, the batched turn server and the asynchronous
+    environment, are treating such an utterance in this way.
+
+    :param nlu_res: the user action from the NLU unit, or None
+    :param usr_nl: the user utterance
+    :return: the user action, with the utterance under the ** nl ** key
+    """
+
+    usr_action = nlu_res if nlu_res is not None else default_usr_action()
+    usr_action[const.NL_KEY] = usr_nl
+
+    return usr_action
+
+
+def default_usr_action():
+    """
+    Function for creating the default user action of the NLU unit, an inform without slots.
+
+    :return: the default user action
+    """
+
+    return {const.DIA_ACT_KEY: 'inform', const.INFORM_SLOT_KEY: {}, const.REQUEST_SLOT_KEY: {}}
+
+
+class GODialogueSession(object):
+    """
+    Class for the compact record of one dialogue session. It holds only what the state tracker needs to continue the
+    dialogue, i.e. the running record of the slots, the last user and agent action and the turn number, and the
+    user-facing metadata of the session.
+
+    # Class members:
+
+        - ** session_id **: the id of the session
+        - ** last_active **: the time of the last turn of the session
+        - ** turn_nb **: the dialogue turn number of the state tracker
+        - ** current_slots **: the running record of the slots of the state tracker
+        - ** last_actions **: tuple of the last history records of the state tracker, at most the last agent and user
+                            action
+        - ** metadata **: dictionary with the user-facing metadata, like the user id or the channel
+    """
+
+    __slots__ = ('session_id', 'last_active', 'turn_nb', 'current_slots', 'last_actions', 'metadata')
+
+    def __init__(self, session_id=None, last_active=None, turn_nb=0, current_slots=None, last_actions=(),
+                 metadata=None):
+        """
+        Constructor of the `GODialogueSession` class.
+        """
+
+        self.session_id = session_id
+        self.last_active = last_active
+        self.turn_nb = turn_nb
+        self.current_slots = current_slots
+        self.last_actions = last_actions
+        self.metadata = metadata
+
+    def to_bytes(self, state_tracker):
+        """
+        Method for encoding the session in a compact versioned binary form, for moving it to another process or node.
+        The state of the dialogue is encoded with `snapshot_to_bytes` of the state tracker, and the metadata as JSON.
+
+        :param state_tracker: the state tracker, with the act and slot sets of the dialogues
+        :return: the encoded bytes
+        """
+
+        session_id = self.session_id.encode('utf-8')
+        metadata = json.dumps(self.metadata, separators=(',', ':')).encode('utf-8') if self.metadata else b''
+        snapshot = state_tracker.snapshot_to_bytes((self.last_actions, self.current_slots, self.turn_nb))
+
+        return b''.join([_SESSION_HEADER.pack(const.SESSION_ENCODING_VERSION, self.last_active or 0.0,
+                                              len(session_id), len(metadata)), session_id, metadata, snapshot])
+
+    @classmethod
+    def from_bytes(cls, data, state_tracker):
+        """
+        Method for decoding a session encoded with `to_bytes`.
+
+        :param data: the encoded bytes
+        :param state_tracker: the state tracker, with the same act and slot sets as the one which encoded the session
+        :return: the session
+        """
+
+        data = memoryview(data)
+
+        version, last_active, session_id_length, metadata_length = _SESSION_HEADER.unpack_from(data, 0)
+        if version != const.SESSION_ENCODING_VERSION:
+            raise ValueError("Unsupported version %d of the session encoding, expected %d"
+                             % (version, const.SESSION_ENCODING_VERSION))
+
+        offset = _SESSION_HEADER.size
+        session_id = bytes(data[offset:offset + session_id_length]).decode('utf-8')
+        offset += session_id_length
+        metadata = json.loads(bytes(data[offset:offset + metadata_length]).decode('utf-8')) if metadata_length else {}
+        offset += metadata_length
+
+        history, current_slots, turn_nb = state_tracker.snapshot_from_bytes(data[offset:])
+
+        return cls(session_id, last_active, turn_nb, current_slots, tuple(history), metadata)
+
+
+class GOSessionManager(object):
+    """
+    Class for the session manager, holding many concurrent dialogue sessions keyed by their session id, and sharing a
+    single state tracker, NLU unit, NLG unit and policy between all of them. Before each turn the state of the session
+    is restored in the shared state tracker, and after it the state is saved back in the compact session record.
+
+    A turn is served in two halves, such that the policy can select the actions of many sessions at once in between:
+
+        - `begin_turn` updates the state with the user input and returns the state and the mask of the allowed actions
+        - `end_turn` updates the state with the selected agent action and returns it with its natural language form
+
+    or at once with `respond`.
+
+    The sessions idle for longer than ** idle_timeout ** are evicted, as well as the least recently active sessions
+    once there are more than ** max_nb_sessions **. A session is closed after the last turn allowed by the state
+    tracker.
+
+    # Class members:
+
+        - ** state_tracker **: the state tracker shared between the sessions
+        - ** nlu_unit **: the NLU unit shared between the sessions, None if the user input is in semantic frames
+        - ** nlg_unit **: the NLG unit shared between the sessions, None if the agent actions are not put in words
+        - ** select_actions **: the policy shared between the sessions, a function of an array of states and an array
+                            of action masks returning an array of action indices, like
+                            `GOGreedyPolicy.select_actions`
+        - ** agent_actions **: the immutable feasible agent actions
+        - ** action_masker **: the masker of the agent actions, None if the actions are not masked
+        - ** idle_timeout **: the number of seconds after which an idle session is evicted
+        - ** max_nb_sessions **: the maximal number of sessions, None for no limit
+        - ** sessions **: the sessions keyed by their id, from the least to the most recently active
+        - ** nb_evicted **: the number of evicted sessions so far
+    """
+
+    def __init__(self, state_tracker=None, nlu_unit=None, nlg_unit=None, select_actions=None, agent_actions=None,
+                 action_masker=None, idle_timeout=1800.0, max_nb_sessions=None, clock=time.time):
+        """
+        Constructor of the `GOSessionManager` class.
+
+        :param clock: the function giving the current time in seconds
+        """
+
+        self.state_tracker = state_tracker
+        self.nlu_unit = nlu_unit
+        self.nlg_unit = nlg_unit
+        self.select_actions = select_actions
+        self.agent_actions = agent_actions
+        self.action_masker = action_masker
+
+        self.idle_timeout = idle_timeout
+        self.max_nb_sessions = max_nb_sessions
+        self.clock = clock
+
+        self.sessions = OrderedDict()
+        self.nb_evicted = 0
+
+        self.__lock = threading.RLock()
+
+    @property
+    def nb_sessions(self):
+        """
+        Property for the number of open sessions.
+
+        :return: the number of sessions
+        """
+
+        return len(self.sessions)
+
+    def __evict(self, now):
+        """
+        Private helper method for evicting the idle sessions and the least recently active sessions above the maximal
+        number of sessions. The sessions are ordered by their last activity, so only the evicted ones are visited.
+
+        :param now: the current time
+        :return:
+        """
+
+        while self.sessions:
+            session = next(iter(self.sessions.values()))
+            over_limit = self.max_nb_sessions is not None and len(self.sessions) > self.max_nb_sessions
+            if not over_limit and now - session.last_active <= self.idle_timeout:
+                break
+
+            self.sessions.popitem(last=False)
+            self.nb_evicted += 1
+
+    def __get_session(self, session_id):
+        """
+        Private helper method for getting an open session and marking it as the most recently active.
+
+        :param session_id: the id of the session
+        :return: the session
+        """
+
+        now = self.clock()
+        self.__evict(now)
+
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise KeyError("The session %s is not open, it might have been evicted" % session_id)
+
+        session.last_active = now
+        self.sessions.move_to_end(session_id)
+
+        return session
+
+    def __restore(self, session):
+        """
+        Private helper method for restoring the state of the session in the shared state tracker.
+
+        :param session: the session
+        :return:
+        """
+
+        self.state_tracker.restore_snapshot((session.last_actions, session.current_slots, session.turn_nb))
+
+    def __save(self, session):
+        """
+        Private helper method for saving the state of the shared state tracker in the session. Only the last agent and
+        user action are kept from the history, since the state depends only on them.
+
+        :param session: the session
+        :return:
+        """
+
+        history, session.current_slots, session.turn_nb = self.state_tracker.get_snapshot()
+        session.last_actions = tuple(history[-2:])
+
+    def open_session(self, session_id=None, metadata=None):
+        """
+        Method for opening a new dialogue session.
+
+        :param session_id: the id of the session. If None, a random id is generated
+        :param metadata: dictionary with the user-facing metadata of the session
+        :return: the id of the session
+        """
+
+        with self.__lock:
+            if session_id is None:
+                session_id = uuid.uuid4().hex
+
+            now = self.clock()
+
+            self.state_tracker.reset()
+            session = GODialogueSession(session_id, now, metadata=metadata if metadata is not None else {})
+            self.__save(session)
+
+            self.sessions[session_id] = session
+            self.sessions.move_to_end(session_id)
+            self.__evict(now)
+
+            return session_id
+
+    def close_session(self, session_id):
+        """
+        Method for closing a dialogue session.
+
+        :param session_id: the id of the session
+        :return: the closed session, or None if it is not open
+        """
+
+        with self.__lock:
+            return self.sessions.pop(session_id, None)
+
+    def export_session(self, session_id, close=True):
+        """
+        Method for exporting a dialogue session in the binary form of `GODialogueSession.to_bytes`, for continuing it
+        in another process or node with `import_session`.
+
+        :param session_id: the id of the session
+        :param close: whether to close the session after exporting it
+        :return: the encoded session
+        """
+
+        with self.__lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                raise KeyError("The session %s is not open, it might have been evicted" % session_id)
+
+            data = session.to_bytes(self.state_tracker)
+            if close:
+                del self.sessions[session_id]
+
+            return data
+
+    def import_session(self, data):
+        """
+        Method for importing a dialogue session exported with `export_session`, marking it as active now.
+
+        :param data: the encoded session
+        :return: the id of the session
+        """
+
+        with self.__lock:
+            session = GODialogueSession.from_bytes(data, self.state_tracker)
+
+            now = self.clock()
+            session.last_active = now
+
+            self.sessions[session.session_id] = session
+            self.sessions.move_to_end(session.session_id)
+            self.__evict(now)
+
+            return session.session_id
+
+    def get_session(self, session_id):
+        """
+        Method for getting the record of an open dialogue session, without marking it as active.
+
+        :param session_id: the id of the session
+        :return: the session, or None if it is not open
+        """
+
+        return self.sessions.get(session_id)
+
+    def begin_turn(self, session_id, usr_input):
+        """
+        Method for beginning a turn of the dialogue with the user input. A user utterance which the NLU unit can not
+        parse, like an empty one, is taken as an inform without slots, see `nlu_usr_action`.
+
+        :param session_id: the id of the session
+        :param usr_input: the user utterance as a string, or the user action as a dictionary
+        :return: the state of shape (1, state_dim), and the mask of the allowed actions of shape (1, nb_actions), None
+        if the actions are not masked
+        """
+
+        with self.__lock:
+            session = self.__get_session(session_id)
+            self.__restore(session)
+
+            if isinstance(usr_input, str):
+                usr_action = nlu_usr_action(self.nlu_unit.generate_dia_act(usr_input), usr_input)
+            else:
+                usr_action = usr_input
+
+            self.state_tracker.update(usr_action, const.USR_SPEAKER_VAL)
+
+            state = self.state_tracker.produce_state()
+            action_mask = None
+            if self.action_masker is not None:
+                action_mask = self.action_masker.produce_masks(*self.state_tracker.produce_slot_bitmaps())
+
+            self.__save(session)
+
+            return state, action_mask
+
+    def end_turn(self, session_id, action, generate_nl=True):
+        """
+        Method for ending a turn of the dialogue with the selected agent action. The session is closed after the last
+        turn allowed by the state tracker.
+
+        :param session_id: the id of the session
+        :param action: the index of the selected agent action
+        :param generate_nl: whether to put the agent action in words with the NLG unit
+        :return: the agent action with its inform slots filled, and its natural language form under the ** nl ** key
+        """
+
+        with self.__lock:
+            session = self.__get_session(session_id)
+            self.__restore(session)
+
+            self.state_tracker.update(self.agent_actions[action], const.AGT_SPEAKER_VAL)
+
+            # the slot maps of the history record may be shared with the agent action, so they are copied
+            agt_action = dict(self.state_tracker.get_history()[-1])
+            agt_action[const.INFORM_SLOT_KEY] = dict(agt_action[const.INFORM_SLOT_KEY])
+            agt_action[const.REQUEST_SLOT_KEY] = dict(agt_action[const.REQUEST_SLOT_KEY])
+            if generate_nl and self.nlg_unit is not None:
+                agt_action[const.NL_KEY] = self.nlg_unit.convert_diaact_to_nl(agt_action, const.AGT_SPEAKER_VAL)
+
+            self.__save(session)
+
+            # the state of the next user turn is encoded with the turn number, which must stay below the maximal one
+            if session.turn_nb + 1 >= self.state_tracker.max_nb_turns:
+                del self.sessions[session_id]
+
+            return agt_action
+
+    def respond(self, session_id, usr_input):
+        """
+        Method for serving a whole turn of one session, selecting the agent action with the shared policy.
+
+        :param session_id: the id of the session
+        :param usr_input: the user utterance as a string, or the user action as a dictionary
+        :return: the agent action, as in `end_turn`
+        """
+
+        state, action_mask = self.begin_turn(session_id, usr_input)
+        action = int(np.ravel(self.select_actions(state, action_mask))[0])
+
+        return self.end_turn(session_id, action)
@@ -0,0 +1,80 @@
+"""
+Author: Vladimir Ilievski <ilievski.vladimir@live.com>
+
+A Python file for masking the feasible agent actions, given the state of the dialogue.
+"""
+
+from core import constants as const
+
+import numpy as np
+
+
+class GOActionMasker(object):
+    """
+    Class for producing the masks of the feasible agent actions from the slot bitmaps of the state tracker. The masks
+    are produced for a batch of dialogues at once, as a boolean array of shape (nb_dialogues, nb_actions), with two
+    matrix products against the slots of the agent actions.
+
+    The following agent actions are masked:
+
+        - the inform actions with a slot that is neither filled so far, nor has any matching entry in the knowledge
+          base. The task-completion slot is never masked, since the agent can always close the task.
+        - the request actions with a slot that is already filled.
+
+    If all actions of a dialogue are masked, none of them is masked.
+
+    # Class members:
+
+        - ** nb_actions **: the number of feasible agent actions
+        - ** inform_slots_matrix **: array of shape (nb_actions, nb_slots), the inform slots of each agent action
+        - ** request_slots_matrix **: array of shape (nb_actions, nb_slots), the request slots of each agent action
+        - ** always_available_slots **: boolean array of shape (nb_slots,), the inform slots which are never masked
+    """
+
+    def __init__(self, agent_actions=None, slot_set=None):
+        """
+        Constructor of the `GOActionMasker` class.
+
+        :param agent_actions: the feasible agent actions
+        :param slot_set: the set of all slots, mapping a slot to its id
+        """
+
+        self.nb_actions = len(agent_actions)
+
+        self.inform_slots_matrix = np.zeros((self.nb_actions, len(slot_set)), dtype=np.int32)
+        self.request_slots_matrix = np.zeros((self.nb_actions, len(slot_set)), dtype=np.int32)
+
+        for action_id, agent_action in enumerate(agent_actions):
+            for slot in agent_action[const.INFORM_SLOT_KEY].keys():
+                self.inform_slots_matrix[action_id, slot_set[slot]] = 1
+            for slot in agent_action[const.REQUEST_SLOT_KEY].keys():
+                self.request_slots_matrix[action_id, slot_set[slot]] = 1
+
+        self.always_available_slots = np.zeros(len(slot_set), dtype=np.bool_)
+        if const.TASK_COMPLETE_SLOT in slot_set:
+            self.always_available_slots[slot_set[const.TASK_COMPLETE_SLOT]] = True
+
+    def produce_masks(self, filled_slots, kb_slot_counts=None):
+        """
+        Method for producing the masks of the agent actions for a batch of dialogues.
+
+        :param filled_slots: boolean array of shape (nb_dialogues, nb_slots) with the slots filled so far
+        :param kb_slot_counts: array of shape (nb_dialogues, nb_slots) with the number of KB entries matching all
+        constraints which have each slot. If None, the inform actions are not masked
+        :return: boolean array of shape (nb_dialogues, nb_actions), True for the allowed actions
+        """
+
+        filled_slots = np.asarray(filled_slots, dtype=np.bool_)
+
+        # the request actions for slots which are already filled
+        masks = filled_slots.astype(np.int32).dot(self.request_slots_matrix.T) == 0
+
+        # the inform actions for slots which can not be filled
+        if kb_slot_counts is not None:
+            unavailable_slots = ~(filled_slots | (kb_slot_counts > 0) | self.always_available_slots)
+            masks &= unavailable_slots.astype(np.int32).dot(self.inform_slots_matrix.T) == 0
+
+        # never mask all actions of a dialogue
+        masks[~masks.any(axis=1)] = True
+
+        return masks
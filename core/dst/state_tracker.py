@@ -9,6 +9,27 @@ from core import constants as const
 
 import numpy as np
 import copy
+import struct
+
+# the maps of the running record of the slots, in the order of their binary encoding
+_SLOT_MAP_KEYS = (const.INFORM_SLOT_KEY, const.REQUEST_SLOT_KEY, const.PROPOSED_SLOT_KEY,
+                  const.AGENT_REQUESTED_SLOT_KEY)
+
+# the tags of the slot values in the binary encoding
+_UNKNOWN_VALUE_TAG = 0
+_STR_VALUE_TAG = 1
+_INT_VALUE_TAG = 2
+_FLOAT_VALUE_TAG = 3
+
+# the header of the binary encoding: the version, the turn number and the number of history records
+_SNAPSHOT_HEADER = struct.Struct('<BHH')
+# the header of a history record: the speaker flag, the intent id and the turn number
+_RECORD_HEADER = struct.Struct('<BBH')
+_VALUE_TAG = struct.Struct('<B')
+_STR_VALUE = struct.Struct('<BH')
+_INT_VALUE = struct.Struct('<Bq')
+_FLOAT_VALUE = struct.Struct('<Bd')
+
 
 class GOStateTracker:
     """
@@ -25,6 +46,8 @@ class GOStateTracker:
                         (inform slots) and which are requested (request slots)
         - ** state_dim **: the dimensionality of the state. It is calculated afterwards.
         - ** max_nb_turns **: the maximal number of dialogue turns
+        - ** act_names **: the intents ordered by their index in the act set
+        - ** slot_names **: the slots ordered by their index in the slot set
     """
 
     def __init__(self, act_set=None, slot_set=None, max_nb_turns=None):
@@ -53,8 +76,13 @@ class GOStateTracker:
         self.current_turn_nb = 0
         self.max_nb_turns = max_nb_turns
 
-        # TODO
-        self.state_dim = 0
+        # the one-hot intents and the slot bags of the last user and agent action, the bag of all inform slots, the
+        # scaled and the one-hot turn number, and the binary and the scaled KB results
+        self.state_dim = 2 * self.act_set_cardinality + 7 * self.slot_set_cardinality + 3 + self.max_nb_turns
+
+        # the inverse of the act and slot sets, for decoding the binary encoding
+        self.act_names = sorted(self.act_set, key=self.act_set.get)
+        self.slot_names = sorted(self.slot_set, key=self.slot_set.get)
 
     def __update_usr_action(self, usr_action):
         """
@@ -102,6 +130,186 @@ class GOStateTracker:
 
         return self.history[-2] if len(self.history) > 1 else None
 
+    def get_snapshot(self):
+        """
+        Method for taking a snapshot of the state tracker, which can be restored afterwards. The history records are
+        never changed once added, so they are shared, while the running record of the slots is copied.
+
+        :return: the snapshot of the state tracker
+        """
+
+        current_slots = {key: dict(slots) for key, slots in self.current_slots.items()}
+        return list(self.history), current_slots, self.current_turn_nb
+
+    def restore_snapshot(self, snapshot):
+        """
+        Method for restoring the state tracker from a snapshot taken with `get_snapshot`.
+
+        :param snapshot: the snapshot of the state tracker
+        :return: true if the restoring was successful
+        """
+
+        history, current_slots, current_turn_nb = snapshot
+
+        self.history = list(history)
+        self.current_slots = {key: dict(slots) for key, slots in current_slots.items()}
+        self.current_turn_nb = current_turn_nb
+
+        return True
+
+    def __pack_slots(self, slots, chunks):
+        """
+        Private helper method for encoding a map of slots, as the bitmap of the slots followed by their tagged values
+        in the order of the slot ids.
+
+        :param slots: dictionary of the slots and their values
+        :param chunks: list of the encoded chunks, to which the encoding is appended
+        :return:
+        """
+
+        slot_ids = sorted(self.slot_set[slot] for slot in slots)
+
+        bitmap = 0
+        for slot_id in slot_ids:
+            bitmap |= 1 << slot_id
+        chunks.append(bitmap.to_bytes((self.slot_set_cardinality + 7) // 8, 'little'))
+
+        for slot_id in slot_ids:
+            value = slots[self.slot_names[slot_id]]
+            if isinstance(value, str):
+                if value == const.UNKNOWN_SLOT_VALUE:
+                    chunks.append(_VALUE_TAG.pack(_UNKNOWN_VALUE_TAG))
+                else:
+                    encoded_value = value.encode('utf-8')
+                    chunks.append(_STR_VALUE.pack(_STR_VALUE_TAG, len(encoded_value)))
+                    chunks.append(encoded_value)
+            elif isinstance(value, (int, np.integer)):
+                chunks.append(_INT_VALUE.pack(_INT_VALUE_TAG, value))
+            elif isinstance(value, (float, np.floating)):
+                chunks.append(_FLOAT_VALUE.pack(_FLOAT_VALUE_TAG, value))
+            else:
+                raise ValueError("Cannot encode the value %r of the slot %s" % (value, self.slot_names[slot_id]))
+
+    def __unpack_slots(self, data, offset):
+        """
+        Private helper method for decoding a map of slots encoded with `__pack_slots`.
+
+        :param data: the encoded bytes
+        :param offset: the offset of the encoded map of slots
+        :return: dictionary of the slots and their values, and the offset after the encoded map
+        """
+
+        bitmap_nbytes = (self.slot_set_cardinality + 7) // 8
+        bitmap = int.from_bytes(data[offset:offset + bitmap_nbytes], 'little')
+        offset += bitmap_nbytes
+
+        slots = {}
+        while bitmap:
+            lowest_bit = bitmap & -bitmap
+            bitmap ^= lowest_bit
+            slot = self.slot_names[lowest_bit.bit_length() - 1]
+
+            tag = data[offset]
+            if tag == _UNKNOWN_VALUE_TAG:
+                slots[slot] = const.UNKNOWN_SLOT_VALUE
+                offset += _VALUE_TAG.size
+            elif tag == _STR_VALUE_TAG:
+                _, length = _STR_VALUE.unpack_from(data, offset)
+                offset += _STR_VALUE.size
+                slots[slot] = bytes(data[offset:offset + length]).decode('utf-8')
+                offset += length
+            elif tag == _INT_VALUE_TAG:
+                slots[slot] = _INT_VALUE.unpack_from(data, offset)[1]
+                offset += _INT_VALUE.size
+            elif tag == _FLOAT_VALUE_TAG:
+                slots[slot] = _FLOAT_VALUE.unpack_from(data, offset)[1]
+                offset += _FLOAT_VALUE.size
+            else:
+                raise ValueError("Unknown tag %d of the value of the slot %s" % (tag, slot))
+
+        return slots, offset
+
+    def snapshot_to_bytes(self, snapshot):
+        """
+        Method for encoding a snapshot of the state tracker in a compact versioned binary form, which is independent
+        of the process, for moving dialogues between processes or nodes. The intents and the slots are encoded with
+        their ids, the presence of the slots with bitmaps, and the slot values with a tag and, for the strings, their
+        length. The snapshot is decoded with `snapshot_from_bytes` of a state tracker with the same act and slot sets.
+
+        :param snapshot: the snapshot of the state tracker, as taken with `get_snapshot`
+        :return: the encoded bytes
+        """
+
+        history, current_slots, current_turn_nb = snapshot
+
+        chunks = [_SNAPSHOT_HEADER.pack(const.STATE_TRACKER_ENCODING_VERSION, current_turn_nb, len(history))]
+
+        for key in _SLOT_MAP_KEYS:
+            self.__pack_slots(current_slots[key], chunks)
+
+        for record in history:
+            chunks.append(_RECORD_HEADER.pack(record[const.SPEAKER_TYPE_KEY] == const.AGT_SPEAKER_VAL,
+                                              self.act_set[record[const.DIA_ACT_KEY]], record[const.TURN_NB_KEY]))
+            self.__pack_slots(record[const.INFORM_SLOT_KEY], chunks)
+            self.__pack_slots(record[const.REQUEST_SLOT_KEY], chunks)
+
+        return b''.join(chunks)
+
+    def snapshot_from_bytes(self, data):
+        """
+        Method for decoding a snapshot of the state tracker encoded with `snapshot_to_bytes`.
+
+        :param data: the encoded bytes
+        :return: the snapshot of the state tracker, which can be restored with `restore_snapshot`
+        """
+
+        data = memoryview(data)
+
+        version, current_turn_nb, nb_records = _SNAPSHOT_HEADER.unpack_from(data, 0)
+        if version != const.STATE_TRACKER_ENCODING_VERSION:
+            raise ValueError("Unsupported version %d of the state tracker encoding, expected %d"
+                             % (version, const.STATE_TRACKER_ENCODING_VERSION))
+        offset = _SNAPSHOT_HEADER.size
+
+        current_slots = {}
+        for key in _SLOT_MAP_KEYS:
+            current_slots[key], offset = self.__unpack_slots(data, offset)
+
+        history = []
+        for _ in range(nb_records):
+            is_agent, act_id, turn_nb = _RECORD_HEADER.unpack_from(data, offset)
+            offset += _RECORD_HEADER.size
+
+            record = {}
+            record[const.TURN_NB_KEY] = turn_nb
+            record[const.SPEAKER_TYPE_KEY] = const.AGT_SPEAKER_VAL if is_agent else const.USR_SPEAKER_VAL
+            record[const.DIA_ACT_KEY] = self.act_names[act_id]
+            record[const.INFORM_SLOT_KEY], offset = self.__unpack_slots(data, offset)
+            record[const.REQUEST_SLOT_KEY], offset = self.__unpack_slots(data, offset)
+            history.append(record)
+
+        return history, current_slots, current_turn_nb
+
+    def to_bytes(self):
+        """
+        Method for encoding the state tracker, with its whole history, in the compact binary form of
+        `snapshot_to_bytes`.
+
+        :return: the encoded bytes
+        """
+
+        return self.snapshot_to_bytes(self.get_snapshot())
+
+    def from_bytes(self, data):
+        """
+        Method for restoring the state tracker from its encoding with `to_bytes`.
+
+        :param data: the encoded bytes
+        :return: true if the restoring was successful
+        """
+
+        return self.restore_snapshot(self.snapshot_from_bytes(data))
+
     def reset(self):
         """
         Abstract method for resetting the dialogue state tracker, usually at the beginning of a new episode.
@@ -129,6 +337,17 @@ class GOStateTracker:
         """
         raise NotImplementedError()
 
+    def update_turn_record(self, turn_record=None, speaker=""):
+        """
+        Abstract method to update the state tracker with the last user or agent action from the turn record of the
+        fused environment step, without copying the actions.
+
+        :param turn_record: the turn record holding the user and the agent action
+        :param speaker: whose action to take from the turn record, the user's or the agent's
+        :return:
+        """
+        raise NotImplementedError()
+
 
 class GORuleBasedStateTracker(GOStateTracker):
     """
@@ -138,28 +357,34 @@ class GORuleBasedStateTracker(GOStateTracker):
     # Class members:
         
         - ** state_dim **: the dimension of the state
+        - ** kb_helper **: the helper for filling the agent inform slots from the knowledge base, None if there is no
+                        knowledge base
     """
 
-    def __init__(self, act_set=None, slot_set=None, max_nb_turns=None):
+    def __init__(self, act_set=None, slot_set=None, max_nb_turns=None, kb_helper=None):
         """
         Constructor of the [GO Rule Based State Tracker] class.
         """
 
         super(GORuleBasedStateTracker, self).__init__(act_set, slot_set, max_nb_turns)
 
-        # TODO
-        self.state_dim = 0
+        self.kb_helper = kb_helper
+
+        # the one-hot intents and the slot bags of the last user and agent action, the bag of all inform slots, the
+        # scaled and the one-hot turn number, and the binary and the scaled KB results
+        self.state_dim = 2 * self.act_set_cardinality + 7 * self.slot_set_cardinality + 3 + self.max_nb_turns
 
     def __encode_action_intent(self, action_intent):
         """
         Private helper method to create one-hot encoding for the intent of the current user or agent action.
 
-        :param action_intent: string, describing the intent of the user or agent action
+        :param action_intent: string, describing the intent of the user or agent action, None if there is no action
         :return: list in one-hot format
         """
 
         action_intent_encoding = np.zeros((1, self.act_set_cardinality))
-        action_intent_encoding[0, self.act_set[action_intent]] = 1.0
+        if action_intent is not None:
+            action_intent_encoding[0, self.act_set[action_intent]] = 1.0
 
         return action_intent_encoding
 
@@ -259,9 +484,10 @@ class GORuleBasedStateTracker(GOStateTracker):
                 kb_binary_count_encoding[0, self.slot_set[slot]] = np.sum(kb_results_dict[slot] > 0.)
         return kb_binary_count_encoding
 
-    def __update_usr_action(self, usr_action):
+    def __update_usr_action(self, usr_action, copy_action=True):
         """
-        Abstract method implementation.
+        Abstract method implementation. If the action is not copied, only its slot dictionaries are shallow copied,
+        since the user keeps changing them in the next turns.
         """
 
         # Iterate over the inform slots from the last user action and update the state tracker running record
@@ -281,21 +507,31 @@ class GORuleBasedStateTracker(GOStateTracker):
         new_history_record[const.TURN_NB_KEY] = self.current_turn_nb
         new_history_record[const.SPEAKER_TYPE_KEY] = const.USR_SPEAKER_VAL
         new_history_record[const.DIA_ACT_KEY] = usr_action[const.DIA_ACT_KEY]
-        new_history_record[const.INFORM_SLOT_KEY] = usr_action[const.INFORM_SLOT_KEY]
-        new_history_record[const.REQUEST_SLOT_KEY] = usr_action[const.REQUEST_SLOT_KEY]
 
-        self.history.append(copy.deepcopy(new_history_record))
+        if copy_action:
+            new_history_record[const.INFORM_SLOT_KEY] = usr_action[const.INFORM_SLOT_KEY]
+            new_history_record[const.REQUEST_SLOT_KEY] = usr_action[const.REQUEST_SLOT_KEY]
+            self.history.append(copy.deepcopy(new_history_record))
+        else:
+            new_history_record[const.INFORM_SLOT_KEY] = dict(usr_action[const.INFORM_SLOT_KEY])
+            new_history_record[const.REQUEST_SLOT_KEY] = dict(usr_action[const.REQUEST_SLOT_KEY])
+            self.history.append(new_history_record)
 
         return True
 
-    def __update_agt_action(self, agt_action):
+    def __update_agt_action(self, agt_action, copy_action=True):
         """
-        Abstract method implementation.
+        Abstract method implementation. The agent action is only read, the values filled from the knowledge base are
+        kept in a separate dictionary of inform slots. If the action is not copied, its slot maps are shared with the
+        history, since the agent actions are immutable.
         """
 
-        # Make a copy and call KB helper methods to fill in the values for the inform slots
-        agt_action_copy = copy.deepcopy(agt_action)
-        inform_slots_from_kb = None #TODO
+        # Call KB helper methods to fill in the values for the inform slots, without changing the agent action
+        if self.kb_helper is not None:
+            inform_slots_from_kb = self.kb_helper.fill_inform_slots(agt_action[const.INFORM_SLOT_KEY],
+                                                                    self.current_slots)
+        else:
+            inform_slots_from_kb = agt_action[const.INFORM_SLOT_KEY]
 
         # Iterate over the inform slots from the KB and update the state tracker running record
         for slot in inform_slots_from_kb.keys():
@@ -306,7 +542,7 @@ class GORuleBasedStateTracker(GOStateTracker):
                 del self.current_slots[const.REQUEST_SLOT_KEY][slot]
 
         # Iterate over the request slots from the last agent action and update the state tracker running record
-        for slot in agt_action_copy[const.REQUEST_SLOT_KEY].keys():
+        for slot in agt_action[const.REQUEST_SLOT_KEY].keys():
             if slot not in self.current_slots[const.AGENT_REQUESTED_SLOT_KEY].keys():
                 self.current_slots[const.AGENT_REQUESTED_SLOT_KEY][slot] = const.UNKNOWN_SLOT_VALUE
 
@@ -314,11 +550,17 @@ class GORuleBasedStateTracker(GOStateTracker):
         new_history_record = {}
         new_history_record[const.TURN_NB_KEY] = self.current_turn_nb
         new_history_record[const.SPEAKER_TYPE_KEY] = const.AGT_SPEAKER_VAL
-        new_history_record[const.DIA_ACT_KEY] = agt_action_copy[const.DIA_ACT_KEY]
-        new_history_record[const.INFORM_SLOT_KEY] = agt_action_copy[const.INFORM_SLOT_KEY]
-        new_history_record[const.REQUEST_SLOT_KEY] = agt_action_copy[const.REQUEST_SLOT_KEY]
+        new_history_record[const.DIA_ACT_KEY] = agt_action[const.DIA_ACT_KEY]
+
+        # the slot values are strings, so copying the slot maps is enough
+        if copy_action:
+            new_history_record[const.INFORM_SLOT_KEY] = dict(inform_slots_from_kb)
+            new_history_record[const.REQUEST_SLOT_KEY] = dict(agt_action[const.REQUEST_SLOT_KEY])
+        else:
+            new_history_record[const.INFORM_SLOT_KEY] = inform_slots_from_kb
+            new_history_record[const.REQUEST_SLOT_KEY] = agt_action[const.REQUEST_SLOT_KEY]
 
-        self.history.append(copy.deepcopy(new_history_record))
+        self.history.append(new_history_record)
 
         return True
 
@@ -365,6 +607,10 @@ class GORuleBasedStateTracker(GOStateTracker):
         last_usr_action = self.get_last_usr_action()
         last_agt_action = self.get_last_agt_action()
 
+        # at the beginning of the dialogue, the agent has not taken any action yet
+        if last_agt_action is None:
+            last_agt_action = {const.DIA_ACT_KEY: None, const.INFORM_SLOT_KEY: {}, const.REQUEST_SLOT_KEY: {}}
+
         # user action intent encoding
         usr_action_intent_encoding = self.__encode_action_intent(last_usr_action[const.DIA_ACT_KEY])
 
@@ -392,8 +638,11 @@ class GORuleBasedStateTracker(GOStateTracker):
         # one-hot dialogue turn number encoding
         dialogue_turn_encoding = self.__encode_dialogue_turn(self.current_turn_nb)
 
-        # TODO: create the KB helper class to query the KB
-        kb_results_dict = {}
+        # query the KB with the constraints so far
+        if self.kb_helper is not None:
+            kb_results_dict = self.kb_helper.database_results_for_agent(self.current_slots)
+        else:
+            kb_results_dict = {const.KB_MATCHING_ALL_CONSTRAINTS_KEY: 0}
 
         # kb scaled encoding
         kb_scaled_count_encoding = self.__encode_kb_results_scaled(kb_results_dict)
@@ -410,10 +659,50 @@ class GORuleBasedStateTracker(GOStateTracker):
 
         return final_representation
 
+    def produce_binary_state_mask(self):
+        """
+        Method to produce the mask of the binary features in the state representation. All features are 0/1, except
+        the scaled turn number and the scaled KB results, such that the states can be bit-packed in the replay memory.
+
+        :return: boolean array of shape (state_dim,), True for the binary features
+        """
+
+        binary_state_mask = np.ones(self.state_dim, dtype=np.bool_)
+
+        # the scaled turn number follows the slot bags of the actions and the bag of all inform slots
+        binary_state_mask[2 * self.act_set_cardinality + 5 * self.slot_set_cardinality] = False
+
+        # the scaled KB results are the last features
+        binary_state_mask[-(self.slot_set_cardinality + 1):] = False
+
+        return binary_state_mask
+
+    def produce_slot_bitmaps(self):
+        """
+        Method to produce the bitmaps of the slots, used for masking the agent actions together with the state.
+
+        :return: boolean array of shape (1, nb_slots) with the slots filled so far, and array of shape (1, nb_slots)
+        with the number of KB entries matching all constraints which have each slot, None if there is no KB
+        """
+
+        filled_slots = np.zeros((1, self.slot_set_cardinality), dtype=np.bool_)
+        for slot in self.current_slots[const.INFORM_SLOT_KEY]:
+            filled_slots[0, self.slot_set[slot]] = True
+
+        if self.kb_helper is None:
+            return filled_slots, None
+
+        kb_slot_counts = np.zeros((1, self.slot_set_cardinality))
+        for slot, count in self.kb_helper.available_slot_counts(self.current_slots).items():
+            if slot in self.slot_set:
+                kb_slot_counts[0, self.slot_set[slot]] = count
+
+        return filled_slots, kb_slot_counts
+
     def update(self, action=None, speaker=None):
 
         # the function should be called proplerly
-        assert (not (action and speaker))
+        assert (action and speaker)
 
         # increase the turn number for one
         self.current_turn_nb += 1
@@ -423,6 +712,19 @@ class GORuleBasedStateTracker(GOStateTracker):
         else:
             return self.__update_agt_action(action)
 
+    def update_turn_record(self, turn_record=None, speaker=None):
+
+        # the function should be called properly
+        assert (turn_record and speaker)
+
+        # increase the turn number for one
+        self.current_turn_nb += 1
+
+        if speaker == const.USR_SPEAKER_VAL:
+            return self.__update_usr_action(turn_record.usr_action, copy_action=False)
+        else:
+            return self.__update_agt_action(turn_record.agt_action, copy_action=False)
+
 
 class GOModelBasedStateTracker(GOStateTracker):
     """
@@ -0,0 +1,181 @@
+"""
+Author: Vladimir Ilievski <ilievski.vladimir@live.com>
+
+A Python file for the asyncio-based environment, used for serving many concurrent real-user dialogues in one process.
+"""
+
+from core import constants as const
+from core.dm.session_manager import default_usr_action
+
+import asyncio
+
+
+class GOAsyncEnv:
+    """
+    The asyncio counterpart of the `GOEnv` environment. The `step` and `reset` methods are coroutines, such that one
+    event loop can multiplex thousands of concurrent dialogues, each of them waiting on its own user.
+
+    The NLU and NLG units are shared between all environments and their calls are offloaded to a thread pool, such
+    that the NumPy work never stalls the event loop. The state tracker is cheap and it is owned by each environment.
+
+    # Class members:
+
+        - ** simulation_mode **: the mode of the simulation, semantic frame or natural language sentences
+        - ** max_nb_turns **: the maximal number of allowed dialogue turns. Afterwards, the dialogue is considered failed
+        - ** user **: a user with coroutine `reset` and `step` methods, for example `GOAsyncRealUser`
+        - ** state_tracker **: the state tracker used for tracking the state of the dialogue
+        - ** nlu_unit **: the shared NLU unit for transforming the user utterance to a dialogue act
+        - ** nlg_unit **: the shared NLG unit for transforming the agent's action to a natural language sentence
+        - ** executor **: the shared thread pool running the NLU and NLG calls. If None, the loop's default is used
+    """
+
+    def __init__(self, simulation_mode=None, user=None, state_tracker=None, nlu_unit=None, nlg_unit=None,
+                 executor=None, max_nb_turns=None):
+        """
+        Constructor for the asyncio Environment class.
+
+        :param simulation_mode: semantic frame or natural language sentence form of user utterances
+        :param user: the user with coroutine `reset` and `step` methods
+        :param state_tracker: the state tracker owned by this environment
+        :param nlu_unit: the already loaded NLU unit, shared between environments
+        :param nlg_unit: the already loaded NLG unit, shared between environments
+        :param executor: the thread pool for the NLU and NLG calls, shared between environments
+        :param max_nb_turns: the maximal number of allowed dialogue turns
+        """
+
+        self.simulation_mode = simulation_mode
+
+        self.user = user
+        self.state_tracker = state_tracker
+
+        self.nlu_unit = nlu_unit
+        self.nlg_unit = nlg_unit
+        self.executor = executor
+
+        self.current_turn_nb = 0
+        self.max_nb_turns = max_nb_turns
+
+    async def __run_in_executor(self, func, *args):
+        """
+        Private helper coroutine for running a blocking call in the thread pool.
+
+        :param func: the blocking function to run
+        :param args: the arguments of the function
+        :return: the result of the function
+        """
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def __process_usr_action(self, usr_action):
+        """
+        Private helper coroutine for processing the user action.
+
+        :param usr_action: the user action to be processed
+        :return: processed user action
+        """
+
+        # real users are providing only the NL representation, simulated users only the dialogue act
+        if const.NL_KEY not in usr_action:
+            user_nlg_sentence = await self.__run_in_executor(self.nlg_unit.convert_diaact_to_nl, usr_action,
+                                                             const.USR_SPEAKER_VAL)
+            usr_action[const.NL_KEY] = user_nlg_sentence
+
+        # if the simulation mode is on Natural Language level, generate new user action
+        if self.simulation_mode == const.NL_SIMULATION_MODE:
+            user_nlu_res = await self.__run_in_executor(self.nlu_unit.generate_dia_act, usr_action[const.NL_KEY])
+            if user_nlu_res is not None:
+                usr_action.update(user_nlu_res)
+
+        # the NLU gives no result for an empty sentence. A simulated user action is kept, while a real user action,
+        # holding only the natural language part, becomes the default action of the NLU, as in `nlu_usr_action`
+        for key, value in default_usr_action().items():
+            usr_action.setdefault(key, value)
+
+        return usr_action
+
+    async def __process_agt_action(self, agt_action):
+        """
+        Private helper coroutine for processing the agent action.
+
+        :param agt_action: the agent action to be processed
+        :return: processed agent action
+        """
+
+        # add NL representation to a shallow copy of the agent action, the agent actions are immutable
+        agt_action = dict(agt_action)
+        agent_nlg_sentence = await self.__run_in_executor(self.nlg_unit.convert_diaact_to_nl, agt_action,
+                                                          const.AGT_SPEAKER_VAL)
+        agt_action[const.NL_KEY] = agent_nlg_sentence
+
+        return agt_action
+
+    async def step(self, action):
+        """
+        Coroutine for taking the environment one step further. The agent action is presented to the user and the
+        environment is awaiting the user's response.
+
+        :param action: the last agent action
+        :return: user's response to the agent's action in form of a state, the reward, the done flag and the info
+        """
+
+        new_state = {}
+        reward = 0
+        done = False
+        info = {}
+
+        # increase the dialogue turn number
+        self.current_turn_nb += 1
+        # process the agent action
+        proc_agt_action = await self.__process_agt_action(action)
+        # update the state tracker with the new agent action
+        self.state_tracker.update(proc_agt_action, const.AGT_SPEAKER_VAL)
+
+        if self.current_turn_nb >= self.max_nb_turns:
+            done = True
+        else:
+            # await the new user action
+            new_user_action, dialogue_status = await self.user.step(proc_agt_action)
+
+            # the user has left the conversation
+            if new_user_action is None:
+                done = True
+            else:
+                # increase the dialogue turn number
+                self.current_turn_nb += 1
+                # process the new user action
+                proc_new_user_action = await self.__process_usr_action(new_user_action)
+                # update the state tracker with the new user action
+                self.state_tracker.update(proc_new_user_action, const.USR_SPEAKER_VAL)
+                # produce new state for the agent
+                new_state = self.state_tracker.produce_state()
+
+        return new_state, reward, done, info
+
+    async def reset(self):
+        """
+        Coroutine for resetting the dialogue state tracker and the user, called at the beginning of each new episode.
+
+        :return: the initial observation, or None if the user has left before the first utterance
+        """
+
+        self.current_turn_nb = 0
+
+        # reset the dst
+        self.state_tracker.reset()
+        # reset the user and await the initial action
+        init_usr_action = await self.user.reset()
+
+        if init_usr_action is None:
+            return None
+
+        # increase the dialogue turn number
+        self.current_turn_nb += 1
+        # process the init user action
+        proc_init_usr_action = await self.__process_usr_action(init_usr_action)
+        # update the dialogue state tracker
+        self.state_tracker.update(proc_init_usr_action, const.USR_SPEAKER_VAL)
+        # produce state for the agent
+        init_state = self.state_tracker.produce_state()
+
+        return init_state
@@ -5,20 +5,68 @@ A Python file
 """
 
 from core import constants as const
+from core import dialog_config
 
 import core.dst.state_tracker as state_trackers
 import core.user.users as users
+import core.user.replay_users as replay_users
+from core.agent.actions import build_agent_actions
+from core.dm.kb_helper import load_kb_helper
+from core.dst.action_mask import GOActionMasker
+from core.user.goal_set import load_goal_set
 
 from nlp.nlu.nlu import nlu
 from nlp.nlg.nlg import nlg
 
-from rl.core import Env
+from collections.abc import Mapping
+import argparse
+import functools
+import json
+import random
+import time
+import tracemalloc
 
+import numpy as np
 
-class GOEnv(Env):
+
+class GOTurnRecord(object):
+    """
+    Preallocated record of one dialogue turn. In the fused environment step, it is passed through the processor, the
+    NLG, the user, the NLU and the state tracker, instead of copying and mutating the action dictionaries on the way.
+
+    # Class members:
+
+        - ** agt_action **: the agent action template from the feasible actions, which is read-only
+        - ** agt_nl **: the natural language representation of the agent action
+        - ** usr_action **: the user action, as returned by the user or by the NLU unit
+        - ** usr_nl **: the natural language representation of the user action
+        - ** dialogue_status **: the dialogue status after the user action
+    """
+
+    __slots__ = ('agt_action', 'agt_nl', 'usr_action', 'usr_nl', 'dialogue_status')
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        """
+        Method for clearing the record before the next dialogue turn.
+
+        :return:
+        """
+
+        self.agt_action = None
+        self.agt_nl = ""
+        self.usr_action = None
+        self.usr_nl = ""
+        self.dialogue_status = const.NO_OUTCOME_YET
+
+
+class GOEnv(object):
     """
-    The Environment with which the agent is interacting with. It extends the keras-rl class Env.
-    Therefore, the following methods are implemented:
+    The Environment with which the agent is interacting with. It has the interface of the keras-rl class Env, without
+    depending on keras-rl, such that the NumPy agents and their worker processes run without keras. Therefore, the
+    following methods are implemented:
     
     - `step`
     - `reset`
@@ -29,14 +77,6 @@ class GOEnv(Env):
     
     # Class members:
     
-    From `rl.Env` class:
-    
-        - ** reward_shape **: the shape of the reward matrix
-        - ** action_space **: the space of possible actions
-        - ** observation_space **: the space of observations to ... (have to find the exact meaning)
-    
-    Own:
-    
         - ** simulation_mode **: the mode of the simulation, semantic frame or natural language sentences
         - ** is_training **: flag indicating the training/testing mode
         - ** max_nb_turns **: the maximal number of allowed dialogue turns. Afterwards, the dialogue is considered failed
@@ -48,11 +88,17 @@ class GOEnv(Env):
         - ** slot_set **: the set of all dialogue slots
         - ** feasible_actions **: list of templates described as dictionaries, corresponding to each action the agent might take
                             (dict to be specified)
+        - ** agent_actions **: the immutable agent actions, built once for all feasible actions
+        - ** action_masker **: the producer of the masks of the agent actions allowed in the current state
+        - ** turn_record **: the preallocated turn record used by the fused step
+        - ** init_obs_cache **: cache of the processed initial user action and initial state, for each pair of user goal
+                            and initial user action. None if the caching is disabled
     """
 
     def __init__(self, simulation_mode=None, is_training=False, user_type_str="", user_path="", dst_type_str="",
                  dst_path="", act_set=None, slot_set=None, feasible_actions=None, max_nb_turns=None, nlu_path="",
-                 nlg_path="", *args, **kwargs):
+                 nlg_path="", cache_init_obs=True, goal_set=None, user_transition_cache_size=0, kb_path="", *args,
+                 **kwargs):
         """
         Constructor for the Environment class.
         
@@ -66,10 +112,14 @@ class GOEnv(Env):
         :slot_set: the set of all dialogue slots
         :param nlu_path: the path to load the NLU unit
         :param nlg_path: the path to load the NLG unit
+        :param cache_init_obs: flag indicating whether to cache the initial observations per user goal
+        :param goal_set: the set of goals for the simulated users
+        :param user_transition_cache_size: the size of the transition cache of the rule-based user, 0 for no caching
+        :param kb_path: the path to the knowledge base, for filling the agent inform slots (empty if none)
         """
 
         # call super class constructor
-        super(GOEnv).__init__(*args, **kwargs)
+        super(GOEnv, self).__init__(*args, **kwargs)
 
         self.simulation_mode = simulation_mode
         self.is_training = is_training
@@ -78,16 +128,18 @@ class GOEnv(Env):
         self.slot_set = slot_set
 
         self.feasible_actions = feasible_actions
+        self.agent_actions = build_agent_actions(feasible_actions)
+        self.action_masker = GOActionMasker(self.agent_actions, slot_set)
 
         self.current_turn_nb = 0
         self.max_nb_turns = max_nb_turns
 
         # create the user
-        self.user = self.__create_user(user_type_str, user_path, is_training)
+        self.user = self.__create_user(user_type_str, user_path, is_training, goal_set, user_transition_cache_size)
 
         # create the state tracker
         self.state_tracker = self.__create_state_tracker(dst_type_str, dst_path, is_training, act_set, slot_set,
-                                                         max_nb_turns)
+                                                         max_nb_turns, kb_path)
 
         # create the nlu unit
         self.nlu_unit = self.__create_nlu_unit(nlu_path)
@@ -95,22 +147,37 @@ class GOEnv(Env):
         # create the nlg unit
         self.nlg_unit = self.__create_nlg_unit(nlg_path)
 
-    def __create_user(self, user_type_str, user_path, is_training):
+        # the record passed through the fused step
+        self.turn_record = GOTurnRecord()
+
+        # the initial user actions are few per goal, so their processing can be cached
+        self.init_obs_cache = {} if cache_init_obs else None
+
+    def __create_user(self, user_type_str, user_path, is_training, goal_set, transition_cache_size=0):
         """
         Private helper method for creating a user.
         
         :param user_type_str: the type of the user tp create (rule-based or model-based)
-        :param user_path: the path to load a trained user model (empty is not model-based)
+        :param user_path: the path to load a trained user model, or the list of paths to the logged dialogues for the
+        replay user (empty otherwise)
         :param is_training: flag indicating the training/testing mode of the user (for the model-based)
+        :param goal_set: the set of goals for the simulated users
+        :param transition_cache_size: the size of the transition cache of the rule-based user
         :return: the newly created user
         """
 
         user = None
 
         if user_type_str == const.RULE_BASED_USER:
-            user = users.GORuleBasedUser()
+            user = users.GORuleBasedUser(None, self.simulation_mode, goal_set, self.slot_set, self.act_set,
+                                         dialog_config.start_dia_acts, list(dialog_config.start_dia_acts.keys()),
+                                         transition_cache_size=transition_cache_size)
         elif user_type_str == const.MODEL_BASED_USER:
-            user = users.GOModelBasedUser(is_training, user_path)
+            user = users.GOModelBasedUser(None, self.simulation_mode, goal_set, self.slot_set, self.act_set,
+                                          is_training, user_path)
+        elif user_type_str == const.REPLAY_USER:
+            user = replay_users.GOCorpusReplayUser(None, self.simulation_mode,
+                                                   replay_users.GODialogueCorpusReader(user_path))
         elif user_type_str == const.REAL_USER:
             user = users.GORealUser()
         else:
@@ -118,7 +185,8 @@ class GOEnv(Env):
 
         return user
 
-    def __create_state_tracker(self, dst_type_str, dst_path, is_training, act_set, slot_set, max_nb_turns):
+    def __create_state_tracker(self, dst_type_str, dst_path, is_training, act_set, slot_set, max_nb_turns,
+                               kb_path=""):
         """
         Private helper method for creating a state tracker.
         
@@ -127,12 +195,14 @@ class GOEnv(Env):
         :param is_training: flag indicating the training/testing mode of the user (for the model-based)
         :act_set: the set of all dialogue acts (intents)
         :slot_set: the set of all dialogue slots
+        :param kb_path: the path to the knowledge base (empty if none)
         :return: the newly created state tracker
         """
         state_tracker = None
 
         if dst_type_str == const.RULE_BASED_STATE_TRACKER:
-            state_tracker = state_trackers.GORuleBasedStateTracker(act_set, slot_set, max_nb_turns)
+            kb_helper = load_kb_helper(kb_path) if kb_path else None
+            state_tracker = state_trackers.GORuleBasedStateTracker(act_set, slot_set, max_nb_turns, kb_helper)
         elif dst_type_str == const.MODEL_BASED_STATE_TRACKER:
             state_tracker = state_trackers.GOModelBasedStateTracker(act_set, slot_set, max_nb_turns, is_training,
                                                                     dst_path)
@@ -174,13 +244,15 @@ class GOEnv(Env):
         """
 
         # by default add NL representation to the user action
-        user_nlg_sentence = self.nlg_model.convert_diaact_to_nl(usr_action, const.USR_SPEAKER_VAL)
+        user_nlg_sentence = self.nlg_unit.convert_diaact_to_nl(usr_action, const.USR_SPEAKER_VAL)
         usr_action[const.NL_KEY] = user_nlg_sentence
 
         # if the simulation mode is on Natural Language level, generate new user action
         if self.simulation_mode == const.NL_SIMULATION_MODE:
-            user_nlu_res = self.nlu_model.generate_dia_act(usr_action[const.NL_KEY])
-            usr_action.update(user_nlu_res)
+            user_nlu_res = self.nlu_unit.generate_dia_act(usr_action[const.NL_KEY])
+            # the NLU gives no result for an empty sentence, keeping then the simulated user action
+            if user_nlu_res is not None:
+                usr_action.update(user_nlu_res)
 
         return usr_action
 
@@ -192,8 +264,9 @@ class GOEnv(Env):
         :return: processed agent action
         """
 
-        # add NL representation to the agent action
-        agent_nlg_sentence = self.nlg_model.convert_diaact_to_nl(agt_action, const.AGT_SPEAKER_VAL)
+        # add NL representation to a shallow copy of the agent action, the agent actions are immutable
+        agt_action = dict(agt_action)
+        agent_nlg_sentence = self.nlg_unit.convert_diaact_to_nl(agt_action, const.AGT_SPEAKER_VAL)
         agt_action[const.NL_KEY] = agent_nlg_sentence
 
         return agt_action
@@ -204,28 +277,23 @@ class GOEnv(Env):
         to make a response. Overrides the super class method.
         
         :param action: the last agent action 
-        :return: user's response to the agent's action in form of a state
+        :return: user's response to the agent's action in form of a state, the reward, the done flag and the info
+        holding the dialogue status
         """
 
-        # TODO
         new_state = {}
-        reward = 0
-        done = False
-        info = ""
-
+        dialogue_status = const.FAILED_DIALOG
 
         # increase the dialogue turn number
         self.current_turn_nb += 1
-        # process the agent action
-        proc_agt_action = self.__process_agt_action(action)
-        # update the state tracker with the new agent action
-        self.state_tracker.update(proc_agt_action, const.AGT_SPEAKER_VAL)
+        # update the state tracker with the new agent action, filling its inform slots from the KB
+        self.state_tracker.update(action, const.AGT_SPEAKER_VAL)
+        # process the filled agent action
+        proc_agt_action = self.__process_agt_action(self.state_tracker.get_history()[-1])
 
 
 
-        if self.current_turn_nb >= self.max_nb_turns:
-            done = True
-        else:
+        if self.current_turn_nb < self.max_nb_turns:
             # get the new user action
             new_user_action, dialogue_status = self.user.step(proc_agt_action)
             # increase the dialogue turn number
@@ -237,29 +305,184 @@ class GOEnv(Env):
             # produce new state for the
             new_state = self.state_tracker.produce_state()
 
+        reward, done = self.__reward_and_done(dialogue_status)
+        info = {const.DIALOGUE_STATUS_KEY: dialogue_status}
 
         return new_state, reward, done, info
 
+    def fused_step(self, action):
+        """
+        Method for taking the environment one step further, like `step`, but without the intermediate copies of the
+        actions. The immutable agent action is looked up and never copied, and all intermediate results are written
+        in the preallocated turn record, which is passed to the state tracker.
+
+        :param action: the last agent action, as an index in the feasible actions or as an agent action
+        :return: user's response to the agent's action in form of a state
+        """
+
+        new_state = {}
+
+        turn_record = self.turn_record
+        turn_record.clear()
+
+        # map the action index to the immutable agent action
+        turn_record.agt_action = action if isinstance(action, Mapping) else self.agent_actions[action]
+
+        # increase the dialogue turn number
+        self.current_turn_nb += 1
+        # update the state tracker with the new agent action, filling its inform slots from the KB
+        self.state_tracker.update_turn_record(turn_record, const.AGT_SPEAKER_VAL)
+        # the filled agent action is the history record of the state tracker
+        turn_record.agt_action = self.state_tracker.get_history()[-1]
+        # NL representation of the agent action
+        turn_record.agt_nl = self.nlg_unit.convert_diaact_to_nl(turn_record.agt_action, const.AGT_SPEAKER_VAL)
+
+        if self.current_turn_nb >= self.max_nb_turns:
+            turn_record.dialogue_status = const.FAILED_DIALOG
+        else:
+            # get the new user action
+            turn_record.usr_action, turn_record.dialogue_status = self.user.step(turn_record.agt_action)
+            # increase the dialogue turn number
+            self.current_turn_nb += 1
+            # NL representation of the user action
+            turn_record.usr_nl = self.nlg_unit.convert_diaact_to_nl(turn_record.usr_action, const.USR_SPEAKER_VAL)
+
+            # if the simulation mode is on Natural Language level, the NLU result updates the user action
+            if self.simulation_mode == const.NL_SIMULATION_MODE:
+                user_nlu_res = self.nlu_unit.generate_dia_act(turn_record.usr_nl)
+                if user_nlu_res is not None:
+                    turn_record.usr_action.update(user_nlu_res)
+
+            # update the state tracker with the new user action
+            self.state_tracker.update_turn_record(turn_record, const.USR_SPEAKER_VAL)
+            # produce new state for the agent
+            new_state = self.state_tracker.produce_state()
+
+        reward, done = self.__reward_and_done(turn_record.dialogue_status)
+        info = {const.DIALOGUE_STATUS_KEY: turn_record.dialogue_status}
+
+        return new_state, reward, done, info
+
+    def produce_action_mask(self):
+        """
+        Method for producing the mask of the agent actions allowed in the current state, from the slot bitmaps and
+        the KB counts of the state tracker.
+
+        :return: boolean array of shape (1, nb_actions), True for the allowed actions
+        """
+
+        filled_slots, kb_slot_counts = self.state_tracker.produce_slot_bitmaps()
+        return self.action_masker.produce_masks(filled_slots, kb_slot_counts)
+
+    @staticmethod
+    def __reward_and_done(dialogue_status):
+        """
+        Private helper method for computing the reward and the done flag from the dialogue status after the user action.
+
+        :param dialogue_status: the dialogue status, success, failure or no outcome yet
+        :return: the reward and the done flag
+        """
+
+        if dialogue_status == const.SUCCESS_DIALOG:
+            return const.SUCCESS_REWARD, True
+        elif dialogue_status == const.FAILED_DIALOG:
+            return const.FAILURE_REWARD, True
+
+        return const.PER_TURN_REWARD, False
+
+    def __init_obs_key(self, goal_id, init_usr_action):
+        """
+        Private helper method for creating the key of the initial observations cache.
+
+        :param goal_id: the index of the user goal in the goal set, None if the user has no goal set
+        :param init_usr_action: the initial user action, before processing
+        :return: the key, or None if the initial user action can not be cached
+        """
+
+        if goal_id is None:
+            return None
+
+        return (goal_id, init_usr_action[const.DIA_ACT_KEY],
+                tuple(sorted(init_usr_action[const.INFORM_SLOT_KEY].keys())),
+                tuple(sorted(init_usr_action[const.REQUEST_SLOT_KEY].keys())))
+
+    def __init_observation(self, init_usr_action):
+        """
+        Private helper method for processing the initial user action and producing the initial state from a freshly
+        reset state tracker.
+
+        :param init_usr_action: the initial user action
+        :return: the initial state
+        """
+
+        # process the init user action
+        proc_init_usr_action = self.__process_usr_action(init_usr_action)
+        # update the dialogue state tracker
+        self.state_tracker.update(proc_init_usr_action, const.USR_SPEAKER_VAL)
+        # produce state for the agent
+        init_state = self.state_tracker.produce_state()
+
+        return init_state
+
+    def precompute_init_observations(self):
+        """
+        Method for precomputing the initial observations for all user goals and all initial user actions the user
+        might take for them. Afterwards, each reset is only a cache lookup and a state tracker restore.
+
+        :return: the number of cached initial observations
+        """
+
+        if self.init_obs_cache is None:
+            return 0
+
+        for goal_id in range(len(self.user.goal_set)):
+            for init_usr_action in self.user.enumerate_init_actions(goal_id):
+                cache_key = self.__init_obs_key(goal_id, init_usr_action)
+
+                self.state_tracker.reset()
+                init_state = self.__init_observation(init_usr_action)
+                self.init_obs_cache[cache_key] = (self.state_tracker.get_snapshot(), init_state)
+
+        self.state_tracker.reset()
+
+        return len(self.init_obs_cache)
+
     def reset(self):
         """
         Method for resetting the dialogue state tracker and the user, called at the beginning of each new episode.
         Overrides the super class method.
         
-        :return: the initial observation
+        :return: the initial observation, or None if the user has no more dialogues, like the replay user
         """
 
+        self.current_turn_nb = 0
+
         # reset the dst
         self.state_tracker.reset()
         # reset the user and get the initial action
         init_usr_action = self.user.reset()
+
+        if init_usr_action is None:
+            return None
+
         # increase the dialogue turn number
         self.current_turn_nb += 1
-        # process the init user action
-        proc_init_usr_action = self.__process_usr_action(init_usr_action)
-        # update the dialogue state tracker
-        self.state_tracker.update(proc_init_usr_action, const.USR_SPEAKER_VAL)
-        # produce state for the agent
-        init_state = self.state_tracker.produce_state()
+
+        if self.init_obs_cache is None:
+            return self.__init_observation(init_usr_action)
+
+        # look up the processed initial observation for this goal and initial user action
+        cache_key = self.__init_obs_key(self.user.goal_id, init_usr_action)
+        cached_init_obs = self.init_obs_cache.get(cache_key)
+
+        if cached_init_obs is not None:
+            tracker_snapshot, init_state = cached_init_obs
+            self.state_tracker.restore_snapshot(tracker_snapshot)
+            return init_state.copy()
+
+        init_state = self.__init_observation(init_usr_action)
+        if cache_key is not None:
+            self.init_obs_cache[cache_key] = (self.state_tracker.get_snapshot(), init_state.copy())
 
         return init_state
 
@@ -282,3 +505,173 @@ class GOEnv(Env):
 
         # TODO
         raise NotImplementedError()
+
+
+def create_env(params=None, act_set=None, slot_set=None, agt_feasible_actions=None):
+    """
+    Function for creating an environment given the parameters of the dialogue system.
+    
+    :param params: the params for creating the environment
+    :param act_set: the set of all intents used in the dialogue
+    :param slot_set: the set of all slots used in the dialogue
+    :param agt_feasible_actions: the feasible agent actions
+    :return: the newly created environment
+    """
+
+    # Get all params
+    simulation_mode = params[const.SIMULATION_MODE_KEY]
+    is_training = params[const.IS_TRAINING_KEY]
+
+    user_type = params[const.USER_TYPE_KEY]
+    user_path = params[const.MODEL_BASED_USER_PATH_KEY]
+    user_transition_cache_size = params.get(const.USER_TRANSITION_CACHE_SIZE_KEY, 0)
+
+    state_tracker_type = params[const.STATE_TRACKER_TYPE_KEY]
+    dst_path = params[const.MODEL_BASED_STATE_TRACKER_PATH_KEY]
+
+    max_nb_turns = params[const.MAX_NB_TURNS]
+
+    nlu_path = params[const.NLU_PATH_KEY]
+    nlg_path = params[const.NLG_PATH_KEY]
+
+    # the goal set is memory-mapped, such that it is shared between processes
+    goal_set = load_goal_set(params[const.USER_GOAL_SET_PATH_KEY], slot_set)
+
+    # Create the environment
+    env = GOEnv(simulation_mode, is_training, user_type, user_path, state_tracker_type, dst_path, act_set, slot_set,
+                agt_feasible_actions, max_nb_turns, nlu_path, nlg_path, goal_set=goal_set,
+                user_transition_cache_size=user_transition_cache_size, kb_path=params[const.KB_PATH_KEY])
+
+    return env
+
+
+def create_script_env_fn(params):
+    """
+    Function for creating the factory of the environments of the command line scripts, with the rule-based user and
+    state tracker. The factory is picklable, such that the environments can be created in worker processes.
+
+    :param params: dictionary with the ** act_set_path **, ** slot_set_path **, ** goal_set_path **, ** kb_path **,
+    ** nlu_path **, ** nlg_path **, ** simulation_mode ** and ** max_nb_turns ** of the script
+    :return: function creating a new environment
+    """
+
+    def text_to_dict(path):
+        with open(path, 'r') as f:
+            return {line.strip(): index for index, line in enumerate(f) if line.strip()}
+
+    act_set = text_to_dict(params['act_set_path'])
+    slot_set = text_to_dict(params['slot_set_path'])
+
+    env_params = dict(params)
+    env_params.update({const.IS_TRAINING_KEY: False,
+                       const.USER_TYPE_KEY: const.RULE_BASED_USER,
+                       const.MODEL_BASED_USER_PATH_KEY: "",
+                       const.STATE_TRACKER_TYPE_KEY: const.RULE_BASED_STATE_TRACKER,
+                       const.MODEL_BASED_STATE_TRACKER_PATH_KEY: "",
+                       const.USER_GOAL_SET_PATH_KEY: params['goal_set_path']})
+
+    return functools.partial(create_env, env_params, act_set, slot_set, dialog_config.feasible_actions)
+
+
+def benchmark_step_allocations(env, nb_turns=1000, fused=True, seed=None):
+    """
+    Regression benchmark for the memory allocated during one environment step, measured with `tracemalloc`.
+    The non-fused step is given the immutable agent action, as produced by `GOProcessor.process_action`.
+    Note that `tracemalloc` does not see the objects reused from the interpreter free lists, so the duration of the
+    steps is reported as well.
+
+    The goals and the slot choices of the user are sampled with `np.random` and the agent actions with `random`, so
+    both are seeded, such that the runs of `step` and `fused_step` with the same seed replay the same dialogues.
+
+    :param env: the environment to benchmark
+    :param nb_turns: the number of environment steps to measure
+    :param fused: flag indicating whether to benchmark `fused_step` or `step`
+    :param seed: the random seed of the dialogues. If None, the random generators are not seeded
+    :return: dictionary with the mean number of transiently allocated and retained bytes, and seconds per turn
+    """
+
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
+
+    allocated_bytes = 0
+    retained_bytes = 0
+    duration = 0.0
+
+    tracemalloc.start()
+    env.reset()
+
+    for _ in range(nb_turns):
+        action = random.randrange(len(env.feasible_actions))
+
+        tracemalloc.reset_peak()
+        start_bytes, _ = tracemalloc.get_traced_memory()
+        start_time = time.time()
+
+        if fused:
+            _, _, done, _ = env.fused_step(action)
+        else:
+            _, _, done, _ = env.step(env.agent_actions[action])
+
+        duration += time.time() - start_time
+        end_bytes, peak_bytes = tracemalloc.get_traced_memory()
+        allocated_bytes += peak_bytes - start_bytes
+        retained_bytes += end_bytes - start_bytes
+
+        if done:
+            env.reset()
+
+    tracemalloc.stop()
+
+    return {'fused': fused, 'nb_turns': nb_turns, 'allocated_bytes_per_turn': float(allocated_bytes) / nb_turns,
+            'retained_bytes_per_turn': float(retained_bytes) / nb_turns, 'seconds_per_turn': duration / nb_turns}
+
+
+def main(params):
+    env = create_script_env_fn(params)()
+
+    # an unmeasured run fills the caches of the environment and the user, such that both measured runs find them full
+    benchmark_step_allocations(env, params['nb_turns'], False, params['seed'])
+
+    step_report = benchmark_step_allocations(env, params['nb_turns'], False, params['seed'])
+    fused_report = benchmark_step_allocations(env, params['nb_turns'], True, params['seed'])
+    print(json.dumps(step_report))
+    print(json.dumps(fused_report))
+
+    # the fused step must stay within the byte budget, relative to the step and optionally absolute
+    fused_bytes = fused_report['allocated_bytes_per_turn']
+    max_fused_bytes = params['max_fused_bytes_ratio'] * step_report['allocated_bytes_per_turn']
+    if params['max_fused_bytes_per_turn'] is not None:
+        max_fused_bytes = min(max_fused_bytes, params['max_fused_bytes_per_turn'])
+
+    if fused_bytes > max_fused_bytes:
+        raise SystemExit("The fused step allocates %.1f bytes per turn, over the budget of %.1f bytes"
+                         % (fused_bytes, max_fused_bytes))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--act_set_path', dest='act_set_path', type=str, help='path to the dialogue acts file')
+    parser.add_argument('--slot_set_path', dest='slot_set_path', type=str, help='path to the slots file')
+    parser.add_argument('--goal_set_path', dest='goal_set_path', type=str, help='path to the user goal set')
+    parser.add_argument('--kb_path', dest='kb_path', type=str, default=None, help='path to the knowledge base')
+    parser.add_argument('--nlu_path', dest='nlu_path', type=str, help='path to the trained NLU unit')
+    parser.add_argument('--nlg_path', dest='nlg_path', type=str, help='path to the trained NLG unit')
+    parser.add_argument('--simulation_mode', dest='simulation_mode', type=str,
+                        default=const.SEMANTIC_FRAME_SIMULATION_MODE, help='semantic frame or natural language mode')
+    parser.add_argument('--max_nb_turns', dest='max_nb_turns', type=int, default=40, help='maximal number of turns')
+    parser.add_argument('--nb_turns', dest='nb_turns', type=int, default=10000, help='number of measured turns')
+    parser.add_argument('--seed', dest='seed', type=int, default=0, help='random seed')
+    parser.add_argument('--max_fused_bytes_ratio', dest='max_fused_bytes_ratio', type=float, default=1.0,
+                        help='the budget of the bytes allocated by the fused step per turn, relative to the step')
+    parser.add_argument('--max_fused_bytes_per_turn', dest='max_fused_bytes_per_turn', type=float, default=None,
+                        help='the absolute budget of the bytes allocated by the fused step per turn')
+
+    args = parser.parse_args()
+    params = vars(args)
+
+    print ("Step Allocation Benchmark Parameters:")
+    print (json.dumps(params, indent=2))
+
+    main(params)
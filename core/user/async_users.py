@@ -0,0 +1,120 @@
+"""
+Author: Vladimir Ilievski <ilievski.vladimir@live.com>
+
+A Python file for the asyncio-based users in the Goal-Oriented Dialogue Systems
+"""
+
+from core import constants as const
+from core.user.users import GOUser
+
+import asyncio
+
+
+class GOAsyncRealUser(GOUser):
+    """
+    Class connecting a real user through asyncio queues instead of the standard input. Extends the `GOUser` class.
+
+    The transport layer (web socket, chat gateway, etc.) is pushing the user utterances in the inbox queue and it is
+    reading the agent utterances from the outbox queue. The `reset` and `step` methods are coroutines awaiting the
+    next user utterance, such that one event loop can hold many concurrent conversations.
+
+    The user action returned by this user contains only the natural language part, i.e. the ** nl ** key. The
+    dialogue act is produced afterwards by the NLU unit of the environment.
+
+    # Class members:
+
+        - ** inbox **: queue of the incoming user utterances, filled by the transport layer
+        - ** outbox **: queue of the outgoing agent utterances, consumed by the transport layer
+        - ** is_closed **: flag indicating that the user has left the conversation
+    """
+
+    def __init__(self, id=None, goal_set=None, max_queue_size=0):
+        super(GOAsyncRealUser, self).__init__(id, const.NL_SIMULATION_MODE, goal_set)
+
+        self.inbox = asyncio.Queue(maxsize=max_queue_size)
+        self.outbox = asyncio.Queue(maxsize=max_queue_size)
+
+        self.is_closed = False
+
+    def put_utterance(self, usr_nl):
+        """
+        Method for the transport layer to deliver the next user utterance, without blocking.
+
+        :param usr_nl: the user utterance as a string
+        :return:
+        """
+
+        self.inbox.put_nowait(usr_nl)
+
+    def close(self):
+        """
+        Method for the transport layer to signal that the user has left the conversation.
+
+        :return:
+        """
+
+        self.inbox.put_nowait(None)
+
+    async def get_agt_utterance(self):
+        """
+        Coroutine for the transport layer to await the next agent utterance.
+
+        :return: the agent utterance as a string
+        """
+
+        return await self.outbox.get()
+
+    async def __get_usr_action(self):
+        """
+        Private helper coroutine awaiting the next user utterance and wrapping it in a user action.
+
+        :return: the user action holding only the natural language part, or None if the user has left
+        """
+
+        usr_nl = await self.inbox.get()
+
+        if usr_nl is None:
+            self.is_closed = True
+            return None
+
+        return {const.NL_KEY: usr_nl}
+
+    async def reset(self):
+        """
+        Coroutine for restarting the user and awaiting the initial user utterance. Overrides the super class method.
+
+        :return: the initial user action, or None if the user has left
+        """
+
+        # reset the number of turns
+        self.current_turn_nb = 0
+
+        # reset the user state
+        self.state = {}
+        self.state[const.DIA_ACT_KEY] = ""
+        self.state[const.USER_STATE_INFORM_SLOTS] = {}
+        self.state[const.USER_STATE_REQUEST_SLOTS] = {}
+        self.state[const.USER_STATE_HISTORY_SLOTS] = {}
+        self.state[const.USER_STATE_REST_SLOTS] = {}
+
+        init_action = await self.__get_usr_action()
+        self.current_turn_nb += 1
+
+        return init_action
+
+    async def step(self, agt_action):
+        """
+        Coroutine delivering the agent utterance to the user and awaiting the user response.
+        Overrides the super class method.
+
+        :param agt_action: last agent action, holding the natural language part
+        :return: next user action, or None if the user has left, and the dialogue status
+        """
+
+        # we need to increase it for 2, counting for the agent response afterwards
+        self.current_turn_nb += 2
+
+        await self.outbox.put(agt_action[const.NL_KEY])
+        next_usr_action = await self.__get_usr_action()
+
+        return next_usr_action, const.NO_OUTCOME_YET
@@ -0,0 +1,259 @@
+"""
+Author: Vladimir Ilievski <ilievski.vladimir@live.com>
+
+A Python file for the array-compiled user goal set and the weighted goal sampling.
+"""
+
+from core import constants as const
+
+import numpy as np
+import json
+import os
+import pickle
+
+
+class GOAliasSampler(object):
+    """
+    Class for sampling indices from a discrete distribution in constant time, with the Vose's alias method.
+    The construction of the tables is linear in the number of indices.
+
+    # Class members:
+
+        - ** nb_items **: the number of indices to sample from
+        - ** prob **: for each index, the probability of accepting it, instead of its alias
+        - ** alias **: for each index, the alias index
+    """
+
+    def __init__(self, weights=None):
+        """
+        Constructor of the `GOAliasSampler` class.
+
+        :param weights: the non-negative weights of the indices, not necessarily normalized
+        """
+
+        self.nb_items = 0
+        self.prob = None
+        self.alias = None
+
+        self.set_weights(weights)
+
+    def set_weights(self, weights):
+        """
+        Method for building the alias tables for new weights, for example when changing the curriculum.
+
+        :param weights: the non-negative weights of the indices, not necessarily normalized
+        :return:
+        """
+
+        weights = np.asarray(weights, dtype=np.float64)
+        assert weights.ndim == 1 and len(weights) > 0 and np.all(weights >= 0) and weights.sum() > 0
+
+        self.nb_items = len(weights)
+
+        scaled = weights * (self.nb_items / weights.sum())
+        prob = np.ones(self.nb_items, dtype=np.float64)
+        alias = np.arange(self.nb_items, dtype=np.int64)
+
+        small = np.flatnonzero(scaled < 1.0).tolist()
+        large = np.flatnonzero(scaled >= 1.0).tolist()
+        scaled = scaled.tolist()
+
+        # pair each under-full index with an over-full one, which fills up the rest of its column
+        while small and large:
+            small_idx = small.pop()
+            large_idx = large.pop()
+
+            prob[small_idx] = scaled[small_idx]
+            alias[small_idx] = large_idx
+
+            scaled[large_idx] += scaled[small_idx] - 1.0
+            if scaled[large_idx] < 1.0:
+                small.append(large_idx)
+            else:
+                large.append(large_idx)
+
+        # the remaining indices are full columns, up to rounding errors
+        self.prob = prob
+        self.alias = alias
+
+    def sample(self, size=None):
+        """
+        Method for sampling indices in constant time per index.
+
+        :param size: the number of indices to sample. If None, a single index is sampled
+        :return: the sampled index or array of indices
+        """
+
+        idxs = np.random.randint(self.nb_items, size=size)
+        accept = np.random.random_sample(size) < self.prob[idxs]
+
+        if size is None:
+            return int(idxs) if accept else int(self.alias[idxs])
+
+        return np.where(accept, idxs, self.alias[idxs])
+
+
+class GOCompiledGoalSet(object):
+    """
+    Class for the user goal set compiled into NumPy arrays, instead of a list of nested dictionaries. The arrays can be
+    saved in a directory and loaded memory-mapped, such that many worker processes share the same goal set.
+
+    The columns of the arrays are the slot ids from the slot set and the slot values are kept as ids into the
+    vocabulary of values. A single goal can still be decoded back to its dictionary form.
+
+    # Class members:
+
+        - ** slot_set **: the set of all slots, mapping a slot to its id
+        - ** slots **: the list of all slots, ordered by their ids
+        - ** values **: the vocabulary of all slot values, ordered by their ids
+        - ** dia_acts **: the list of all goal dialogue acts
+        - ** dia_act_ids **: array of shape (nb_goals,), the dialogue act id of each goal
+        - ** inform_value_ids **: array of shape (nb_goals, nb_slots), the value id of each goal inform slot, -1 if absent
+        - ** request_mask **: boolean array of shape (nb_goals, nb_slots), the request slots of each goal
+    """
+
+    DIA_ACT_IDS_FILE = "dia_act_ids.npy"
+    INFORM_VALUE_IDS_FILE = "inform_value_ids.npy"
+    REQUEST_MASK_FILE = "request_mask.npy"
+    VOCABULARY_FILE = "vocabulary.json"
+
+    def __init__(self, slot_set=None, values=None, dia_acts=None, dia_act_ids=None, inform_value_ids=None,
+                 request_mask=None):
+        """
+        Constructor of the `GOCompiledGoalSet` class. Use `compile` or `load` for creating a goal set.
+        """
+
+        self.slot_set = slot_set
+        self.slots = sorted(slot_set.keys(), key=lambda slot: slot_set[slot])
+
+        self.values = values
+        self.dia_acts = dia_acts
+
+        self.dia_act_ids = dia_act_ids
+        self.inform_value_ids = inform_value_ids
+        self.request_mask = request_mask
+
+    @staticmethod
+    def compile(goal_set, slot_set):
+        """
+        Static method for compiling a list of goal dictionaries into arrays.
+
+        :param goal_set: the list of user goals, as dictionaries
+        :param slot_set: the set of all slots, mapping a slot to its id
+        :return: the compiled goal set
+        """
+
+        nb_goals = len(goal_set)
+        nb_slots = len(slot_set)
+
+        values = []
+        value_ids = {}
+        dia_acts = []
+        dia_act_ids = {}
+
+        goal_dia_act_ids = np.zeros(nb_goals, dtype=np.int32)
+        inform_value_ids = np.full((nb_goals, nb_slots), -1, dtype=np.int32)
+        request_mask = np.zeros((nb_goals, nb_slots), dtype=np.bool_)
+
+        for goal_id, goal in enumerate(goal_set):
+            dia_act = goal.get(const.DIA_ACT_KEY, "request")
+            if dia_act not in dia_act_ids:
+                dia_act_ids[dia_act] = len(dia_acts)
+                dia_acts.append(dia_act)
+            goal_dia_act_ids[goal_id] = dia_act_ids[dia_act]
+
+            for slot, value in goal[const.INFORM_SLOT_KEY].items():
+                if value not in value_ids:
+                    value_ids[value] = len(values)
+                    values.append(value)
+                inform_value_ids[goal_id, slot_set[slot]] = value_ids[value]
+
+            for slot in goal[const.REQUEST_SLOT_KEY].keys():
+                request_mask[goal_id, slot_set[slot]] = True
+
+        return GOCompiledGoalSet(slot_set, values, dia_acts, goal_dia_act_ids, inform_value_ids, request_mask)
+
+    def save(self, path):
+        """
+        Method for saving the compiled goal set in a directory.
+
+        :param path: the path to the directory
+        :return:
+        """
+
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+        np.save(os.path.join(path, self.DIA_ACT_IDS_FILE), self.dia_act_ids)
+        np.save(os.path.join(path, self.INFORM_VALUE_IDS_FILE), self.inform_value_ids)
+        np.save(os.path.join(path, self.REQUEST_MASK_FILE), self.request_mask)
+
+        with open(os.path.join(path, self.VOCABULARY_FILE), 'w') as f:
+            json.dump({'slots': self.slots, 'values': self.values, 'dia_acts': self.dia_acts}, f)
+
+    @staticmethod
+    def load(path, mmap_mode=None):
+        """
+        Static method for loading a compiled goal set from a directory.
+
+        :param path: the path to the directory
+        :param mmap_mode: the memory-map mode of the arrays, for example 'r'. If None, the arrays are read in memory
+        :return: the compiled goal set
+        """
+
+        with open(os.path.join(path, GOCompiledGoalSet.VOCABULARY_FILE), 'r') as f:
+            vocabulary = json.load(f)
+
+        slot_set = {slot: slot_id for slot_id, slot in enumerate(vocabulary['slots'])}
+
+        dia_act_ids = np.load(os.path.join(path, GOCompiledGoalSet.DIA_ACT_IDS_FILE), mmap_mode=mmap_mode)
+        inform_value_ids = np.load(os.path.join(path, GOCompiledGoalSet.INFORM_VALUE_IDS_FILE), mmap_mode=mmap_mode)
+        request_mask = np.load(os.path.join(path, GOCompiledGoalSet.REQUEST_MASK_FILE), mmap_mode=mmap_mode)
+
+        return GOCompiledGoalSet(slot_set, vocabulary['values'], vocabulary['dia_acts'], dia_act_ids,
+                                 inform_value_ids, request_mask)
+
+    def __len__(self):
+        return len(self.dia_act_ids)
+
+    def __getitem__(self, goal_id):
+        """
+        Method for decoding a single goal to its dictionary form.
+
+        :param goal_id: the index of the goal
+        :return: the goal as a dictionary
+        """
+
+        goal = {}
+        goal[const.DIA_ACT_KEY] = self.dia_acts[self.dia_act_ids[goal_id]]
+        goal[const.INFORM_SLOT_KEY] = {}
+        goal[const.REQUEST_SLOT_KEY] = {}
+
+        for slot_id in np.flatnonzero(self.inform_value_ids[goal_id] >= 0):
+            goal[const.INFORM_SLOT_KEY][self.slots[slot_id]] = self.values[self.inform_value_ids[goal_id, slot_id]]
+
+        for slot_id in np.flatnonzero(self.request_mask[goal_id]):
+            goal[const.REQUEST_SLOT_KEY][self.slots[slot_id]] = 'UNK'
+
+        return goal
+
+
+def load_goal_set(path, slot_set, mmap_mode='r'):
+    """
+    Function for loading the user goal set, either from a directory with a compiled goal set, or from a pickled list
+    of goal dictionaries, which is compiled afterwards.
+
+    :param path: the path to the directory or to the pickle file
+    :param slot_set: the set of all slots, mapping a slot to its id
+    :param mmap_mode: the memory-map mode of the compiled arrays
+    :return: the compiled goal set
+    """
+
+    if os.path.isdir(path):
+        goal_set = GOCompiledGoalSet.load(path, mmap_mode)
+        if slot_set is not None and goal_set.slot_set != slot_set:
+            raise ValueError("The compiled goal set in %s was compiled with a different slot set" % path)
+        return goal_set
+
+    goal_set = pickle.load(open(path, 'rb'))
+    return GOCompiledGoalSet.compile(goal_set, slot_set)
@@ -0,0 +1,345 @@
+"""
+Author: Vladimir Ilievski <ilievski.vladimir@live.com>
+
+A Python file for the corpus-replay user, replaying logged dialogues in the Goal-Oriented Dialogue Systems
+"""
+
+from core import constants as const
+from core.user.users import GOUser
+
+import json
+import queue
+import struct
+import threading
+
+# the header of the binary shard files, the magic bytes and the version of the format
+SHARD_MAGIC = b'GODS'
+SHARD_VERSION = 1
+SHARD_HEADER = struct.Struct('<4sI')
+# the length prefix of each dialogue record in the binary shard files
+SHARD_RECORD_LENGTH = struct.Struct('<I')
+
+
+def _read_jsonl_dialogues(path):
+    """
+    Private generator of the logged dialogues in a JSONL file, one dialogue per line.
+
+    :param path: the path to the JSONL file
+    :return: generator of the logged dialogues
+    """
+
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def _read_shard_dialogues(path):
+    """
+    Private generator of the logged dialogues in a binary shard file.
+
+    :param path: the path to the binary shard file
+    :return: generator of the logged dialogues
+    """
+
+    with open(path, 'rb') as f:
+        magic, version = SHARD_HEADER.unpack(f.read(SHARD_HEADER.size))
+        if magic != SHARD_MAGIC or version != SHARD_VERSION:
+            raise ValueError("The file %s is not a dialogue shard of version %d" % (path, SHARD_VERSION))
+
+        while True:
+            length_bytes = f.read(SHARD_RECORD_LENGTH.size)
+            if not length_bytes:
+                break
+
+            length, = SHARD_RECORD_LENGTH.unpack(length_bytes)
+            yield json.loads(f.read(length).decode('utf-8'))
+
+
+def read_dialogues(path):
+    """
+    Function for lazily reading the logged dialogues from a file, either a JSONL file or a binary shard file with the
+    `.shard` extension.
+
+    :param path: the path to the file
+    :return: generator of the logged dialogues
+    """
+
+    if path.endswith('.shard'):
+        return _read_shard_dialogues(path)
+
+    return _read_jsonl_dialogues(path)
+
+
+def write_dialogue_shard(path, dialogues):
+    """
+    Function for writing logged dialogues in a binary shard file. Each dialogue is written as a length-prefixed JSON
+    record, such that the shard can be read back one dialogue at a time.
+
+    :param path: the path to the binary shard file
+    :param dialogues: iterable of the logged dialogues
+    :return: the number of written dialogues
+    """
+
+    nb_dialogues = 0
+
+    with open(path, 'wb') as f:
+        f.write(SHARD_HEADER.pack(SHARD_MAGIC, SHARD_VERSION))
+
+        for dialogue in dialogues:
+            record = json.dumps(dialogue).encode('utf-8')
+            f.write(SHARD_RECORD_LENGTH.pack(len(record)))
+            f.write(record)
+            nb_dialogues += 1
+
+    return nb_dialogues
+
+
+class GODialogueCorpusReader(object):
+    """
+    Class for streaming logged dialogues from a corpus of files, with a bounded read-ahead buffer filled by a background
+    thread. At most ** read_ahead ** dialogues are kept in memory, regardless of the size of the corpus.
+
+    The corpus can be split between worker processes, each of them creating its own reader with its ** worker_id **.
+    If there are at least as many files as workers, each worker reads only its own files, otherwise each worker reads
+    every ** nb_workers **-th dialogue of all files.
+
+    Each logged dialogue is a dictionary with the following structure:
+
+        - ** goal **: the user goal, optional
+        - ** turns **: the list of the dialogue turns, each of them an action with the ** speaker ** key
+        - ** dialogue_status **: the recorded dialogue status, optional
+
+    # Class members:
+
+        - ** paths **: the paths to the files of this worker
+        - ** worker_id **: the index of this worker
+        - ** nb_workers **: the number of workers the corpus is split between
+        - ** stride **: the step between the dialogues read by this worker, 1 if the files are split between workers
+        - ** buffer **: the bounded queue of the read-ahead dialogues
+        - ** error **: the error raised while reading the corpus, raised again after the last read dialogue
+    """
+
+    # marks the end of the corpus in the read-ahead buffer
+    END_OF_CORPUS = None
+
+    def __init__(self, paths=None, worker_id=0, nb_workers=1, read_ahead=64):
+        """
+        Constructor of the `GODialogueCorpusReader` class.
+
+        :param paths: the list of paths to the JSONL or binary shard files
+        :param worker_id: the index of this worker
+        :param nb_workers: the number of workers the corpus is split between
+        :param read_ahead: the maximal number of dialogues read ahead
+        """
+
+        assert 0 <= worker_id < nb_workers
+
+        self.worker_id = worker_id
+        self.nb_workers = nb_workers
+
+        paths = sorted(paths)
+        if len(paths) >= nb_workers:
+            self.paths = paths[worker_id::nb_workers]
+            self.stride = 1
+        else:
+            self.paths = paths
+            self.stride = nb_workers
+
+        self.buffer = queue.Queue(maxsize=read_ahead)
+        self.error = None
+
+        self.__stop_event = threading.Event()
+        self.__thread = threading.Thread(target=self.__read_ahead)
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def __put(self, item):
+        """
+        Private helper method for putting an item in the read-ahead buffer, waiting while it is full.
+
+        :param item: the item to put
+        :return: False if the reader was closed in the meantime, True otherwise
+        """
+
+        while not self.__stop_event.is_set():
+            try:
+                self.buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+
+        return False
+
+    def __read_ahead(self):
+        """
+        Private helper method, run by the background thread, for filling the read-ahead buffer.
+
+        :return:
+        """
+
+        try:
+            offset = self.worker_id if self.stride > 1 else 0
+            dialogue_nb = 0
+
+            for path in self.paths:
+                for dialogue in read_dialogues(path):
+                    if dialogue_nb % self.stride == offset and not self.__put(dialogue):
+                        return
+                    dialogue_nb += 1
+        except Exception as e:
+            self.error = e
+        finally:
+            self.__put(self.END_OF_CORPUS)
+
+    def next_dialogue(self):
+        """
+        Method for getting the next logged dialogue, waiting if it is not read yet.
+
+        :return: the next logged dialogue, or None if the corpus is exhausted
+        """
+
+        if self.__stop_event.is_set():
+            return None
+
+        dialogue = self.buffer.get()
+
+        if dialogue is self.END_OF_CORPUS:
+            self.__stop_event.set()
+            if self.error is not None:
+                raise self.error
+
+        return dialogue
+
+    def close(self):
+        """
+        Method for stopping the background thread, before the corpus is exhausted.
+
+        :return:
+        """
+
+        self.__stop_event.set()
+        self.__thread.join()
+
+    def __iter__(self):
+        dialogue = self.next_dialogue()
+        while dialogue is not None:
+            yield dialogue
+            dialogue = self.next_dialogue()
+
+
+class GOCorpusReplayUser(GOUser):
+    """
+    Class representing a user replaying the user turns of logged dialogues, instead of simulating them, used for
+    regression testing of the policies. Extends the `GOUser` class.
+
+    Each episode replays the next dialogue from the corpus reader. The user turns are replayed in order, regardless
+    of the agent actions, and the recorded dialogue status is returned with the last user turn. A dialogue with a
+    single user turn, replayed at the reset, is closed with a `thanks` user action at the first step.
+
+    # Class members:
+
+        - ** corpus_reader **: the reader streaming the logged dialogues
+        - ** dialogue **: the logged dialogue replayed in the current episode
+        - ** usr_turns **: the user turns of the current dialogue
+        - ** usr_turn_idx **: the index of the next user turn to replay
+    """
+
+    def __init__(self, id=None, simulation_mode=None, corpus_reader=None):
+        super(GOCorpusReplayUser, self).__init__(id, simulation_mode, None)
+
+        self.corpus_reader = corpus_reader
+
+        self.dialogue = None
+        self.usr_turns = []
+        self.usr_turn_idx = 0
+
+    def __next_usr_action(self):
+        """
+        Private helper method for replaying the next user turn and updating the user internal state.
+
+        :return: the next user action
+        """
+
+        usr_turn = self.usr_turns[self.usr_turn_idx]
+        self.usr_turn_idx += 1
+
+        usr_action = {}
+        usr_action[const.DIA_ACT_KEY] = usr_turn[const.DIA_ACT_KEY]
+        usr_action[const.INFORM_SLOT_KEY] = dict(usr_turn.get(const.INFORM_SLOT_KEY, {}))
+        usr_action[const.REQUEST_SLOT_KEY] = dict(usr_turn.get(const.REQUEST_SLOT_KEY, {}))
+        if const.NL_KEY in usr_turn:
+            usr_action[const.NL_KEY] = usr_turn[const.NL_KEY]
+
+        self.state[const.DIA_ACT_KEY] = usr_action[const.DIA_ACT_KEY]
+        self.state[const.USER_STATE_INFORM_SLOTS] = usr_action[const.INFORM_SLOT_KEY]
+        self.state[const.USER_STATE_REQUEST_SLOTS] = usr_action[const.REQUEST_SLOT_KEY]
+        self.state[const.USER_STATE_HISTORY_SLOTS].update(usr_action[const.INFORM_SLOT_KEY])
+
+        return usr_action
+
+    def reset(self):
+        """
+        Method for restarting the user with the next logged dialogue. Overrides the super class method.
+
+        :return: the initial user action, or None if the corpus is exhausted
+        """
+
+        # reset the number of turns
+        self.current_turn_nb = 0
+
+        # reset the user state
+        self.state = {}
+        self.state[const.DIA_ACT_KEY] = ""
+        self.state[const.USER_STATE_INFORM_SLOTS] = {}
+        self.state[const.USER_STATE_REQUEST_SLOTS] = {}
+        self.state[const.USER_STATE_HISTORY_SLOTS] = {}
+        self.state[const.USER_STATE_REST_SLOTS] = {}
+
+        # skip the logged dialogues without user turns
+        self.usr_turns = []
+        while not self.usr_turns:
+            self.dialogue = self.corpus_reader.next_dialogue()
+            if self.dialogue is None:
+                return None
+
+            self.usr_turns = [turn for turn in self.dialogue[const.DIALOGUE_TURNS_KEY]
+                              if turn.get(const.SPEAKER_TYPE_KEY) == const.USR_SPEAKER_VAL]
+
+        self.goal = self.dialogue.get(const.DIALOGUE_GOAL_KEY)
+        self.usr_turn_idx = 0
+
+        self.current_turn_nb += 1
+
+        return self.__next_usr_action()
+
+    def step(self, agt_action):
+        """
+        Method for replaying the next user turn. The agent action does not change the replayed turn.
+        Overrides the super class method.
+
+        :param agt_action: last agent action
+        :return: next user action and the dialogue status, the recorded one after the last user turn
+        """
+
+        # we need to increase it for 2, counting for the agent response afterwards
+        self.current_turn_nb += 2
+
+        if self.usr_turn_idx < len(self.usr_turns):
+            next_usr_action = self.__next_usr_action()
+        else:
+            # the only user turn of the dialogue was replayed at the reset, so the user closes the dialogue
+            next_usr_action = {const.DIA_ACT_KEY: 'thanks', const.INFORM_SLOT_KEY: {}, const.REQUEST_SLOT_KEY: {}}
+            self.state[const.DIA_ACT_KEY] = next_usr_action[const.DIA_ACT_KEY]
+            self.state[const.USER_STATE_INFORM_SLOTS] = {}
+            self.state[const.USER_STATE_REQUEST_SLOTS] = {}
+
+        dialogue_status = const.NO_OUTCOME_YET
+        if self.usr_turn_idx == len(self.usr_turns):
+            # the replay can not go on after the last user turn, so a dialogue without an outcome is failed
+            dialogue_status = self.dialogue.get(const.DIALOGUE_STATUS_KEY, const.FAILED_DIALOG)
+            if dialogue_status == const.NO_OUTCOME_YET:
+                dialogue_status = const.FAILED_DIALOG
+
+        return next_usr_action, dialogue_status
@@ -0,0 +1,187 @@
+"""
+Author: Vladimir Ilievski <ilievski.vladimir@live.com>
+
+A Python file for the recurrent user model, used by the model-based simulated users.
+"""
+
+from core import constants as const
+
+import numpy as np
+import pickle
+import threading
+
+# the dialogue status for each output of the status layer
+STATUS_OUTPUTS = np.array([const.FAILED_DIALOG, const.NO_OUTCOME_YET, const.SUCCESS_DIALOG], dtype=np.int8)
+
+# the weights of a trained user model, as described in `GOUserModel`
+USER_MODEL_WEIGHTS = ('WLSTM', 'Wd_act', 'bd_act', 'Wd_inform', 'bd_inform', 'Wd_request', 'bd_request', 'Wd_status',
+                      'bd_status')
+
+# the already loaded user models, shared between all users and environments in the process
+_loaded_models = {}
+_loaded_models_lock = threading.Lock()
+
+
+class GOUserModel(object):
+    """
+    Class for the LSTM user model, predicting the next user action from the last agent action and the user goal.
+    The model is only used for inference, one LSTM step is computed for a whole batch of users at once and the
+    recurrent state of the users is kept by the caller, instead of re-encoding the dialogue history in each turn.
+
+    The input of each user is the concatenation of the agent dialogue act as one-hot vector, the agent inform and
+    request slots, and the goal inform and request slots, all of them as binary vectors.
+
+    The model is stored as a pickled dictionary, in the same form as the NLU and NLG models, holding the ** model **
+    weights, the ** act_dict ** and the ** slot_dict ** used for training it. The dictionaries map each dialogue act
+    and slot to its index, and they must be equal to the act set and slot set of the users. No trained user model and
+    no training code are part of this repository, the files are written with `save_user_model` from the weights of a
+    model trained elsewhere. The model must provide the following weights, with ** d ** the hidden size, and
+    ** nb_acts ** and ** nb_slots ** the sizes of the dictionaries:
+
+        - ** WLSTM **: array of shape (1 + nb_acts + 4 * nb_slots + d, 4 * d), the LSTM weights as in the NLU LSTM,
+                    with the bias in the first row, then the rows of the inputs and of the previous hidden state, and
+                    the columns of the input, forget and output gates and of the cell candidate
+        - ** Wd_act **, ** bd_act **: arrays of shape (d, nb_acts) and (nb_acts,), the scores of the user dialogue act
+        - ** Wd_inform **, ** bd_inform **: arrays of shape (d, nb_slots) and (nb_slots,), the logits of the user inform
+                                        slots
+        - ** Wd_request **, ** bd_request **: arrays of shape (d, nb_slots) and (nb_slots,), the logits of the user
+                                          request slots
+        - ** Wd_status **, ** bd_status **: arrays of shape (d, 3) and (3,), the scores of the dialogue status, in the
+                                        order of `STATUS_OUTPUTS`
+
+    # Class members:
+
+        - ** model **: the weights of the model, the LSTM weights with the bias in the first row and the output layers
+        - ** act_dict **: the set of all dialogue acts the model was trained with
+        - ** slot_dict **: the set of all slots the model was trained with
+        - ** input_size **: the size of the input of each user
+        - ** hidden_size **: the size of the LSTM hidden layer
+    """
+
+    def __init__(self, model=None, act_dict=None, slot_dict=None):
+        """
+        Constructor of the `GOUserModel` class. Use `load_user_model` for sharing the loaded models.
+
+        :param model: the weights of the model
+        :param act_dict: the set of all dialogue acts the model was trained with
+        :param slot_dict: the set of all slots the model was trained with
+        """
+
+        missing_weights = [name for name in USER_MODEL_WEIGHTS if name not in model]
+        if missing_weights:
+            raise ValueError("The user model is missing the weights %s" % ', '.join(missing_weights))
+
+        self.model = model
+        self.act_dict = act_dict
+        self.slot_dict = slot_dict
+
+        self.hidden_size = model['Wd_act'].shape[0]
+        self.input_size = model['WLSTM'].shape[0] - self.hidden_size - 1
+
+        assert self.input_size == len(act_dict) + 4 * len(slot_dict)
+
+    def init_state(self, nb_users):
+        """
+        Method for creating the initial recurrent state of a batch of users.
+
+        :param nb_users: the number of users
+        :return: the hidden and the cell state, both of shape (nb_users, hidden_size)
+        """
+
+        hidden = np.zeros((nb_users, self.hidden_size), dtype=self.model['WLSTM'].dtype)
+        cell = np.zeros((nb_users, self.hidden_size), dtype=self.model['WLSTM'].dtype)
+
+        return hidden, cell
+
+    def encode_inputs(self, agt_act_ids, agt_inform_mask, agt_request_mask, goal_inform_mask, goal_request_mask):
+        """
+        Method for encoding the inputs of a batch of users in one matrix.
+
+        :param agt_act_ids: array of shape (nb_users,) with the agent dialogue act ids, -1 for no agent action
+        :param agt_inform_mask: boolean array of shape (nb_users, nb_slots) with the agent inform slots
+        :param agt_request_mask: boolean array of shape (nb_users, nb_slots) with the agent request slots
+        :param goal_inform_mask: boolean array of shape (nb_users, nb_slots) with the goal inform slots
+        :param goal_request_mask: boolean array of shape (nb_users, nb_slots) with the goal request slots
+        :return: the input matrix of shape (nb_users, input_size)
+        """
+
+        nb_users = len(agt_act_ids)
+        nb_acts = len(self.act_dict)
+        nb_slots = len(self.slot_dict)
+
+        inputs = np.zeros((nb_users, self.input_size), dtype=self.model['WLSTM'].dtype)
+
+        rows = np.flatnonzero(agt_act_ids >= 0)
+        inputs[rows, agt_act_ids[rows]] = 1
+
+        inputs[:, nb_acts:nb_acts + nb_slots] = agt_inform_mask
+        inputs[:, nb_acts + nb_slots:nb_acts + 2 * nb_slots] = agt_request_mask
+        inputs[:, nb_acts + 2 * nb_slots:nb_acts + 3 * nb_slots] = goal_inform_mask
+        inputs[:, nb_acts + 3 * nb_slots:] = goal_request_mask
+
+        return inputs
+
+    def forward_batch(self, inputs, hidden, cell):
+        """
+        Method for computing one LSTM step for a batch of users, with one matrix product for all of them.
+
+        :param inputs: the input matrix of shape (nb_users, input_size)
+        :param hidden: the hidden state of shape (nb_users, hidden_size)
+        :param cell: the cell state of shape (nb_users, hidden_size)
+        :return: the dialogue act scores, the inform slots and request slots probabilities, the dialogue status
+        scores, and the new hidden and cell state
+        """
+
+        WLSTM = self.model['WLSTM']
+        d = self.hidden_size
+
+        # the gate activations for all users: bias, inputs and the previous hidden state
+        IFOG = WLSTM[0] + inputs.dot(WLSTM[1:1 + self.input_size]) + hidden.dot(WLSTM[1 + self.input_size:])
+
+        IFOGf = np.empty_like(IFOG)
+        IFOGf[:, :3 * d] = 1 / (1 + np.exp(-IFOG[:, :3 * d]))
+        IFOGf[:, 3 * d:] = np.tanh(IFOG[:, 3 * d:])
+
+        new_cell = IFOGf[:, :d] * IFOGf[:, 3 * d:] + IFOGf[:, d:2 * d] * cell
+        new_hidden = IFOGf[:, 2 * d:3 * d] * np.tanh(new_cell)
+
+        act_scores = new_hidden.dot(self.model['Wd_act']) + self.model['bd_act']
+        inform_probs = 1 / (1 + np.exp(-(new_hidden.dot(self.model['Wd_inform']) + self.model['bd_inform'])))
+        request_probs = 1 / (1 + np.exp(-(new_hidden.dot(self.model['Wd_request']) + self.model['bd_request'])))
+        status_scores = new_hidden.dot(self.model['Wd_status']) + self.model['bd_status']
+
+        return act_scores, inform_probs, request_probs, status_scores, new_hidden, new_cell
+
+
+def load_user_model(model_path):
+    """
+    Function for loading a user model. Each model is read only once per process and shared afterwards, such that all
+    users in all environments are using the same weights.
+
+    :param model_path: the path to the pickled user model, a dictionary with the ** model ** weights, the ** act_dict **
+    and the ** slot_dict ** described in `GOUserModel`
+    :return: the loaded user model
+    """
+
+    with _loaded_models_lock:
+        if model_path not in _loaded_models:
+            model_params = pickle.load(open(model_path, 'rb'))
+            _loaded_models[model_path] = GOUserModel(model_params['model'], model_params['act_dict'],
+                                                      model_params['slot_dict'])
+
+        return _loaded_models[model_path]
+
+
+def save_user_model(user_model, model_path):
+    """
+    Function for saving a user model in the pickle format read by `load_user_model`.
+
+    :param user_model: the user model
+    :param model_path: the path to the pickled user model
+    :return: None
+    """
+
+    model_params = {'model': user_model.model, 'act_dict': user_model.act_dict, 'slot_dict': user_model.slot_dict}
+
+    with open(model_path, 'wb') as f:
+        pickle.dump(model_params, f)
@@ -5,7 +5,11 @@ A Python file for the users in the Goal-Oriented Dialogue Systems
 """
 
 from core import constants as const
-import random
+from core.user.goal_set import GOCompiledGoalSet
+from core.user.vectorized_users import GOVectorizedRuleBasedUser, GOVectorizedModelBasedUser
+
+from collections import OrderedDict
+import numpy as np
 
 
 class GOUser:
@@ -37,6 +41,7 @@ class GOUser:
         - ** simulation_mode **: semantic frame or natural language sentence form of user utterances
         - ** goal_set **: the set of goals for the user
         - ** goal **: the user goal in the current dialogue turn
+        - ** goal_id **: the index of the current user goal in the goal set, None if the user has no goal set
     """
 
     def __init__(self, id=None, simulation_mode=None, goal_set=None):
@@ -55,6 +60,7 @@ class GOUser:
         self.goal_set = goal_set
 
         self.goal = None
+        self.goal_id = None
 
     def reset(self):
         """
@@ -89,7 +95,7 @@ class GORealUser(GOUser):
         raise NotImplementedError()
 
     def step(self, agt_action):
-        usr_nl = raw_input("Next utterance");
+        usr_nl = input("Next utterance");
 
         # TODO
         raise NotImplementedError()
@@ -99,35 +105,101 @@ class GOSimulatedUser(GOUser):
     """
     Abstract Base Class for all simulated users in the Goal-Oriented Dialogue Systems.
     Extends the `GOUser` class.
+
+    The simulated users can keep an optional transition cache, mapping a compact key of the last agent action and the
+    user goal state to the deterministic part of the user response. The cache is bounded and the least recently used
+    transitions are evicted first.
     
     # Class members:
     
         - ** slot_set **: the set of all slots in the dialogue scenario
         - ** act_set **: the set of all acts (intents) in the dialogue scenario
+        - ** transition_cache **: the cache of the user transitions, None if the caching is disabled
+        - ** transition_cache_size **: the maximal number of cached transitions
+        - ** transition_cache_hits **: the number of transitions found in the cache
+        - ** transition_cache_misses **: the number of transitions not found in the cache
     """
 
-    def __init__(self, id=None, simulation_mode=None, goal_set=None, slot_set=None, act_set=None):
+    def __init__(self, id=None, simulation_mode=None, goal_set=None, slot_set=None, act_set=None,
+                 transition_cache_size=0):
         super(GOSimulatedUser, self).__init__(id, simulation_mode, goal_set)
 
         self.slot_set = slot_set
         self.act_set = act_set
 
-    def __sample_random_init_action(self):
+        self.transition_cache = OrderedDict() if transition_cache_size > 0 else None
+        self.transition_cache_size = transition_cache_size
+        self.transition_cache_hits = 0
+        self.transition_cache_misses = 0
+
+    def _get_cached_transition(self, key):
+        """
+        Helper method for looking up a transition in the transition cache, marking it as recently used.
+
+        :param key: the compact key of the transition
+        :return: the cached transition, or None if it is not cached or the caching is disabled
         """
-        Abstract private helper method for sampling a random initial user action based on the goal.
+
+        if self.transition_cache is None:
+            return None
+
+        transition = self.transition_cache.get(key)
+        if transition is None:
+            self.transition_cache_misses += 1
+            return None
+
+        self.transition_cache_hits += 1
+        self.transition_cache.move_to_end(key)
+
+        return transition
+
+    def _cache_transition(self, key, transition):
+        """
+        Helper method for storing a transition in the transition cache, evicting the least recently used transition
+        if the cache is full.
+
+        :param key: the compact key of the transition
+        :param transition: the transition to cache
+        :return:
+        """
+
+        if self.transition_cache is None:
+            return
+
+        self.transition_cache[key] = transition
+        if len(self.transition_cache) > self.transition_cache_size:
+            self.transition_cache.popitem(last=False)
+
+    def _sample_random_init_action(self):
+        """
+        Abstract helper method for sampling a random initial user action based on the goal. Overridden by the subclasses.
 
         :return: random initial user action
         """
         raise NotImplementedError()
 
-    def __sample_goal(self):
+    def _sample_goal(self):
         """
-        Abstract private helper method for sampling a random user goal, given the set of all available user goals.
+        Abstract helper method for sampling a random user goal, given the set of all available user goals.
+        Overridden by the subclasses, which should also set the index of the sampled goal in ** goal_id **.
 
         :return: random user goal
         """
         raise NotImplementedError()
 
+    def _update_state(self, usr_action):
+        """
+        Helper method for updating the user internal state with the last user action.
+
+        :param usr_action: the last user action
+        :return:
+        """
+
+        self.state[const.DIA_ACT_KEY] = usr_action[const.DIA_ACT_KEY]
+        self.state[const.USER_STATE_INFORM_SLOTS] = usr_action[const.INFORM_SLOT_KEY]
+        self.state[const.USER_STATE_REQUEST_SLOTS] = usr_action[const.REQUEST_SLOT_KEY]
+        self.state[const.USER_STATE_HISTORY_SLOTS].update(usr_action[const.INFORM_SLOT_KEY])
+
     def reset(self):
         # reset the number of turns
         self.current_turn_nb = 0
@@ -141,10 +213,10 @@ class GOSimulatedUser(GOUser):
         self.state[const.USER_STATE_REST_SLOTS] = {}
 
         # sample a random goal and set it as a user goal in the following episode
-        self.goal = self.__sample_goal()
+        self.goal = self._sample_goal()
 
         # after sampling a goal, the user can take the initial actions
-        init_action = self.__sample_random_init_action()
+        init_action = self._sample_random_init_action()
 
         return init_action
 
@@ -154,137 +226,110 @@ class GOSimulatedUser(GOUser):
 
 class GORuleBasedUser(GOSimulatedUser):
     """
-    Abstract class representing a rule-based user in the Goal-Oriented Dialogue Systems.
+    Class representing a rule-based user in the Goal-Oriented Dialogue Systems.
     Since, it is a rule-based simulated user, it will be domain-specific.
     Extends the `GOUser` class.
+
+    The user responses are computed by a `GOVectorizedRuleBasedUser` holding a single user, such that the simulated
+    users in the environment and in the vectorized training loop follow exactly the same table-driven policy.
     
     Class members:
     
         - ** init_dia_act_set **: the set of initial dialogue acts 
         - ** init_slots **: for each initial dialogue act, the set of initial inform slots
+        - ** simulator **: the vectorized rule-based user with a single user, computing the user responses
+        - ** goal_sampler **: the weighted sampler of the goals in the goal set
+
+    The deterministic part of the user response only depends on the agent action, the user goal and the slots the user
+    has told and got filled so far, so the response plans can be kept in the transition cache of the simulated user.
     """
 
     def __init__(self, id=None, simulation_mode=None, goal_set=None, slot_set=None, act_set=None, init_slots=None,
-                 init_dia_act_set=None):
-        super(GORuleBasedUser, self).__init__(id, simulation_mode, goal_set, slot_set, act_set)
+                 init_dia_act_set=None, goal_weights=None, transition_cache_size=0):
+        # the goals are kept compiled in arrays, a list of goal dictionaries is compiled here
+        if goal_set is not None and not isinstance(goal_set, GOCompiledGoalSet):
+            goal_set = GOCompiledGoalSet.compile(goal_set, slot_set)
+
+        super(GORuleBasedUser, self).__init__(id, simulation_mode, goal_set, slot_set, act_set,
+                                              transition_cache_size)
 
         self.init_dia_act_set = init_dia_act_set
         self.init_slots = init_slots
 
-    def __sample_random_init_action(self):
+        self.simulator = None
+        self.goal_sampler = None
+        if goal_set is not None:
+            self.simulator = GOVectorizedRuleBasedUser(1, goal_set, slot_set, act_set, init_slots, init_dia_act_set)
+            self.set_goal_weights(goal_weights)
+
+    def set_goal_weights(self, goal_weights=None):
+        """
+        Method for setting the weights of sampling the goals from the goal set, for example for running a curriculum.
+
+        :param goal_weights: the non-negative weights of the goals. If None, the goals are sampled uniformly
+        :return:
+        """
+
+        self.simulator.set_goal_weights(goal_weights)
+        self.goal_sampler = self.simulator.goal_sampler
+
+    def _sample_random_init_action(self):
         """
         Overrides abstract method from the super class
         """
         # increase the dialogue number turn
         self.current_turn_nb += 1
 
-        # the resulting initial action
-        init_action = {}
-
-        # randomly sample initial dialogue act
-        temp_init_dia_act = random.choice(self.init_dia_act_set)
-        self.state[const.DIA_ACT_KEY] = temp_init_dia_act
-
-        # sample inform slots
-        if len(self.goal[const.INFORM_SLOT_KEY]) > 0:
-            # sample an inform slot from the current user goal insert it in the user's internal state
-            sampled_inform_slot = random.choice(list(self.goal[const.INFORM_SLOT_KEY].keys()))
-            self.state[const.USER_STATE_INFORM_SLOTS][sampled_inform_slot] = self.goal[const.INFORM_SLOT_KEY][
-                sampled_inform_slot]
+        # sample the initial action for the already sampled goal
+        usr_action_batch = self.simulator.reset_batch(np.array([self.goal_id]))
+        init_action = self.simulator.decode_usr_action(usr_action_batch, 0)
 
-            # after sampling the initial inform slot, check the presence of the initial slots
-            for init_slot in self.init_slots[temp_init_dia_act]:
-                if init_slot in self.goal[const.INFORM_SLOT_KEY].keys():
-                    self.state[const.USER_STATE_INFORM_SLOTS][init_slot] = self.goal[const.INFORM_SLOT_KEY][init_slot]
-
-        # sample request slots
-        sampled_request_slot = random.choice(list(self.goal[const.REQUEST_SLOT_KEY].keys()))
-        self.state[const.USER_STATE_REQUEST_SLOTS][sampled_request_slot] = 'UNK'
-
-        # if there are no request slots (too static?)
-        if len(self.state[const.USER_STATE_REQUEST_SLOTS]) == 0:
-            self.state[const.DIA_ACT_KEY] = 'inform'
-
-        # create the user action
-        init_action[const.DIA_ACT_KEY] = self.state[const.DIA_ACT_KEY]
-        init_action[const.INFORM_SLOT_KEY] = self.state[const.USER_STATE_INFORM_SLOTS]
-        init_action[const.REQUEST_SLOT_KEY] = self.state[const.USER_STATE_REQUEST_SLOTS]
+        self._update_state(init_action)
 
         return init_action
 
-    def __sample_goal(self):
+    def _sample_goal(self):
         """
         Overrides the abstract method from the super class
         """
-        sample_goal = random.choice(self.goal_set)
+        self.goal_id = self.goal_sampler.sample()
+        sample_goal = self.goal_set[self.goal_id]
         return sample_goal
 
-    def __response_inform(self, agt_action):
-        """
-        Private abstract method for generating response it the last agent action act is 'inform'.
-        
-        :param agt_action: the last agent action
-        :return:
-        """
-
-        # TODO
-        raise NotImplementedError()
-
-    def __response_request(self, agt_action):
-        """
-        Private abstract method for generating response it the last agent action act is 'request'.
-        
-        :param agt_action: the last agent action
-        :return:
-        """
-
-        # TODO
-        raise NotImplementedError()
-
-    def __response_confirm_answer(self, agt_action):
-        """
-        Private abstract method for generating response it the last agent action act is 'confirm_answer'.
-        
-        :param agt_action: the last agent action
-        :return:
+    def enumerate_init_actions(self, goal_id):
         """
+        Method for enumerating all initial user actions that might be sampled for the given goal.
+        Used for precomputing the initial observations of the environment.
 
-        # TODO
-        raise NotImplementedError()
-
-    def __response_multiple_choice(self, agt_action):
-        """
-        Private abstract method for generating response it the last agent action act is 'multiple_choice'.
-        
-        :param agt_action: the last agent action
-        :return:
+        :param goal_id: the index of the goal in the goal set
+        :return: generator of the initial user actions
         """
 
-        # TODO
-        raise NotImplementedError()
+        goal = self.goal_set[goal_id]
 
-    def __response_thanks(self, agt_action):
-        """
-        Private abstract method for generating response it the last agent action act is 'thanks'.
-        
-        
-        :param agt_action: the last agent action
-        :return:
-        """
+        goal_inform_slots = list(goal[const.INFORM_SLOT_KEY].keys())
+        goal_request_slots = list(goal[const.REQUEST_SLOT_KEY].keys())
 
-        # TODO
-        raise NotImplementedError()
+        for init_dia_act in self.init_dia_act_set:
+            # if there are no inform slots in the goal, none is sampled
+            for sampled_inform_slot in goal_inform_slots or [None]:
+                inform_slots = {}
+                if sampled_inform_slot is not None:
+                    inform_slots[sampled_inform_slot] = goal[const.INFORM_SLOT_KEY][sampled_inform_slot]
+                    for init_slot in self.init_slots[init_dia_act]:
+                        if init_slot in goal[const.INFORM_SLOT_KEY].keys():
+                            inform_slots[init_slot] = goal[const.INFORM_SLOT_KEY][init_slot]
 
-    def __response_closing(self, agt_action):
-        """
-        Private abstract method for generating response it the last agent action act is 'closing'. 
-                
-        :param agt_action: the last agent action
-        :return:
-        """
+                # if there are no request slots in the goal, none is sampled and the user is only informing
+                for sampled_request_slot in goal_request_slots or [None]:
+                    init_action = {}
+                    init_action[const.DIA_ACT_KEY] = init_dia_act if sampled_request_slot is not None else 'inform'
+                    init_action[const.INFORM_SLOT_KEY] = dict(inform_slots)
+                    init_action[const.REQUEST_SLOT_KEY] = {}
+                    if sampled_request_slot is not None:
+                        init_action[const.REQUEST_SLOT_KEY][sampled_request_slot] = 'UNK'
 
-        # TODO
-        raise NotImplementedError()
+                    yield init_action
 
     def step(self, agt_action):
         """
@@ -293,32 +338,27 @@ class GORuleBasedUser(GOSimulatedUser):
 
         # we need to increase it for 2, counting for the agent response afterwards
         self.current_turn_nb += 2
-        agt_diaiact = agt_action[const.DIA_ACT_KEY]
-
-        # the resulting next user action
-        next_usr_action = {}
-        dialogue_status = const.NO_OUTCOME_YET
-
-        # based on the last agent action
-        if agt_diaiact == "inform":
-            self.__response_inform(agt_action)
-        elif agt_diaiact == "multiple_choice":
-            self.__response_multiple_choice(agt_action)
-        elif agt_diaiact == "request":
-            self.__response_request(agt_action)
-        elif agt_diaiact == "confirm_answer":
-            self.__response_confirm_answer(agt_action)
-        elif agt_diaiact == "closing":
-            self.__response_closing(agt_action)
-            dialogue_status = const.SUCCESS_DIALOG
-        elif agt_diaiact == "thanks":
-            self.__response_thanks(agt_action)
-            dialogue_status = const.SUCCESS_DIALOG
+
+        # the user response is selected from the table of responses, based on the last agent action
+        agt_act_ids, agt_inform_mask, agt_request_mask = self.simulator.encode_agt_actions([agt_action])
+
+        # only the random slot choices are applied again to a cached response plan
+        transition_key = None
+        if self.transition_cache is not None:
+            transition_key = self.simulator.transition_key(agt_act_ids[0], agt_inform_mask[0], agt_request_mask[0])
+
+        plan = self._get_cached_transition(transition_key)
+        if plan is None:
+            plan = self.simulator.plan_batch(agt_act_ids, agt_inform_mask, agt_request_mask)
+            self._cache_transition(transition_key, plan)
+
+        usr_action_batch = self.simulator.apply_batch(plan)
 
         # create the next user action
-        next_usr_action[const.DIA_ACT_KEY] = self.state[const.DIA_ACT_KEY]
-        next_usr_action[const.INFORM_SLOT_KEY] = self.state[const.USER_STATE_INFORM_SLOTS]
-        next_usr_action[const.REQUEST_SLOT_KEY] = self.state[const.USER_STATE_REQUEST_SLOTS]
+        next_usr_action = self.simulator.decode_usr_action(usr_action_batch, 0)
+        dialogue_status = int(usr_action_batch.dialogue_status[0])
+
+        self._update_state(next_usr_action)
 
         return next_usr_action, dialogue_status
 
@@ -327,28 +367,73 @@ class GOModelBasedUser(GOSimulatedUser):
     """
     Class representing a model based user in the Goal-Oriented Dialogue Systems.
     Extends the `GOUser` class.
+
+    The user responses are predicted by a `GOVectorizedModelBasedUser` holding a single user, which keeps the
+    recurrent state of the user across the turns. The user model is loaded only once per process and it is shared
+    between the users of all environments. In the training mode the user actions are sampled from the predicted
+    probabilities, such that the agent meets varied dialogues, and in the testing mode the most probable ones are taken.
     
     Class members:
     
-        - ** is_training **: boolean flag indicating the mode of using te model-based state tracker
-        - ** model_path **: the path to save or load the model
+        - ** is_training **: boolean flag indicating the mode of using the model-based user
+        - ** model_path **: the path to load the trained user model
+        - ** simulator **: the batch of model-based users holding this user
+        - ** goal_sampler **: the weighted sampler of the goals in the goal set
     """
 
     def __init__(self, id=None, simulation_mode=None, goal_set=None, slot_set=None, act_set=None, is_training=None,
-                 model_path=None):
+                 model_path=None, goal_weights=None):
+        # the goals are kept compiled in arrays, a list of goal dictionaries is compiled here
+        if goal_set is not None and not isinstance(goal_set, GOCompiledGoalSet):
+            goal_set = GOCompiledGoalSet.compile(goal_set, slot_set)
+
         super(GOModelBasedUser, self).__init__(id, simulation_mode, goal_set, slot_set, act_set)
 
         self.is_training = is_training
         self.model_path = model_path
 
-    def __sample_random_init_action(self):
-        # TODO
-        raise NotImplementedError()
+        self.simulator = None
+        self.goal_sampler = None
+        if goal_set is not None:
+            self.simulator = GOVectorizedModelBasedUser(1, goal_set, slot_set, act_set, model_path, goal_weights,
+                                                        sample_actions=bool(is_training))
+            self.goal_sampler = self.simulator.goal_sampler
 
-    def __sample_goal(self):
-        # TODO
-        raise NotImplementedError()
+    def _sample_random_init_action(self):
+        """
+        Overrides abstract method from the super class
+        """
+        # increase the dialogue number turn
+        self.current_turn_nb += 1
+
+        # predict the initial action for the already sampled goal
+        usr_action_batch = self.simulator.reset_batch(np.array([self.goal_id]))
+        init_action = self.simulator.decode_usr_action(usr_action_batch, 0)
+
+        self._update_state(init_action)
+
+        return init_action
+
+    def _sample_goal(self):
+        """
+        Overrides the abstract method from the super class
+        """
+        self.goal_id = self.goal_sampler.sample()
+        sample_goal = self.goal_set[self.goal_id]
+        return sample_goal
 
     def step(self, agt_action):
-        # TODO
-        raise NotImplementedError()
+        """
+         Overrides the abstract method from the super class
+        """
+
+        # we need to increase it for 2, counting for the agent response afterwards
+        self.current_turn_nb += 2
+
+        agt_act_ids, agt_inform_mask, agt_request_mask = self.simulator.encode_agt_actions([agt_action])
+        usr_action_batch = self.simulator.step_batch(agt_act_ids, agt_inform_mask, agt_request_mask)
+
+        next_usr_action = self.simulator.decode_usr_action(usr_action_batch, 0)
+        self._update_state(next_usr_action)
+
+        return next_usr_action, int(usr_action_batch.dialogue_status[0])
@@ -0,0 +1,559 @@
+"""
+Author: Vladimir Ilievski <ilievski.vladimir@live.com>
+
+A Python file for the vectorized simulated users, advancing many users at once in the Goal-Oriented Dialogue Systems
+"""
+
+from core import constants as const
+from core import dialog_config
+from core.user.goal_set import GOAliasSampler, GOCompiledGoalSet
+from core.user.user_model import STATUS_OUTPUTS, load_user_model
+
+from collections import namedtuple
+import numpy as np
+import struct
+
+# the user responses, selected by the table of agent dialogue acts
+RESPONSE_NEXT = 0
+RESPONSE_INFORM = 1
+RESPONSE_REQUEST = 2
+RESPONSE_CLOSE = 3
+
+# the response of the user for each agent dialogue act, all other dialogue acts get the RESPONSE_NEXT response
+AGT_ACT_RESPONSES = {
+    'inform': RESPONSE_INFORM,
+    'multiple_choice': RESPONSE_INFORM,
+    'request': RESPONSE_REQUEST,
+    'closing': RESPONSE_CLOSE,
+    'thanks': RESPONSE_CLOSE,
+}
+
+# the prefix of the transition keys, the agent dialogue act id and the goal id
+TRANSITION_KEY_PREFIX = struct.Struct('<iq')
+
+# user actions of a batch of users, integer-coded in arrays
+GOUserActionBatch = namedtuple('GOUserActionBatch',
+                               ['act_ids', 'inform_mask', 'dont_care_mask', 'request_mask', 'dialogue_status'])
+
+# the deterministic part of the user responses, the random slot choices are applied afterwards
+GOResponsePlan = namedtuple('GOResponsePlan',
+                            ['act_ids', 'inform_mask', 'dont_care_mask', 'request_mask', 'choice_mask',
+                             'choice_is_request', 'filled_mask', 'dialogue_status'])
+
+
+class GOVectorizedUser(object):
+    """
+    Base class for a batch of simulated users in the Goal-Oriented Dialogue Systems, which are advanced at once.
+    It holds the goals of the users in arrays with one row per user and one column per slot, and it encodes the agent
+    actions and decodes the user actions from and to their dictionary form. Extended by the concrete simulated users.
+
+    # Class members:
+
+        - ** nb_users **: the number of users in the batch
+        - ** goal_set **: the compiled set of goals for the users
+        - ** slot_set **: the set of all slots in the dialogue scenario
+        - ** act_set **: the set of all acts (intents) in the dialogue scenario
+        - ** goal_sampler **: the weighted sampler of the goals in the goal set
+        - ** goal_ids **: array of shape (nb_users,), the goal of each user
+        - ** goal_inform **: boolean array of shape (nb_users, nb_slots), the inform slots in the goal of each user
+        - ** goal_request **: boolean array of shape (nb_users, nb_slots), the request slots in the goal of each user
+        - ** dialogue_status **: array of shape (nb_users,), the dialogue status of each user
+    """
+
+    def __init__(self, nb_users=1, goal_set=None, slot_set=None, act_set=None, goal_weights=None):
+        """
+        Constructor of the `GOVectorizedUser` class.
+        """
+
+        if not isinstance(goal_set, GOCompiledGoalSet):
+            goal_set = GOCompiledGoalSet.compile(goal_set, slot_set)
+
+        self.nb_users = nb_users
+
+        self.goal_set = goal_set
+        self.slot_set = slot_set
+        self.act_set = act_set
+
+        self.slots = sorted(slot_set.keys(), key=lambda slot: slot_set[slot])
+        self.acts = sorted(act_set.keys(), key=lambda act: act_set[act])
+
+        self.goal_sampler = None
+        self.set_goal_weights(goal_weights)
+
+        # the integer-coded goals of the users
+        self.goal_ids = np.zeros(nb_users, dtype=np.int64)
+        self.goal_inform = np.zeros((nb_users, len(slot_set)), dtype=np.bool_)
+        self.goal_request = np.zeros((nb_users, len(slot_set)), dtype=np.bool_)
+        self.dialogue_status = np.zeros(nb_users, dtype=np.int8)
+
+    def set_goal_weights(self, goal_weights=None):
+        """
+        Method for setting the weights of sampling the goals from the goal set, for example for running a curriculum.
+
+        :param goal_weights: the non-negative weights of the goals. If None, the goals are sampled uniformly
+        :return:
+        """
+
+        if goal_weights is None:
+            goal_weights = np.ones(len(self.goal_set))
+
+        self.goal_sampler = GOAliasSampler(goal_weights)
+
+    def _get_idxs(self, idxs):
+        """
+        Helper method for getting the indices of the users to advance.
+
+        :param idxs: array of user indices, or None for all users
+        :return: array of user indices
+        """
+
+        return np.arange(self.nb_users) if idxs is None else np.asarray(idxs, dtype=np.int64)
+
+    def _reset_goals(self, goal_ids, idxs):
+        """
+        Helper method for setting new goals of the users.
+
+        :param goal_ids: array with the goal of each user. If None, the goals are sampled from the goal sampler
+        :param idxs: array with the indices of the users to restart
+        :return: the goal inform slots and the goal request slots of the restarted users
+        """
+
+        if goal_ids is None:
+            goal_ids = self.goal_sampler.sample(len(idxs))
+        goal_ids = np.asarray(goal_ids, dtype=np.int64)
+
+        goal_inform = self.goal_set.inform_value_ids[goal_ids] >= 0
+        goal_request = np.asarray(self.goal_set.request_mask[goal_ids])
+
+        self.goal_ids[idxs] = goal_ids
+        self.goal_inform[idxs] = goal_inform
+        self.goal_request[idxs] = goal_request
+        self.dialogue_status[idxs] = const.NO_OUTCOME_YET
+
+        return goal_inform, goal_request
+
+    def reset_batch(self, goal_ids=None, idxs=None):
+        """
+        Method for restarting the users with new goals and producing their initial actions. Overridden by the
+        subclasses.
+
+        :param goal_ids: array with the goal of each user. If None, the goals are sampled from the goal sampler
+        :param idxs: array with the indices of the users to restart. If None, all users are restarted
+        :return: the initial user actions as `GOUserActionBatch`
+        """
+
+        raise NotImplementedError()
+
+    def step_batch(self, agt_act_ids, agt_inform_mask, agt_request_mask, idxs=None):
+        """
+        Method for advancing the users given one agent action per user. Overridden by the subclasses.
+
+        :param agt_act_ids: array of shape (nb_rows,) with the agent dialogue act ids
+        :param agt_inform_mask: boolean array of shape (nb_rows, nb_slots) with the agent inform slots
+        :param agt_request_mask: boolean array of shape (nb_rows, nb_slots) with the agent request slots
+        :param idxs: array with the indices of the users to advance. If None, all users are advanced
+        :return: the next user actions as `GOUserActionBatch`
+        """
+
+        raise NotImplementedError()
+
+    def encode_agt_actions(self, agt_actions):
+        """
+        Method for encoding agent actions, given as dictionaries, in arrays. The slots out of the slot set are ignored.
+
+        :param agt_actions: list of agent actions
+        :return: the agent dialogue act ids, the inform slots mask and the request slots mask
+        """
+
+        agt_act_ids = np.zeros(len(agt_actions), dtype=np.int64)
+        agt_inform_mask = np.zeros((len(agt_actions), len(self.slot_set)), dtype=np.bool_)
+        agt_request_mask = np.zeros((len(agt_actions), len(self.slot_set)), dtype=np.bool_)
+
+        for row, agt_action in enumerate(agt_actions):
+            agt_act_ids[row] = self.act_set[agt_action[const.DIA_ACT_KEY]]
+            for slot in agt_action[const.INFORM_SLOT_KEY].keys():
+                if slot in self.slot_set:
+                    agt_inform_mask[row, self.slot_set[slot]] = True
+            for slot in agt_action[const.REQUEST_SLOT_KEY].keys():
+                if slot in self.slot_set:
+                    agt_request_mask[row, self.slot_set[slot]] = True
+
+        return agt_act_ids, agt_inform_mask, agt_request_mask
+
+    def decode_usr_action(self, usr_action_batch, row, idx=None):
+        """
+        Method for decoding one user action from the batch to its dictionary form, with the values from the user goal.
+
+        :param usr_action_batch: the user actions as `GOUserActionBatch`
+        :param row: the row of the user action in the batch
+        :param idx: the index of the user. If None, it is the same as the row
+        :return: the user action as a dictionary
+        """
+
+        idx = row if idx is None else idx
+        goal_value_ids = self.goal_set.inform_value_ids[self.goal_ids[idx]]
+
+        usr_action = {}
+        usr_action[const.DIA_ACT_KEY] = self.acts[usr_action_batch.act_ids[row]]
+        usr_action[const.INFORM_SLOT_KEY] = {}
+        usr_action[const.REQUEST_SLOT_KEY] = {}
+
+        for slot_id in np.flatnonzero(usr_action_batch.inform_mask[row]):
+            usr_action[const.INFORM_SLOT_KEY][self.slots[slot_id]] = self.goal_set.values[goal_value_ids[slot_id]]
+
+        for slot_id in np.flatnonzero(usr_action_batch.dont_care_mask[row]):
+            usr_action[const.INFORM_SLOT_KEY][self.slots[slot_id]] = dialog_config.I_DO_NOT_CARE
+
+        for slot_id in np.flatnonzero(usr_action_batch.request_mask[row]):
+            usr_action[const.REQUEST_SLOT_KEY][self.slots[slot_id]] = 'UNK'
+
+        return usr_action
+
+
+class GOVectorizedRuleBasedUser(GOVectorizedUser):
+    """
+    Class representing a batch of rule-based users in the Goal-Oriented Dialogue Systems, which are advanced at once.
+
+    The user state is integer-coded in arrays with one row per user and one column per slot, and the user responses
+    are selected from a table indexed by the agent dialogue act. Each response is computed with array operations over
+    all users which got the same response, so there are no Python loops over the users. Extends the
+    `GOVectorizedUser` class.
+
+    The user responses are the following:
+
+        - ** RESPONSE_INFORM **: the agent informed slots. The requested goal slots among them are filled and the user
+                            proceeds as in RESPONSE_NEXT.
+        - ** RESPONSE_REQUEST **: the agent requested slots. The user informs the ones in the goal, does not care about
+                            the ones out of the goal, or requests them back if it is looking for them as well.
+        - ** RESPONSE_NEXT **: the user requests one random unfilled goal request slot. If there are none, it informs
+                            one random goal inform slot it has not told yet. If there are none, it thanks.
+        - ** RESPONSE_CLOSE **: the agent closed the dialogue. It is successful if all goal request slots are filled.
+
+    # Class members:
+
+        - ** response_table **: array with the user response for each agent dialogue act id
+        - ** init_act_ids **: array with the ids of the initial dialogue acts
+        - ** init_slots_mask **: for each initial dialogue act, the mask of its initial inform slots
+        - ** told **: boolean array of shape (nb_users, nb_slots), the slots each user has informed so far
+        - ** filled **: boolean array of shape (nb_users, nb_slots), the goal request slots filled by the agent so far
+    """
+
+    def __init__(self, nb_users=1, goal_set=None, slot_set=None, act_set=None, init_slots=None,
+                 init_dia_act_set=None, goal_weights=None):
+        """
+        Constructor of the `GOVectorizedRuleBasedUser` class.
+        """
+
+        super(GOVectorizedRuleBasedUser, self).__init__(nb_users, goal_set, slot_set, act_set, goal_weights)
+
+        # the dialogue acts the user is responding with
+        self.inform_act_id = act_set['inform']
+        self.request_act_id = act_set['request']
+        self.thanks_act_id = act_set['thanks']
+
+        # the table of the user responses, indexed by the agent dialogue act id
+        self.response_table = np.full(len(act_set), RESPONSE_NEXT, dtype=np.int8)
+        for act, response in AGT_ACT_RESPONSES.items():
+            if act in act_set:
+                self.response_table[act_set[act]] = response
+
+        # the initial dialogue acts and their initial inform slots
+        self.init_act_ids = np.array([act_set[act] for act in init_dia_act_set], dtype=np.int64)
+        self.init_slots_mask = np.zeros((len(init_dia_act_set), len(slot_set)), dtype=np.bool_)
+        for init_idx, act in enumerate(init_dia_act_set):
+            for slot in init_slots[act]:
+                if slot in slot_set:
+                    self.init_slots_mask[init_idx, slot_set[slot]] = True
+
+        # the integer-coded user state
+        self.told = np.zeros((nb_users, len(slot_set)), dtype=np.bool_)
+        self.filled = np.zeros((nb_users, len(slot_set)), dtype=np.bool_)
+
+    @staticmethod
+    def __choose_random_slots(candidates):
+        """
+        Private helper method for choosing one random slot per row among the candidate slots.
+
+        :param candidates: boolean array of shape (nb_rows, nb_slots) with the candidate slots
+        :return: boolean array of the same shape with the chosen slot per row, empty rows stay empty
+        """
+
+        scores = np.where(candidates, np.random.random_sample(candidates.shape), -1.0)
+        choices = scores.argmax(axis=1)
+
+        chosen = np.zeros(candidates.shape, dtype=np.bool_)
+        rows = np.flatnonzero(candidates.any(axis=1))
+        chosen[rows, choices[rows]] = True
+
+        return chosen
+
+    def reset_batch(self, goal_ids=None, idxs=None):
+        """
+        Method for restarting the users with new goals and sampling their initial actions.
+        Overrides the super class method.
+
+        :param goal_ids: array with the goal of each user. If None, the goals are sampled from the goal sampler
+        :param idxs: array with the indices of the users to restart. If None, all users are restarted
+        :return: the initial user actions as `GOUserActionBatch`
+        """
+
+        idxs = self._get_idxs(idxs)
+        nb_rows = len(idxs)
+
+        goal_inform, goal_request = self._reset_goals(goal_ids, idxs)
+        self.filled[idxs] = False
+
+        # sample the initial dialogue act, one goal inform slot together with the initial slots and one request slot
+        init_idxs = np.random.randint(len(self.init_act_ids), size=nb_rows)
+        inform_mask = self.__choose_random_slots(goal_inform) | (self.init_slots_mask[init_idxs] & goal_inform)
+        request_mask = self.__choose_random_slots(goal_request)
+
+        # if there are no request slots, the user is only informing
+        act_ids = np.where(request_mask.any(axis=1), self.init_act_ids[init_idxs], self.inform_act_id)
+
+        self.told[idxs] = inform_mask
+
+        return GOUserActionBatch(act_ids, inform_mask, np.zeros_like(inform_mask), request_mask,
+                                 np.zeros(nb_rows, dtype=np.int8))
+
+    def plan_batch(self, agt_act_ids, agt_inform_mask, agt_request_mask, idxs=None):
+        """
+        Method for computing the deterministic part of the user responses to the agent actions, from the table of
+        user responses. It does not change the user state.
+
+        :param agt_act_ids: array of shape (nb_rows,) with the agent dialogue act ids
+        :param agt_inform_mask: boolean array of shape (nb_rows, nb_slots) with the agent inform slots
+        :param agt_request_mask: boolean array of shape (nb_rows, nb_slots) with the agent request slots
+        :param idxs: array with the indices of the users to respond. If None, all users respond
+        :return: the response plan as `GOResponsePlan`
+        """
+
+        idxs = self._get_idxs(idxs)
+        nb_rows = len(idxs)
+
+        responses = self.response_table[agt_act_ids]
+
+        goal_inform = self.goal_inform[idxs]
+        goal_request = self.goal_request[idxs]
+        told = self.told[idxs]
+
+        act_ids = np.full(nb_rows, self.thanks_act_id, dtype=np.int64)
+        inform_mask = np.zeros(goal_inform.shape, dtype=np.bool_)
+        dont_care_mask = np.zeros(goal_inform.shape, dtype=np.bool_)
+        request_mask = np.zeros(goal_inform.shape, dtype=np.bool_)
+        choice_mask = np.zeros(goal_inform.shape, dtype=np.bool_)
+        choice_is_request = np.zeros(nb_rows, dtype=np.bool_)
+        dialogue_status = np.full(nb_rows, const.NO_OUTCOME_YET, dtype=np.int8)
+
+        # the goal request slots informed by the agent are filled
+        filled_mask = agt_inform_mask & goal_request
+        filled = self.filled[idxs] | filled_mask
+
+        next_rows = (responses == RESPONSE_NEXT) | (responses == RESPONSE_INFORM)
+
+        # the agent requested slots
+        request_rows = responses == RESPONSE_REQUEST
+        requested = agt_request_mask & request_rows[:, None]
+
+        inform_mask |= requested & goal_inform
+        dont_care_mask |= requested & ~goal_inform & ~goal_request
+        answered = (inform_mask | dont_care_mask).any(axis=1)
+
+        request_mask |= requested & goal_request & ~filled
+        request_mask[answered] = False
+        asked_back = request_rows & ~answered & request_mask.any(axis=1)
+
+        act_ids[answered] = self.inform_act_id
+        act_ids[asked_back] = self.request_act_id
+        next_rows |= request_rows & ~answered & ~asked_back
+
+        # the user proceeds with its goal
+        remaining_request = goal_request & ~filled
+        remaining_inform = goal_inform & ~told
+        has_remaining_request = remaining_request.any(axis=1)
+        has_remaining_inform = remaining_inform.any(axis=1)
+
+        request_next_rows = next_rows & has_remaining_request
+        act_ids[request_next_rows] = self.request_act_id
+        choice_mask[request_next_rows] = remaining_request[request_next_rows]
+        choice_is_request[request_next_rows] = True
+
+        inform_next_rows = next_rows & ~has_remaining_request & has_remaining_inform
+        act_ids[inform_next_rows] = self.inform_act_id
+        choice_mask[inform_next_rows] = remaining_inform[inform_next_rows]
+
+        # the agent closed the dialogue
+        close_rows = responses == RESPONSE_CLOSE
+        dialogue_status[close_rows] = np.where(has_remaining_request[close_rows], const.FAILED_DIALOG,
+                                               const.SUCCESS_DIALOG)
+
+        return GOResponsePlan(act_ids, inform_mask, dont_care_mask, request_mask, choice_mask, choice_is_request,
+                              filled_mask, dialogue_status)
+
+    def transition_key(self, agt_act_id, agt_inform_mask, agt_request_mask, idx=0):
+        """
+        Method for creating a compact key of the deterministic part of the user response, i.e. of the agent action
+        and the user goal state. The slot masks are packed in bits, such that the key is a few bytes long.
+
+        :param agt_act_id: the agent dialogue act id
+        :param agt_inform_mask: boolean array of shape (nb_slots,) with the agent inform slots
+        :param agt_request_mask: boolean array of shape (nb_slots,) with the agent request slots
+        :param idx: the index of the user
+        :return: the key as bytes
+        """
+
+        slot_masks = np.concatenate((agt_inform_mask, agt_request_mask, self.told[idx], self.filled[idx]))
+
+        return TRANSITION_KEY_PREFIX.pack(agt_act_id, self.goal_ids[idx]) + np.packbits(slot_masks).tobytes()
+
+    def apply_batch(self, plan, idxs=None):
+        """
+        Method for applying the random slot choices of the response plan and updating the user state.
+        The response plan is not changed, such that it can be applied again.
+
+        :param plan: the response plan as `GOResponsePlan`
+        :param idxs: array with the indices of the users to respond. If None, all users respond
+        :return: the next user actions as `GOUserActionBatch`
+        """
+
+        idxs = self._get_idxs(idxs)
+
+        chosen = self.__choose_random_slots(plan.choice_mask)
+        inform_mask = plan.inform_mask | (chosen & ~plan.choice_is_request[:, None])
+        request_mask = plan.request_mask | (chosen & plan.choice_is_request[:, None])
+
+        self.told[idxs] |= inform_mask | plan.dont_care_mask
+        self.filled[idxs] |= plan.filled_mask
+        self.dialogue_status[idxs] = plan.dialogue_status
+
+        return GOUserActionBatch(plan.act_ids, inform_mask, plan.dont_care_mask, request_mask,
+                                 plan.dialogue_status)
+
+    def step_batch(self, agt_act_ids, agt_inform_mask, agt_request_mask, idxs=None):
+        """
+        Method for advancing the users given one agent action per user. Overrides the super class method.
+
+        :param agt_act_ids: array of shape (nb_rows,) with the agent dialogue act ids
+        :param agt_inform_mask: boolean array of shape (nb_rows, nb_slots) with the agent inform slots
+        :param agt_request_mask: boolean array of shape (nb_rows, nb_slots) with the agent request slots
+        :param idxs: array with the indices of the users to advance. If None, all users are advanced
+        :return: the next user actions as `GOUserActionBatch`
+        """
+
+        plan = self.plan_batch(agt_act_ids, agt_inform_mask, agt_request_mask, idxs)
+        return self.apply_batch(plan, idxs)
+
+
+class GOVectorizedModelBasedUser(GOVectorizedUser):
+    """
+    Class representing a batch of model-based users in the Goal-Oriented Dialogue Systems, which are advanced at once.
+
+    The user responses are predicted by a recurrent user model, shared between all batches of users in the process.
+    Each step of the users is one forward pass of the model for the whole batch. The recurrent state of each user is
+    kept in a row of the state arrays and carried across the turns, so the dialogue history is never re-encoded.
+    Extends the `GOVectorizedUser` class.
+
+    # Class members:
+
+        - ** user_model **: the shared recurrent user model
+        - ** sample_actions **: flag indicating whether the dialogue acts and the slots are sampled from the predicted
+                            probabilities, instead of taking the most probable ones
+        - ** hidden **: array of shape (nb_users, hidden_size), the hidden state of each user
+        - ** cell **: array of shape (nb_users, hidden_size), the cell state of each user
+    """
+
+    def __init__(self, nb_users=1, goal_set=None, slot_set=None, act_set=None, model_path=None, goal_weights=None,
+                 sample_actions=False):
+        """
+        Constructor of the `GOVectorizedModelBasedUser` class.
+        """
+
+        super(GOVectorizedModelBasedUser, self).__init__(nb_users, goal_set, slot_set, act_set, goal_weights)
+
+        self.user_model = load_user_model(model_path)
+        if self.user_model.act_dict != act_set or self.user_model.slot_dict != slot_set:
+            raise ValueError("The user model in %s was trained with a different act set or slot set" % model_path)
+
+        self.hidden, self.cell = self.user_model.init_state(nb_users)
+        self.sample_actions = sample_actions
+
+    def __predict_batch(self, agt_act_ids, agt_inform_mask, agt_request_mask, idxs):
+        """
+        Private helper method for predicting the user actions with one forward pass of the user model, and carrying
+        the recurrent state of the users to the next turn.
+
+        :param agt_act_ids: array of shape (nb_rows,) with the agent dialogue act ids, -1 for no agent action
+        :param agt_inform_mask: boolean array of shape (nb_rows, nb_slots) with the agent inform slots
+        :param agt_request_mask: boolean array of shape (nb_rows, nb_slots) with the agent request slots
+        :param idxs: array with the indices of the users to advance
+        :return: the next user actions as `GOUserActionBatch`
+        """
+
+        goal_inform = self.goal_inform[idxs]
+        goal_request = self.goal_request[idxs]
+
+        inputs = self.user_model.encode_inputs(agt_act_ids, agt_inform_mask, agt_request_mask, goal_inform,
+                                               goal_request)
+        act_scores, inform_probs, request_probs, status_scores, hidden, cell = \
+            self.user_model.forward_batch(inputs, self.hidden[idxs], self.cell[idxs])
+
+        self.hidden[idxs] = hidden
+        self.cell[idxs] = cell
+
+        if self.sample_actions:
+            act_probs = np.exp(act_scores - act_scores.max(axis=1, keepdims=True))
+            act_probs /= act_probs.sum(axis=1, keepdims=True)
+            act_ids = (np.random.uniform(size=(len(idxs), 1)) < act_probs.cumsum(axis=1)).argmax(axis=1)
+            predicted_inform = np.random.uniform(size=inform_probs.shape) < inform_probs
+            predicted_request = np.random.uniform(size=request_probs.shape) < request_probs
+        else:
+            act_ids = act_scores.argmax(axis=1)
+            predicted_inform = inform_probs > 0.5
+            predicted_request = request_probs > 0.5
+
+        # the user informs only the slots in its goal and does not care about the requested slots out of it
+        inform_mask = predicted_inform & goal_inform
+        dont_care_mask = predicted_inform & ~goal_inform & agt_request_mask
+        request_mask = predicted_request & goal_request
+
+        dialogue_status = STATUS_OUTPUTS[status_scores.argmax(axis=1)]
+        self.dialogue_status[idxs] = dialogue_status
+
+        return GOUserActionBatch(act_ids, inform_mask, dont_care_mask, request_mask, dialogue_status)
+
+    def reset_batch(self, goal_ids=None, idxs=None):
+        """
+        Method for restarting the users with new goals and predicting their initial actions.
+        Overrides the super class method.
+
+        :param goal_ids: array with the goal of each user. If None, the goals are sampled from the goal sampler
+        :param idxs: array with the indices of the users to restart. If None, all users are restarted
+        :return: the initial user actions as `GOUserActionBatch`
+        """
+
+        idxs = self._get_idxs(idxs)
+        nb_rows = len(idxs)
+
+        self._reset_goals(goal_ids, idxs)
+        self.hidden[idxs] = 0
+        self.cell[idxs] = 0
+
+        # there is no agent action before the initial user action
+        no_agt_act_ids = np.full(nb_rows, -1, dtype=np.int64)
+        no_agt_slots_mask = np.zeros((nb_rows, len(self.slot_set)), dtype=np.bool_)
+
+        return self.__predict_batch(no_agt_act_ids, no_agt_slots_mask, no_agt_slots_mask, idxs)
+
+    def step_batch(self, agt_act_ids, agt_inform_mask, agt_request_mask, idxs=None):
+        """
+        Method for advancing the users given one agent action per user. Overrides the super class method.
+
+        :param agt_act_ids: array of shape (nb_rows,) with the agent dialogue act ids
+        :param agt_inform_mask: boolean array of shape (nb_rows, nb_slots) with the agent inform slots
+        :param agt_request_mask: boolean array of shape (nb_rows, nb_slots) with the agent request slots
+        :param idxs: array with the indices of the users to advance. If None, all users are advanced
+        :return: the next user actions as `GOUserActionBatch`
+        """
+
+        idxs = self._get_idxs(idxs)
+        return self.__predict_batch(agt_act_ids, agt_inform_mask, agt_request_mask, idxs)
@@ -19,10 +19,28 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 import core
 from core.dm import dialogue_system
+from core.dm import kb_helper
+from core.dm import session_manager
+from core.dm import batching
+from core.dm import evaluation
 from core.agent import agents
+from core.agent import actions
+from core.agent import policy
+from core.agent import memory
+from core.agent import numpy_agents
+from core.agent import actor_learner
+from core.agent import rule_agents
+from core.agent import quantization
 from core.environment import environment
+from core.environment import async_environment
 from core.dst import state_tracker
+from core.dst import action_mask
 from core.user import users
+from core.user import async_users
+from core.user import vectorized_users
+from core.user import user_model
+from core.user import replay_users
+from core.user import goal_set
 
 
 
@@ -33,7 +51,7 @@ EXCLUDE = {
 PAGES = [
     {
         'page': 'dm/overview.md',
-        'all_module_classes': [dialogue_system],
+        'all_module_classes': [dialogue_system, kb_helper, session_manager, batching, evaluation],
     },
     {
         'page': 'dm/dialogue_sys.md',
@@ -44,11 +62,12 @@ PAGES = [
     },
     {
         'page': 'agents/overview.md',
-        'all_module_classes': [agents],
+        'all_module_classes': [agents, actions, policy, memory, numpy_agents, actor_learner, rule_agents,
+                               quantization],
     },
     {
         'page': 'environment/overview.md',
-        'all_module_classes': [environment],
+        'all_module_classes': [environment, async_environment],
     },
     {
         'page': 'environment/environment.md',
@@ -63,11 +82,11 @@ PAGES = [
     },
     {
         'page': 'dst/overview.md',
-        'all_module_classes': [state_tracker],
+        'all_module_classes': [state_tracker, action_mask],
     },
     {
         'page': 'user/overview.md',
-        'all_module_classes': [users],
+        'all_module_classes': [users, async_users, goal_set, vectorized_users, user_model, replay_users],
     },
 
 
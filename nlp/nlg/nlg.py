@@ -7,7 +7,7 @@ Created on Oct 17, 2016
 @author: xiul
 '''
 
-import cPickle as pickle
+import pickle
 import copy, argparse, json
 import numpy as np
 
@@ -53,11 +53,10 @@ class nlg:
         sentence = ""
         boolean_in = False
         
-        # remove I do not care slot in task(complete)
+        # remove I do not care slot in task(complete), from a copy, since the inform slots may be shared or read-only
         if dia_act['diaact'] == 'inform' and 'taskcomplete' in dia_act['inform_slots'].keys() and dia_act['inform_slots']['taskcomplete'] != dialog_config.NO_VALUE_MATCH:
-            inform_slot_set = dia_act['inform_slots'].keys()
-            for slot in inform_slot_set:
-                if dia_act['inform_slots'][slot] == dialog_config.I_DO_NOT_CARE: del dia_act['inform_slots'][slot]
+            dia_act = dict(dia_act)
+            dia_act['inform_slots'] = {slot: value for slot, value in dia_act['inform_slots'].items() if value != dialog_config.I_DO_NOT_CARE}
         
         if dia_act['diaact'] in self.diaact_nl_pairs['dia_acts'].keys():
             for ele in self.diaact_nl_pairs['dia_acts'][dia_act['diaact']]:
@@ -135,9 +134,9 @@ class nlg:
     def load_nlg_model(self, model_path):
         """ load the trained NLG model """  
 
-        print "Load trained NLG unit"
+        print ("Load trained NLG unit")
 
-        model_params = pickle.load(open(model_path, 'rb'))
+        model_params = pickle.load(open(model_path, 'rb'), encoding='latin1')
     
         hidden_size = model_params['model']['Wd'].shape[0]
         output_size = model_params['model']['Wd'].shape[1]
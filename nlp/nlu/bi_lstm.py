@@ -34,6 +34,8 @@ class biLSTM(SeqToSeq):
     def fwdPass(self, Xs, params, **kwargs):
         predict_mode = kwargs.get('predict_mode', False)
         
+        if 'word_ids' in Xs: return self.fwdPassIds(Xs, params, predict_mode)
+        
         Ws = Xs['word_vectors']
         
         WLSTM = self.model['WLSTM']
@@ -57,7 +59,7 @@ class biLSTM(SeqToSeq):
         bCellin = np.zeros((n, d))
         bCellout = np.zeros((n, d))
         
-        for t in xrange(n):
+        for t in range(n):
             prev = np.zeros(d) if t==0 else Hout[t-1]
             Hin[t,0] = 1 # bias
             Hin[t, 1:1+xd] = Ws[t]
@@ -126,8 +128,162 @@ class biLSTM(SeqToSeq):
             
         return Y, cache
     
+    """ Forward Pass over token ids: the input projection of a token is a row gather from the input slices of WLSTM
+    and bWLSTM, instead of the product of its one-hot vector with the whole matrices """
+    def fwdPassIds(self, Xs, params, predict_mode=False):
+        word_ids = np.asarray(Xs['word_ids'])
+        
+        WLSTM = self.model['WLSTM']
+        bWLSTM = self.model['bWLSTM']
+        
+        n = len(word_ids)
+        
+        d = self.model['Wd'].shape[0] # size of hidden layer
+        xd = WLSTM.shape[0] - d - 1 # size of the vocabulary
+        Wh = WLSTM[1+xd:] # hidden-to-gates slices
+        bWh = bWLSTM[1+xd:]
+        
+        # the bias and the input contributions to the gates of all tokens, at once
+        Xin = WLSTM[0] + WLSTM[1 + word_ids]
+        bXin = bWLSTM[0] + bWLSTM[1 + word_ids]
+        
+        Hprev = np.zeros((n, d)) # ht-1
+        Hout = np.zeros((n, d))
+        IFOG = np.zeros((n, 4*d))
+        IFOGf = np.zeros((n, 4*d)) # after nonlinearity
+        Cellin = np.zeros((n, d))
+        Cellout = np.zeros((n, d))
+        
+        # backward
+        bHprev = np.zeros((n, d)) # ht+1
+        bHout = np.zeros((n, d))
+        bIFOG = np.zeros((n, 4*d))
+        bIFOGf = np.zeros((n, 4*d)) # after nonlinearity
+        bCellin = np.zeros((n, d))
+        bCellout = np.zeros((n, d))
+        
+        for t in range(n):
+            if t > 0: Hprev[t] = Hout[t-1]
+            
+            # compute all gate activations. dots:
+            IFOG[t] = Xin[t] + Hprev[t].dot(Wh)
+            
+            IFOGf[t, :3*d] = 1/(1+np.exp(-IFOG[t, :3*d])) # sigmoids; these are three gates
+            IFOGf[t, 3*d:] = np.tanh(IFOG[t, 3*d:]) # tanh for input value
+            
+            Cellin[t] = IFOGf[t, :d] * IFOGf[t, 3*d:]
+            if t>0: Cellin[t] += IFOGf[t, d:2*d]*Cellin[t-1]
+            
+            Cellout[t] = np.tanh(Cellin[t])
+            Hout[t] = IFOGf[t, 2*d:3*d] * Cellout[t]
+            
+            # backward hidden layer
+            b_t = n-1-t
+            if t > 0: bHprev[b_t] = bHout[b_t+1]
+            
+            bIFOG[b_t] = bXin[b_t] + bHprev[b_t].dot(bWh)
+            bIFOGf[b_t, :3*d] = 1/(1+np.exp(-bIFOG[b_t, :3*d]))
+            bIFOGf[b_t, 3*d:] = np.tanh(bIFOG[b_t, 3*d:])
+            
+            bCellin[b_t] = bIFOGf[b_t, :d] * bIFOGf[b_t, 3*d:]
+            if t>0: bCellin[b_t] += bIFOGf[b_t, d:2*d] * bCellin[b_t+1]
+            
+            bCellout[b_t] = np.tanh(bCellin[b_t])
+            bHout[b_t] = bIFOGf[b_t, 2*d:3*d]*bCellout[b_t]
+        
+        Wd = self.model['Wd']
+        bd = self.model['bd']
+        fY = Hout.dot(Wd)+bd
+        
+        bWd = self.model['bWd']
+        bbd = self.model['bbd']
+        bY = bHout.dot(bWd)+bbd
+        
+        Y = fY + bY
+        
+        cache = {}
+        if not predict_mode:
+            cache['WLSTM'] = WLSTM
+            cache['Hout'] = Hout
+            cache['Wd'] = Wd
+            cache['IFOGf'] = IFOGf
+            cache['IFOG'] = IFOG
+            cache['Cellin'] = Cellin
+            cache['Cellout'] = Cellout
+            cache['Hprev'] = Hprev
+            
+            cache['bWLSTM'] = bWLSTM
+            cache['bHout'] = bHout
+            cache['bWd'] = bWd
+            cache['bIFOGf'] = bIFOGf
+            cache['bIFOG'] = bIFOG
+            cache['bCellin'] = bCellin
+            cache['bCellout'] = bCellout
+            cache['bHprev'] = bHprev
+            
+            cache['word_ids'] = word_ids
+        
+        return Y, cache
+    
+    """ Batch Forward Pass over the padded token ids of shape (B, T), with the lengths of the sequences, returning the
+    scores of shape (B, T, nb_tags): the recurrences run once over the batch, with one (B, 4d) gate product per step.
+    The backward layer keeps its zero state over the padding, such that it starts at the end of each sequence """
+    def fwdPassBatch(self, word_ids, lengths):
+        word_ids = np.asarray(word_ids)
+        B, T = word_ids.shape
+        
+        WLSTM = self.model['WLSTM']
+        bWLSTM = self.model['bWLSTM']
+        d = self.model['Wd'].shape[0] # size of hidden layer
+        xd = WLSTM.shape[0] - d - 1 # size of the vocabulary
+        Wh = WLSTM[1+xd:] # hidden-to-gates slices
+        bWh = bWLSTM[1+xd:]
+        
+        # the bias and the input contributions to the gates of all tokens, at once and time-major
+        Xin = np.take(WLSTM, 1 + word_ids.T, axis=0)
+        Xin += WLSTM[0]
+        bXin = np.take(bWLSTM, 1 + word_ids.T, axis=0)
+        bXin += bWLSTM[0]
+        
+        # the mask of the tokens, False on the padding
+        mask = (np.arange(T)[:, np.newaxis] < np.asarray(lengths)[np.newaxis, :])[:, :, np.newaxis]
+        
+        Hout = np.zeros((T, B, d))
+        H = np.zeros((B, d))
+        Cell = np.zeros((B, d))
+        
+        bHout = np.zeros((T, B, d))
+        bH = np.zeros((B, d))
+        bCell = np.zeros((B, d))
+        
+        for t in range(T):
+            IFOG = Xin[t] + H.dot(Wh)
+            
+            IFOGf = 1/(1+np.exp(-IFOG[:, :3*d])) # sigmoids; these are three gates
+            Cell = IFOGf[:, :d] * np.tanh(IFOG[:, 3*d:]) + IFOGf[:, d:2*d] * Cell
+            H = IFOGf[:, 2*d:3*d] * np.tanh(Cell)
+            
+            Hout[t] = H
+            
+            # backward hidden layer
+            b_t = T-1-t
+            bIFOG = bXin[b_t] + bH.dot(bWh)
+            
+            bIFOGf = 1/(1+np.exp(-bIFOG[:, :3*d]))
+            bCell = np.where(mask[b_t], bIFOGf[:, :d] * np.tanh(bIFOG[:, 3*d:]) + bIFOGf[:, d:2*d] * bCell, 0)
+            bH = np.where(mask[b_t], bIFOGf[:, 2*d:3*d] * np.tanh(bCell), 0)
+            
+            bHout[b_t] = bH
+        
+        fY = Hout.reshape(T*B, d).dot(self.model['Wd']) + self.model['bd']
+        bY = bHout.reshape(T*B, d).dot(self.model['bWd']) + self.model['bbd']
+        
+        return (fY + bY).reshape(T, B, -1).transpose(1, 0, 2)
+    
     """ Backward Pass """
     def bwdPass(self, dY, cache):
+        if 'word_ids' in cache: return self.bwdPassIds(dY, cache)
+        
         Wd = cache['Wd']
         Hout = cache['Hout']
         IFOG = cache['IFOG']
@@ -176,7 +332,7 @@ class biLSTM(SeqToSeq):
         dbCellin = np.zeros(bCellin.shape)
         dbCellout = np.zeros(bCellout.shape)
         
-        for t in reversed(xrange(n)):
+        for t in reversed(range(n)):
             dIFOGf[t,2*d:3*d] = Cellout[t] * dHout[t]
             dCellout[t] = IFOGf[t,2*d:3*d] * dHout[t]
             
@@ -224,4 +380,108 @@ class biLSTM(SeqToSeq):
       
             if t>0: dbHout[b_t+1] += dbHin[b_t, 1+Ws.shape[1]:]
                 
+        return {'WLSTM':dWLSTM, 'Wd':dWd, 'bd':dbd, 'bWLSTM':dbWLSTM, 'bWd':dbWd, 'bbd':dbbd}
+    
+    """ Backward Pass over token ids: the gradients of the input slices of WLSTM and bWLSTM are scattered to the rows
+    of the tokens """
+    def bwdPassIds(self, dY, cache):
+        Wd = cache['Wd']
+        Hout = cache['Hout']
+        IFOG = cache['IFOG']
+        IFOGf = cache['IFOGf']
+        Cellin = cache['Cellin']
+        Cellout = cache['Cellout']
+        Hprev = cache['Hprev']
+        WLSTM = cache['WLSTM']
+        
+        bWd = cache['bWd']
+        bHout = cache['bHout']
+        bIFOG = cache['bIFOG']
+        bIFOGf = cache['bIFOGf']
+        bCellin = cache['bCellin']
+        bCellout = cache['bCellout']
+        bHprev = cache['bHprev']
+        bWLSTM = cache['bWLSTM']
+        
+        word_ids = cache['word_ids']
+        
+        n,d = Hout.shape
+        xd = WLSTM.shape[0] - d - 1
+        Wh = WLSTM[1+xd:]
+        bWh = bWLSTM[1+xd:]
+        
+        # backprop the hidden-output layer
+        dWd = Hout.transpose().dot(dY)
+        dbd = np.sum(dY, axis=0, keepdims = True)
+        dHout = dY.dot(Wd.transpose())
+        
+        # backprop the backward hidden-output layer
+        dbWd = bHout.transpose().dot(dY)
+        dbbd = np.sum(dY, axis=0, keepdims = True)
+        dbHout = dY.dot(bWd.transpose())
+        
+        # backprop the LSTM (forward layer)
+        dIFOG = np.zeros(IFOG.shape)
+        dIFOGf = np.zeros(IFOGf.shape)
+        dCellin = np.zeros(Cellin.shape)
+        dCellout = np.zeros(Cellout.shape)
+        
+        # backward-layer
+        dbIFOG = np.zeros(bIFOG.shape)
+        dbIFOGf = np.zeros(bIFOGf.shape)
+        dbCellin = np.zeros(bCellin.shape)
+        dbCellout = np.zeros(bCellout.shape)
+        
+        for t in reversed(range(n)):
+            dIFOGf[t,2*d:3*d] = Cellout[t] * dHout[t]
+            dCellout[t] = IFOGf[t,2*d:3*d] * dHout[t]
+            
+            dCellin[t] += (1-Cellout[t]**2) * dCellout[t]
+            
+            if t>0:
+                dIFOGf[t, d:2*d] = Cellin[t-1] * dCellin[t]
+                dCellin[t-1] += IFOGf[t,d:2*d] * dCellin[t]
+            
+            dIFOGf[t, :d] = IFOGf[t,3*d:] * dCellin[t]
+            dIFOGf[t,3*d:] = IFOGf[t, :d] * dCellin[t]
+            
+            # backprop activation functions
+            dIFOG[t, 3*d:] = (1-IFOGf[t, 3*d:]**2) * dIFOGf[t, 3*d:]
+            y = IFOGf[t, :3*d]
+            dIFOG[t, :3*d] = (y*(1-y)) * dIFOGf[t, :3*d]
+            
+            if t>0: dHout[t-1] += dIFOG[t].dot(Wh.transpose())
+            
+            # Backward Layer
+            b_t = n-1-t
+            dbIFOGf[b_t, 2*d:3*d] = bCellout[b_t] * dbHout[b_t] # output gate
+            dbCellout[b_t] = bIFOGf[b_t, 2*d:3*d] * dbHout[b_t] # dCellout
+            
+            dbCellin[b_t] += (1-bCellout[b_t]**2) * dbCellout[b_t]
+            
+            if t>0: # dcell
+                dbIFOGf[b_t, d:2*d] = bCellin[b_t+1] * dbCellin[b_t] # forgot gate
+                dbCellin[b_t+1] += bIFOGf[b_t, d:2*d] * dbCellin[b_t]
+            
+            dbIFOGf[b_t, :d] = bIFOGf[b_t, 3*d:] * dbCellin[b_t] # input gate
+            dbIFOGf[b_t, 3*d:] = bIFOGf[b_t, :d] * dbCellin[b_t]
+            
+            # backprop activation functions
+            dbIFOG[b_t, 3*d:] = (1-bIFOGf[b_t, 3*d:]**2) * dbIFOGf[b_t, 3*d:]
+            by = bIFOGf[b_t, :3*d]
+            dbIFOG[b_t, :3*d] = (by*(1-by)) * dbIFOGf[b_t, :3*d]
+            
+            if t>0: dbHout[b_t+1] += dbIFOG[b_t].dot(bWh.transpose())
+        
+        # backprop matrix multiply: bias rows, gathered input rows and hidden slices
+        dWLSTM = np.zeros(WLSTM.shape)
+        dWLSTM[0] = np.sum(dIFOG, axis=0)
+        np.add.at(dWLSTM, 1 + word_ids, dIFOG)
+        dWLSTM[1+xd:] = Hprev.transpose().dot(dIFOG)
+        
+        dbWLSTM = np.zeros(bWLSTM.shape)
+        dbWLSTM[0] = np.sum(dbIFOG, axis=0)
+        np.add.at(dbWLSTM, 1 + word_ids, dbIFOG)
+        dbWLSTM[1+xd:] = bHprev.transpose().dot(dbIFOG)
+        
         return {'WLSTM':dWLSTM, 'Wd':dWd, 'bd':dbd, 'bWLSTM':dbWLSTM, 'bWd':dbWd, 'bbd':dbbd}
\ No newline at end of file
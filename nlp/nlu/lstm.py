@@ -6,7 +6,7 @@ An LSTM decoder - add tanh after cell before output gate
 @author: xiul
 '''
 
-from seq_seq import SeqToSeq
+from .seq_seq import SeqToSeq
 from .utils import *
 
 
@@ -28,6 +28,8 @@ class lstm(SeqToSeq):
     def fwdPass(self, Xs, params, **kwargs):
         predict_mode = kwargs.get('predict_mode', False)
         
+        if 'word_ids' in Xs: return self.fwdPassIds(Xs, params, predict_mode)
+        
         Ws = Xs['word_vectors']
         
         WLSTM = self.model['WLSTM']
@@ -41,7 +43,7 @@ class lstm(SeqToSeq):
         Cellin = np.zeros((n, d))
         Cellout = np.zeros((n, d))
     
-        for t in xrange(n):
+        for t in range(n):
             prev = np.zeros(d) if t==0 else Hout[t-1]
             Hin[t,0] = 1 # bias
             Hin[t, 1:1+xd] = Ws[t]
@@ -79,8 +81,100 @@ class lstm(SeqToSeq):
             
         return Y, cache
     
+    """ Forward Pass over token ids: the input projection of a token is a row gather from the input slice of WLSTM,
+    instead of the product of its one-hot vector with the whole WLSTM """
+    def fwdPassIds(self, Xs, params, predict_mode=False):
+        word_ids = np.asarray(Xs['word_ids'])
+        
+        WLSTM = self.model['WLSTM']
+        n = len(word_ids)
+        
+        d = self.model['Wd'].shape[0] # size of hidden layer
+        xd = WLSTM.shape[0] - d - 1 # size of the vocabulary
+        Wh = WLSTM[1+xd:] # hidden-to-gates slice
+        
+        # the bias and the input contributions to the gates of all tokens, at once
+        Xin = WLSTM[0] + WLSTM[1 + word_ids]
+        
+        Hprev = np.zeros((n, d)) # ht-1
+        Hout = np.zeros((n, d))
+        IFOG = np.zeros((n, 4*d))
+        IFOGf = np.zeros((n, 4*d)) # after nonlinearity
+        Cellin = np.zeros((n, d))
+        Cellout = np.zeros((n, d))
+        
+        for t in range(n):
+            if t > 0: Hprev[t] = Hout[t-1]
+            
+            # compute all gate activations. dots:
+            IFOG[t] = Xin[t] + Hprev[t].dot(Wh)
+            
+            IFOGf[t, :3*d] = 1/(1+np.exp(-IFOG[t, :3*d])) # sigmoids; these are three gates
+            IFOGf[t, 3*d:] = np.tanh(IFOG[t, 3*d:]) # tanh for input value
+            
+            Cellin[t] = IFOGf[t, :d] * IFOGf[t, 3*d:]
+            if t>0: Cellin[t] += IFOGf[t, d:2*d]*Cellin[t-1]
+            
+            Cellout[t] = np.tanh(Cellin[t])
+            
+            Hout[t] = IFOGf[t, 2*d:3*d] * Cellout[t]
+        
+        Wd = self.model['Wd']
+        bd = self.model['bd']
+        
+        Y = Hout.dot(Wd)+bd
+        
+        cache = {}
+        if not predict_mode:
+            cache['WLSTM'] = WLSTM
+            cache['Hout'] = Hout
+            cache['Wd'] = Wd
+            cache['IFOGf'] = IFOGf
+            cache['IFOG'] = IFOG
+            cache['Cellin'] = Cellin
+            cache['Cellout'] = Cellout
+            cache['Hprev'] = Hprev
+            cache['word_ids'] = word_ids
+        
+        return Y, cache
+    
+    """ Batch Forward Pass over the padded token ids of shape (B, T), returning the scores of shape (B, T, nb_tags): the
+    recurrence runs once over the batch, with one (B, 4d) gate product per step. The padding comes after the end of each
+    sequence, so it never changes its outputs """
+    def fwdPassBatch(self, word_ids, lengths):
+        word_ids = np.asarray(word_ids)
+        B, T = word_ids.shape
+        
+        WLSTM = self.model['WLSTM']
+        d = self.model['Wd'].shape[0] # size of hidden layer
+        xd = WLSTM.shape[0] - d - 1 # size of the vocabulary
+        Wh = WLSTM[1+xd:] # hidden-to-gates slice
+        
+        # the bias and the input contributions to the gates of all tokens, at once and time-major
+        Xin = np.take(WLSTM, 1 + word_ids.T, axis=0)
+        Xin += WLSTM[0]
+        
+        Hout = np.zeros((T, B, d))
+        H = np.zeros((B, d))
+        Cell = np.zeros((B, d))
+        
+        for t in range(T):
+            IFOG = Xin[t] + H.dot(Wh)
+            
+            IFOGf = 1/(1+np.exp(-IFOG[:, :3*d])) # sigmoids; these are three gates
+            Cell = IFOGf[:, :d] * np.tanh(IFOG[:, 3*d:]) + IFOGf[:, d:2*d] * Cell
+            H = IFOGf[:, 2*d:3*d] * np.tanh(Cell)
+            
+            Hout[t] = H
+        
+        Y = Hout.reshape(T*B, d).dot(self.model['Wd']) + self.model['bd']
+        
+        return Y.reshape(T, B, -1).transpose(1, 0, 2)
+    
     """ Backward Pass """
     def bwdPass(self, dY, cache):
+        if 'word_ids' in cache: return self.bwdPassIds(dY, cache)
+        
         Wd = cache['Wd']
         Hout = cache['Hout']
         IFOG = cache['IFOG']
@@ -106,7 +200,7 @@ class lstm(SeqToSeq):
         dCellin = np.zeros(Cellin.shape)
         dCellout = np.zeros(Cellout.shape)
         
-        for t in reversed(xrange(n)):
+        for t in reversed(range(n)):
             dIFOGf[t,2*d:3*d] = Cellout[t] * dHout[t]
             dCellout[t] = IFOGf[t,2*d:3*d] * dHout[t]
             
@@ -131,4 +225,59 @@ class lstm(SeqToSeq):
             if t > 0: dHout[t-1] += dHin[t, 1+Ws.shape[1]:]
         
         #dXs = dXsh.dot(Wxh.transpose())  
+        return {'WLSTM':dWLSTM, 'Wd':dWd, 'bd':dbd}
+    
+    """ Backward Pass over token ids: the gradients of the input slice of WLSTM are scattered to the rows of the tokens """
+    def bwdPassIds(self, dY, cache):
+        Wd = cache['Wd']
+        Hout = cache['Hout']
+        IFOG = cache['IFOG']
+        IFOGf = cache['IFOGf']
+        Cellin = cache['Cellin']
+        Cellout = cache['Cellout']
+        Hprev = cache['Hprev']
+        WLSTM = cache['WLSTM']
+        word_ids = cache['word_ids']
+        
+        n,d = Hout.shape
+        xd = WLSTM.shape[0] - d - 1
+        Wh = WLSTM[1+xd:]
+        
+        # backprop the hidden-output layer
+        dWd = Hout.transpose().dot(dY)
+        dbd = np.sum(dY, axis=0, keepdims = True)
+        dHout = dY.dot(Wd.transpose())
+        
+        # backprop the LSTM
+        dIFOG = np.zeros(IFOG.shape)
+        dIFOGf = np.zeros(IFOGf.shape)
+        dCellin = np.zeros(Cellin.shape)
+        dCellout = np.zeros(Cellout.shape)
+        
+        for t in reversed(range(n)):
+            dIFOGf[t,2*d:3*d] = Cellout[t] * dHout[t]
+            dCellout[t] = IFOGf[t,2*d:3*d] * dHout[t]
+            
+            dCellin[t] += (1-Cellout[t]**2) * dCellout[t]
+            
+            if t>0:
+                dIFOGf[t, d:2*d] = Cellin[t-1] * dCellin[t]
+                dCellin[t-1] += IFOGf[t,d:2*d] * dCellin[t]
+            
+            dIFOGf[t, :d] = IFOGf[t,3*d:] * dCellin[t]
+            dIFOGf[t,3*d:] = IFOGf[t, :d] * dCellin[t]
+            
+            # backprop activation functions
+            dIFOG[t, 3*d:] = (1-IFOGf[t, 3*d:]**2) * dIFOGf[t, 3*d:]
+            y = IFOGf[t, :3*d]
+            dIFOG[t, :3*d] = (y*(1-y)) * dIFOGf[t, :3*d]
+            
+            if t > 0: dHout[t-1] += dIFOG[t].dot(Wh.transpose())
+        
+        # backprop matrix multiply: bias row, gathered input rows and hidden slice
+        dWLSTM = np.zeros(WLSTM.shape)
+        dWLSTM[0] = np.sum(dIFOG, axis=0)
+        np.add.at(dWLSTM, 1 + word_ids, dIFOG)
+        dWLSTM[1+xd:] = Hprev.transpose().dot(dIFOG)
+        
         return {'WLSTM':dWLSTM, 'Wd':dWd, 'bd':dbd}
\ No newline at end of file
@@ -4,12 +4,12 @@ Created on Jul 13, 2016
 @author: xiul
 '''
 
-import cPickle as pickle
+import pickle
 import copy
 import numpy as np
 
-from lstm import lstm
-from bi_lstm import biLSTM
+from .lstm import lstm
+from .bi_lstm import biLSTM
 
 
 class nlu:
@@ -41,39 +41,68 @@ class nlu:
         """
         
         if len(annot) > 0:
-            print "Generate Dialogue act positive"
+            print ("Generate Dialogue act positive")
 
             tmp_annot = annot.strip('.').strip('?').strip(',').strip('!') 
             
-            rep = self.parse_str_to_vector(tmp_annot)
+            rep = self.parse_str_to_ids(tmp_annot)
             Ys, cache = self.model.fwdPass(rep, self.params, predict_model=True) # default: True
             
-            maxes = np.amax(Ys, axis=1, keepdims=True)
-            e = np.exp(Ys - maxes) # for numerical stability shift into good numerical range
-            probs = e/np.sum(e, axis=1, keepdims=True)
-            if np.all(np.isnan(probs)): probs = np.zeros(probs.shape)
-            
-            # special handling with intent label
-            for tag_id in self.inverse_tag_dict.keys():
-                if self.inverse_tag_dict[tag_id].startswith('B-') or self.inverse_tag_dict[tag_id].startswith('I-') or self.inverse_tag_dict[tag_id] == 'O':
-                    probs[-1][tag_id] = 0
-            
-            pred_words_indices = np.nanargmax(probs, axis=1)
-            pred_tags = [self.inverse_tag_dict[index] for index in pred_words_indices]
-            
-            diaact = self.parse_nlu_to_diaact(pred_tags, tmp_annot)
-            return diaact
+            return self.decode_dia_act(Ys, tmp_annot)
         else:
-            print "Generate Dialogue act negative"
+            print ("Generate Dialogue act negative")
             return None
 
-    
+
+    def decode_dia_act(self, Ys, tmp_annot):
+        """ Decode the scores of the tags of an utterance, of shape (len(words), nb_tags), into a dialogue act """
+        
+        maxes = np.amax(Ys, axis=1, keepdims=True)
+        e = np.exp(Ys - maxes) # for numerical stability shift into good numerical range
+        probs = e/np.sum(e, axis=1, keepdims=True)
+        if np.all(np.isnan(probs)): probs = np.zeros(probs.shape)
+        
+        # special handling with intent label
+        for tag_id in self.inverse_tag_dict.keys():
+            if self.inverse_tag_dict[tag_id].startswith('B-') or self.inverse_tag_dict[tag_id].startswith('I-') or self.inverse_tag_dict[tag_id] == 'O':
+                probs[-1][tag_id] = 0
+        
+        pred_words_indices = np.nanargmax(probs, axis=1)
+        pred_tags = [self.inverse_tag_dict[index] for index in pred_words_indices]
+        
+        return self.parse_nlu_to_diaact(pred_tags, tmp_annot)
+
+    def generate_dia_acts(self, annots):
+        """ Generate the dialogue acts of a batch of utterances, running the LSTM once over the padded (B, T) matrix of
+        their word ids. The empty utterances get None, as in generate_dia_act """
+        
+        diaacts = [None] * len(annots)
+        
+        indices = [index for index, annot in enumerate(annots) if len(annot) > 0]
+        if len(indices) == 0: return diaacts
+        
+        tmp_annots = [annots[index].strip('.').strip('?').strip(',').strip('!') for index in indices]
+        reps = [self.parse_str_to_ids(tmp_annot) for tmp_annot in tmp_annots]
+        
+        # padded word ids, the padding is masked by the lengths
+        lengths = np.array([len(rep['word_ids']) for rep in reps])
+        word_ids = np.zeros((len(reps), lengths.max()), dtype=np.int64)
+        for row, rep in enumerate(reps):
+            word_ids[row, :lengths[row]] = rep['word_ids']
+        
+        Ys = self.model.fwdPassBatch(word_ids, lengths)
+        
+        for row, index in enumerate(indices):
+            diaacts[index] = self.decode_dia_act(Ys[row, :lengths[row]], tmp_annots[row])
+        
+        return diaacts
+
     def load_nlu_model(self, model_path):
         """ load the trained NLU model """  
 
-        print "Load trained NLU unit"
+        print ("Load trained NLU unit")
 
-        model_params = pickle.load(open(model_path, 'rb'))
+        model_params = pickle.load(open(model_path, 'rb'), encoding='latin1')
     
         hidden_size = model_params['model']['Wd'].shape[0]
         output_size = model_params['model']['Wd'].shape[1]
@@ -114,6 +143,23 @@ class nlu:
         rep['raw_seq'] = string
         return rep
 
+    def parse_str_to_ids(self, string):
+        """ Parse string into word ids, the input of the LSTMs without the one-hot vectors """
+        
+        tmp = 'BOS ' + string + ' EOS'
+        words = tmp.lower().split(' ')
+        
+        unk_id = self.word_dict['unk']
+        word_ids = np.zeros(len(words), dtype=np.int64)
+        for w_index, w in enumerate(words):
+            if w.endswith(',') or w.endswith('?'): w = w[0:-1]
+            word_ids[w_index] = self.word_dict.get(w, unk_id)
+        
+        rep = {}
+        rep['word_ids'] = word_ids
+        rep['raw_seq'] = string
+        return rep
+
     def parse_nlu_to_diaact(self, nlu_vector, string):
         """ Parse BIO and Intent into Dia-Act """
         
@@ -0,0 +1,105 @@
+"""
+Author: Vladimir Ilievski <ilievski.vladimir@live.com>
+
+A Python file for the tests of the replay memories of the Goal-Oriented Dialogue agents.
+"""
+
+from core.agent.memory import GOArrayMemory, GOPrioritizedMemory
+
+import numpy as np
+import pytest
+
+
+def make_entries(nb_entries, observation_dim=5, seed=0):
+    """
+    Function for creating random entries, with episodes of a few turns.
+
+    :param nb_entries: the number of entries
+    :param observation_dim: the dimension of the observations
+    :param seed: the random seed
+    :return: the observations, the actions, the rewards and the terminal flags
+    """
+
+    rng = np.random.RandomState(seed)
+
+    observations = rng.uniform(size=(nb_entries, observation_dim)).astype(np.float32)
+    actions = rng.randint(10, size=nb_entries)
+    rewards = rng.uniform(-1, 1, size=nb_entries).astype(np.float32)
+    terminals = rng.uniform(size=nb_entries) < 0.25
+
+    return observations, actions, rewards, terminals
+
+
+def n_step_returns_loop(rewards, terminals, nb_appended, limit, nb_steps, gamma, idx):
+    """
+    Function for computing the n-step return of one transition turn by turn, as the reference.
+
+    :return: the return, the terminal flag, the index of the next state and the discount of its Q-value
+    """
+
+    # the appended entry of the transition, among all entries appended so far
+    t = nb_appended - 1 - (nb_appended - 1 - idx) % limit
+
+    ret = 0.0
+    terminal = False
+    nb_summed = 0
+    while nb_summed < nb_steps and t + nb_summed < nb_appended - 1:
+        ret += gamma ** nb_summed * rewards[t + nb_summed]
+        nb_summed += 1
+        if terminals[t + nb_summed - 1]:
+            terminal = True
+            break
+
+    return ret, terminal, (t + nb_summed) % limit, gamma ** nb_summed
+
+
+@pytest.mark.parametrize('limit, nb_entries, nb_steps', [(100, 60, 1), (100, 60, 3), (7, 20, 3), (16, 50, 5)])
+def test_n_step_returns_match_loop(limit, nb_entries, nb_steps):
+    gamma = 0.9
+    observations, actions, rewards, terminals = make_entries(nb_entries)
+
+    memory = GOArrayMemory(limit, observations.shape[1], nb_steps=nb_steps, gamma=gamma)
+    for entry in zip(observations, actions, rewards, terminals):
+        memory.append(*entry)
+
+    idxs = np.arange(memory.nb_entries)
+    idxs = idxs[memory._valid_transitions(idxs)]
+
+    returns, returns_terminals, next_idxs, discounts = memory._n_step_returns(idxs)
+
+    for row, idx in enumerate(idxs):
+        ret, terminal, next_idx, discount = n_step_returns_loop(rewards, terminals, nb_entries, limit, nb_steps,
+                                                                gamma, idx)
+        assert returns[row] == pytest.approx(ret, rel=1e-5, abs=1e-6)
+        assert returns_terminals[row] == terminal
+        assert next_idxs[row] == next_idx
+        assert discounts[row] == pytest.approx(discount)
+
+
+@pytest.mark.parametrize('memory_class', [GOArrayMemory, GOPrioritizedMemory])
+@pytest.mark.parametrize('limit, chunk_sizes', [(100, [10, 1, 25, 14]), (16, [5, 9, 30, 3, 1]), (8, [20])])
+def test_append_batch_matches_append(memory_class, limit, chunk_sizes):
+    observations, actions, rewards, terminals = make_entries(sum(chunk_sizes))
+
+    memory = memory_class(limit, observations.shape[1], nb_steps=3, gamma=0.9)
+    for entry in zip(observations, actions, rewards, terminals):
+        memory.append(*entry)
+
+    batch_memory = memory_class(limit, observations.shape[1], nb_steps=3, gamma=0.9)
+    start = 0
+    for chunk_size in chunk_sizes:
+        chunk = slice(start, start + chunk_size)
+        batch_memory.append_batch(observations[chunk], actions[chunk], rewards[chunk], terminals[chunk])
+        start += chunk_size
+
+    idxs = np.arange(limit)
+
+    assert batch_memory.nb_appended == memory.nb_appended
+    np.testing.assert_array_equal(batch_memory.storage.read(idxs), memory.storage.read(idxs))
+    np.testing.assert_array_equal(batch_memory.actions, memory.actions)
+    np.testing.assert_array_equal(batch_memory.rewards, memory.rewards)
+    np.testing.assert_array_equal(batch_memory.terminals, memory.terminals)
+    np.testing.assert_array_equal(batch_memory.post_terminals, memory.post_terminals)
+
+    if memory_class is GOPrioritizedMemory:
+        np.testing.assert_allclose(batch_memory.sum_tree.get(idxs), memory.sum_tree.get(idxs))